@@ -69,7 +69,7 @@ __license__ = 'Apache License, Version 2.0'
 if not __openravepy_build_doc__:
     from numpy import *
 
-from numpy import reshape, array, float64, int32, zeros, isnan, newaxis, empty, arange, repeat, where, isclose
+from numpy import reshape, array, asarray, float64, int32, int64, zeros, ones, logical_not, isnan, newaxis, empty, arange, repeat, where, isclose, floor, unique, searchsorted, argsort, lexsort, bincount, cumsum, minimum, maximum, concatenate, flatnonzero, logical_and, c_, r_
 from numpy.linalg import norm
 from numpy.core.umath_tests import inner1d
 
@@ -106,6 +106,55 @@ class ConvexDecompositionError(Exception):
     def __str__(self):
         return unicode(self).encode('utf-8')
 
+class PackedLinkGeometry(object):
+    """The hulls of every link of a ConvexDecompositionModel, read from the packed group of an HDF5 database.
+
+    Behaves like the list ConvexDecompositionModel.linkgeometry. A link is read the first time it is accessed, with one contiguous read of each of the vertices, indices and planes datasets.
+    """
+    def __init__(self,gpacked):
+        self._gpacked = gpacked
+        self._linkgeometryoffsets = gpacked['linkgeometryoffsets'].value
+        self._geometryindices = gpacked['geometryindices'].value
+        self._geometryhulloffsets = gpacked['geometryhulloffsets'].value
+        self._hulloffsets = [gpacked['hull'+name+'offsets'].value for name in ['vertices','indices','planes']]
+        self._links = [None]*(len(self._linkgeometryoffsets)-1)
+    
+    def __len__(self):
+        return len(self._links)
+    
+    def __getitem__(self,ilink):
+        if isinstance(ilink,slice):
+            return [self[i] for i in range(len(self))[ilink]]
+        linkgeometry = self._links[ilink]
+        if linkgeometry is None:
+            linkgeometry = self._ReadLink(ilink)
+            self._links[ilink] = linkgeometry
+        return linkgeometry
+    
+    def __iter__(self):
+        for ilink in range(len(self)):
+            yield self[ilink]
+    
+    def _ReadLink(self,ilink):
+        ilink = range(len(self))[ilink]
+        geometrystart, geometryend = self._linkgeometryoffsets[ilink:ilink+2]
+        hullstart = self._geometryhulloffsets[geometrystart]
+        hullend = self._geometryhulloffsets[geometryend]
+        # read the arrays of all the hulls of the link at once
+        linkarrays = []
+        for name,numcolumns,offsets in izip(['vertices','indices','planes'],[3,3,4],self._hulloffsets):
+            if offsets[hullend] > offsets[hullstart]:
+                linkarrays.append(self._gpacked[name][offsets[hullstart]:offsets[hullend]])
+            else:
+                linkarrays.append(zeros((0,numcolumns),self._gpacked[name].dtype))
+        hulls = []
+        for ihull in range(hullstart,hullend):
+            hulls.append([values[(offsets[ihull]-offsets[hullstart]):(offsets[ihull+1]-offsets[hullstart])] for values,offsets in izip(linkarrays,self._hulloffsets)])
+        linkgeometry = []
+        for igeometry in range(geometrystart,geometryend):
+            linkgeometry.append((int(self._geometryindices[igeometry]),hulls[(self._geometryhulloffsets[igeometry]-hullstart):(self._geometryhulloffsets[igeometry+1]-hullstart)]))
+        return linkgeometry
+
 class ConvexDecompositionModel(DatabaseGenerator):
     """Computes the convex decomposition of all of the robot's links"""
     def __init__(self,robot,padding=0.0):
@@ -117,9 +166,14 @@ class ConvexDecompositionModel(DatabaseGenerator):
         self.convexparams = None
         self._padding = padding
         self._graspermodule = None # for convex hulls
+        self._pointqueryhulls = None # hull bounding boxes for testPointsInside
         
     def clone(self,envother):
         clone = DatabaseGenerator.clone(self,envother)
+        # the database file is closed with this model, so the clone reads all the links now and does not share the file
+        if isinstance(self.linkgeometry,PackedLinkGeometry):
+            clone.linkgeometry = list(self.linkgeometry)
+        clone._databasefile = None
         #TODO need to set convex decomposition?
         return clone
     
@@ -127,7 +181,7 @@ class ConvexDecompositionModel(DatabaseGenerator):
         return self.linkgeometry is not None and len(self.linkgeometry)==len(self.robot.GetLinks())
     
     def getversion(self):
-        return 2
+        return 3
     
     def save(self):
         try:
@@ -148,7 +202,7 @@ class ConvexDecompositionModel(DatabaseGenerator):
             return False
 
     def SavePickle(self):
-        DatabaseGenerator.save(self,(self.linkgeometry,self.convexparams))
+        DatabaseGenerator.save(self,(list(self.linkgeometry),self.convexparams))
 
     def SaveHDF5(self):
         import h5py
@@ -159,6 +213,9 @@ class ConvexDecompositionModel(DatabaseGenerator):
         except OSError:
             pass
         
+        # read all the links before the database file can be overwritten
+        self.linkgeometry = list(self.linkgeometry)
+        self._CloseDatabase()
         f=h5py.File(filename,'w')
         try:
             f['version'] = self.getversion()
@@ -166,20 +223,32 @@ class ConvexDecompositionModel(DatabaseGenerator):
             for name,value in self.convexparams.iteritems():
                 gparams[name] = value
             f['padding'] = self._padding
-            glinkgeometry = f.create_group('linkgeometry')
-            for ilink, linkgeometry in enumerate(self.linkgeometry):
-                glink = glinkgeometry.create_group(str(ilink))
+            # all the hulls are concatenated in link, geometry, hull order, with offset tables to find the hulls of each link
+            linkgeometryoffsets = [0]
+            geometryindices = []
+            geometryhulloffsets = [0]
+            hulloffsets = [[0],[0],[0]]
+            hullarrays = [[],[],[]]
+            for linkgeometry in self.linkgeometry:
                 for ig, geometryhulls in linkgeometry:
-                    glinkhulls = glink.create_group(str(ig))
-                    glinkhulls['igeometry'] = ig
-                    ghulls = glinkhulls.create_group('hulls')
-                    for j, hull in enumerate(geometryhulls):
-                        ghull = ghulls.create_group(str(j))
-                        for name,values in izip(['vertices','indices','planes'],hull):
-                            if len(values) == 0:
-                                ghull.create_dataset(name,[],dtype=values.dtype)
-                            else:
-                                ghull[name] = values
+                    geometryindices.append(ig)
+                    for hull in geometryhulls:
+                        for j,values in enumerate(hull):
+                            values = reshape(values,(-1,3 if j < 2 else 4))
+                            hullarrays[j].append(values)
+                            hulloffsets[j].append(hulloffsets[j][-1]+len(values))
+                    geometryhulloffsets.append(geometryhulloffsets[-1]+len(geometryhulls))
+                linkgeometryoffsets.append(len(geometryindices))
+            gpacked = f.create_group('packed')
+            gpacked['linkgeometryoffsets'] = array(linkgeometryoffsets,int64)
+            gpacked['geometryindices'] = array(geometryindices,int64)
+            gpacked['geometryhulloffsets'] = array(geometryhulloffsets,int64)
+            for j,(name,numcolumns,dtype) in enumerate([('vertices',3,float64),('indices',3,int32),('planes',4,float64)]):
+                gpacked['hull'+name+'offsets'] = array(hulloffsets[j],int64)
+                if hulloffsets[j][-1] == 0:
+                    gpacked.create_dataset(name,(0,numcolumns),dtype=dtype)
+                else:
+                    gpacked[name] = concatenate(hullarrays[j]).astype(dtype)
         finally:
             f.close()
 
@@ -205,7 +274,8 @@ class ConvexDecompositionModel(DatabaseGenerator):
         f = None
         try:
             f=h5py.File(filename,'r')
-            if f['version'].value != self.getversion():
+            version = f['version'].value
+            if version != self.getversion() and version != 2:
                 log.error(u'version is wrong %s!=%s ',f['version'],self.getversion())
                 return False
             
@@ -214,24 +284,11 @@ class ConvexDecompositionModel(DatabaseGenerator):
             for name,value in gparams.iteritems():
                 self.convexparams[name] = value.value
             self._padding = f['padding'].value
-            glinkgeometry = f['linkgeometry']
-            self.linkgeometry = []
-            for ilink, glink in glinkgeometry.iteritems():
-                linkgeometry = []
-                for ig, glinkhulls in glink.iteritems():
-                    ghulls = glinkhulls['hulls']
-                    geometryhulls = []
-                    for j, ghull in ghulls.iteritems():
-                        if 'vertices' in ghull and len(ghull['vertices'].shape) == 2 and 'indices' in ghull and len(ghull['indices'].shape\
-) == 2 and 'planes' in ghull and len(ghull['planes'].shape) == 2:
-			    hull = [ghull['vertices'].value, ghull['indices'].value, ghull['planes'].value]
-                            geometryhulls.append(hull)
-                        else:
-                            log.warn('could not open link %s geometry %s hull %s: %r', ilink, ig, j, ghull)
-                    linkgeometry.append((int(ig),geometryhulls))
-                while len(self.linkgeometry) <= int(ilink):
-                    self.linkgeometry.append(None)
-                self.linkgeometry[int(ilink)] = linkgeometry
+            if version == 2:
+                self.linkgeometry = self._LoadHDF5LinkGeometryVersion2(f)
+            else:
+                # the links are read when first accessed
+                self.linkgeometry = PackedLinkGeometry(f['packed'])
             self._databasefile = f
             f = None
             return self.has()
@@ -243,12 +300,39 @@ class ConvexDecompositionModel(DatabaseGenerator):
             if f is not None:
                 f.close()
 
+    @staticmethod
+    def _LoadHDF5LinkGeometryVersion2(f):
+        """reads the linkgeometry of a version 2 database, which stores every hull in its own group
+        """
+        glinkgeometry = f['linkgeometry']
+        linkgeometries = []
+        for ilink, glink in glinkgeometry.iteritems():
+            linkgeometry = []
+            for ig, glinkhulls in glink.iteritems():
+                ghulls = glinkhulls['hulls']
+                geometryhulls = []
+                for j, ghull in ghulls.iteritems():
+                    if 'vertices' in ghull and len(ghull['vertices'].shape) == 2 and 'indices' in ghull and len(ghull['indices'].shape) == 2 and 'planes' in ghull and len(ghull['planes'].shape) == 2:
+                        hull = [ghull['vertices'].value, ghull['indices'].value, ghull['planes'].value]
+                        geometryhulls.append(hull)
+                    else:
+                        log.warn('could not open link %s geometry %s hull %s: %r', ilink, ig, j, ghull)
+                linkgeometry.append((int(ig),geometryhulls))
+            while len(linkgeometries) <= int(ilink):
+                linkgeometries.append(None)
+            linkgeometries[int(ilink)] = linkgeometry
+        return linkgeometries
+    
     def setrobot(self):
         with self.env:
-            for link,linkcd in izip(self.robot.GetLinks(),self.linkgeometry):
-                for ig,hulls in linkcd:
-                    if link.GetGeometries()[ig].IsModifiable():
-                        link.GetGeometries()[ig].SetCollisionMesh(self.GenerateTrimeshFromHulls(hulls))
+            for ilink,link in enumerate(self.robot.GetLinks()):
+                geometries = link.GetGeometries()
+                # do not read the hulls of links that cannot be modified
+                if not numpy.any([geom.IsModifiable() for geom in geometries]):
+                    continue
+                for ig,hulls in self.linkgeometry[ilink]:
+                    if geometries[ig].IsModifiable():
+                        geometries[ig].SetCollisionMesh(self.GenerateTrimeshFromHulls(hulls))
 
     def getfilename(self,read=False):
         filename = 'convexdecomposition_%.3f.pp'%self._padding
@@ -256,15 +340,16 @@ class ConvexDecompositionModel(DatabaseGenerator):
     
     def autogenerate(self,options=None):
         if options is not None:
-            self.generate(padding=options.padding,skinWidth=options.skinWidth, decompositionDepth=options.decompositionDepth, maxHullVertices=options.maxHullVertices,concavityThresholdPercent=options.concavityThresholdPercent, mergeThresholdPercent=options.mergeThresholdPercent, volumeSplitThresholdPercent=options.volumeSplitThresholdPercent, useInitialIslandGeneration=options.useInitialIslandGeneration, useIslandGeneration=options.useIslandGeneration,convexHullLinks=options.convexHullLinks.split(','))
+            self.generate(padding=options.padding,skinWidth=options.skinWidth, decompositionDepth=options.decompositionDepth, maxHullVertices=options.maxHullVertices,concavityThresholdPercent=options.concavityThresholdPercent, mergeThresholdPercent=options.mergeThresholdPercent, volumeSplitThresholdPercent=options.volumeSplitThresholdPercent, useInitialIslandGeneration=options.useInitialIslandGeneration, useIslandGeneration=options.useIslandGeneration,convexHullLinks=options.convexHullLinks.split(','),numprocesses=options.numprocesses)
         else:
             self.generate()
         self.save()
-    def generate(self,padding=None,minTriangleConvexHullThresh=None,convexHullLinks=None,**kwargs):
+    def generate(self,padding=None,minTriangleConvexHullThresh=None,convexHullLinks=None,numprocesses=None,**kwargs):
         """
         :param padding: the padding in meters
         :param minTriangleConvexHullThresh: If not None, then describes the minimum number of triangles needed to use convex hull rather than convex decomposition. Although this might seem counter intuitive, the current convex decomposition module cannot handle really complex meshes and it takes a long time if it does handle them.
         :param convexHullLinks: a list of link names to compute convex hulls instead of decomposition
+        :param numprocesses: if greater than 1, the geometries are decomposed and padded in a pool of numprocesses processes, outside of the environment lock
         """
         self.convexparams = kwargs
         if padding is None:
@@ -275,11 +360,12 @@ class ConvexDecompositionModel(DatabaseGenerator):
             convexHullLinks = []
         log.info(u'Generating Convex Decomposition: %r',self.convexparams)
         starttime = time.time()
-        self.linkgeometry = []
+        # extract the meshes of all the geometries, only the convex hulls need the environment
+        jobs = []
+        jobgeometries = []
         with self.env:
             links = self.robot.GetLinks()
             for il,link in enumerate(links):
-                geomhulls = []
                 geometries = link.GetGeometries()
                 for ig,geom in enumerate(geometries):
                     if geom.GetType() == KinBody.Link.GeomType.Trimesh or padding > 0:
@@ -289,57 +375,83 @@ class ConvexDecompositionModel(DatabaseGenerator):
                             trimesh = geom.GetCollisionMesh()
                         if link.GetName() in convexHullLinks or (minTriangleConvexHullThresh is not None and len(trimesh.indices) > minTriangleConvexHullThresh):
                             log.info(u'computing hull for link %d/%d geom %d/%d: vertices=%d, indices=%d',il,len(links), ig, len(geometries), len(trimesh.vertices), len(trimesh.indices))
-                            orghulls = [self.ComputePaddedConvexHullFromTriMesh(trimesh,padding)]
+                            hullindices = self._ComputeConvexHullIndices(trimesh) if len(trimesh.indices) > 0 else None
+                            if hullindices is None:
+                                jobs.append((zeros((0,3),float),zeros((0,3),int),False,None,None))
+                            else:
+                                jobs.append((trimesh.vertices,hullindices,False,padding,None))
                         else:
                             log.info(u'computing decomposition for link %d/%d geom %d/%d type %s',il,len(links), ig, len(geometries), geom.GetType())
-                            orghulls = self.ComputePaddedConvexDecompositionFromTriMesh(trimesh,padding)
-                        cdhulls = []
-                        for hull in orghulls:
-                            if any(isnan(hull[0])):
-                                raise ConvexDecompositionError(u'geom link %s has NaNs', link.GetName())
-                            cdhulls.append((hull[0],hull[1],self.ComputeHullPlanes(hull)))
-                        geomhulls.append((ig,cdhulls))
-                self.linkgeometry.append(geomhulls)
+                            jobs.append((trimesh.vertices,trimesh.indices,True,padding,self.convexparams))
+                        jobgeometries.append((il,ig,link.GetName()))
+            numlinks = len(links)
+        if numprocesses is not None and numprocesses > 1 and len(jobs) > 1:
+            from multiprocessing import Pool
+            pool = Pool(min(numprocesses,len(jobs)))
+            try:
+                allcdhulls = pool.map(_ComputeGeometryHulls,jobs)
+            finally:
+                pool.terminate()
+                pool.join()
+        else:
+            allcdhulls = [_ComputeGeometryHulls(job) for job in jobs]
+        self.linkgeometry = [[] for il in range(numlinks)]
+        for (il,ig,linkname),cdhulls in izip(jobgeometries,allcdhulls):
+            if cdhulls is None:
+                raise ConvexDecompositionError(u'geom link %s has NaNs'%linkname)
+            self.linkgeometry[il].append((ig,cdhulls))
         self._padding = padding
         log.info(u'all convex decomposition finished in %fs',time.time()-starttime)
 
     def ComputePaddedConvexDecompositionFromTriMesh(self, trimesh, padding=0.0):
-        if len(trimesh.indices) > 0:
-            orghulls = convexdecompositionpy.computeConvexDecomposition(trimesh.vertices,trimesh.indices,**self.convexparams)
+        return self._ComputePaddedConvexDecomposition(trimesh.vertices, trimesh.indices, padding, self.convexparams)
+
+    @staticmethod
+    def _ComputePaddedConvexDecomposition(vertices, indices, padding, convexparams):
+        if len(indices) > 0:
+            orghulls = convexdecompositionpy.computeConvexDecomposition(vertices,indices,**convexparams)
         else:
             orghulls = []
         if len(orghulls) > 0:
             # add in the padding
             if padding != 0:
-                orghulls = [self.PadMesh(hull[0],hull[1],padding) for hull in orghulls]
+                orghulls = [ConvexDecompositionModel.PadMesh(hull[0],hull[1],padding) for hull in orghulls]
         return orghulls
     
     def ComputePaddedConvexHullFromTriMesh(self, trimesh, padding=0.0):
         """computes a padded convex hull from all the links and returns it as a list of trimeshes
         """
         if len(trimesh.indices) > 0:
-            if self._graspermodule is None:
-                self._graspermodule = RaveCreateModule(self.env,'grasper')
-                self.env.AddModule(self._graspermodule,self.robot.GetName())
-            cmd = StringIO()
-            cmd.write('ConvexHull returnplanes 0 returnfaces 0 returntriangles 1 points %d %d '%(len(trimesh.vertices),3))
-            for v in trimesh.vertices:
-                cmd.write('%.15e %.15e %.15e '%(v[0],v[1],v[2]))
-            minpos = numpy.min(trimesh.vertices,axis=0)
-            maxpos = numpy.max(trimesh.vertices,axis=0)
-            if all(abs(maxpos-minpos) <= 1e-7):
-                log.warn('trimesh of %d vertices is very small!', len(trimesh.vertices))
+            hullindices = self._ComputeConvexHullIndices(trimesh)
+            if hullindices is None:
                 return zeros((0,3), float), zeros((0,3),int)# trimesh.vertices, trimesh.indices
-            res = self._graspermodule.SendCommand(cmd.getvalue()).split()
-            if res is None:
-                raise ConvexDecompositionError(u'failed to compute convex hull')
-            
-            offset = 0
-            #numplanes = int(res[offset]); offset += 1
-            #planes = reshape(array(res[offset:(offset+4*numplanes)], float64), (numplanes,4))
-            #offset += 4*numplanes
-            numtriangles = int(res[offset]); offset += 1
-            return self.PadMesh(trimesh.vertices,reshape(array(res[offset:(offset+3*numtriangles)],int32),(numtriangles,3)), padding)
+            return self.PadMesh(trimesh.vertices,hullindices, padding)
+
+    def _ComputeConvexHullIndices(self, trimesh):
+        """computes the triangles of the convex hull of the trimesh vertices with the grasper module, returns None if the trimesh is too small
+        """
+        if self._graspermodule is None:
+            self._graspermodule = RaveCreateModule(self.env,'grasper')
+            self.env.AddModule(self._graspermodule,self.robot.GetName())
+        cmd = StringIO()
+        cmd.write('ConvexHull returnplanes 0 returnfaces 0 returntriangles 1 points %d %d '%(len(trimesh.vertices),3))
+        for v in trimesh.vertices:
+            cmd.write('%.15e %.15e %.15e '%(v[0],v[1],v[2]))
+        minpos = numpy.min(trimesh.vertices,axis=0)
+        maxpos = numpy.max(trimesh.vertices,axis=0)
+        if all(abs(maxpos-minpos) <= 1e-7):
+            log.warn('trimesh of %d vertices is very small!', len(trimesh.vertices))
+            return None
+        res = self._graspermodule.SendCommand(cmd.getvalue()).split()
+        if res is None:
+            raise ConvexDecompositionError(u'failed to compute convex hull')
+        
+        offset = 0
+        #numplanes = int(res[offset]); offset += 1
+        #planes = reshape(array(res[offset:(offset+4*numplanes)], float64), (numplanes,4))
+        #offset += 4*numplanes
+        numtriangles = int(res[offset]); offset += 1
+        return reshape(array(res[offset:(offset+3*numtriangles)],int32),(numtriangles,3))
         
     @staticmethod
     def PadMesh(vertices, indices, padding, mergeDuplicated=True, rtol=1e-05, atol=1e-08, setNormalsAwayFromCenter=False):
@@ -352,12 +464,7 @@ class ConvexDecompositionModel(DatabaseGenerator):
         M = mean(vertices,0)
         
         # Merge duplicated vertices (+- epsilon)
-        indices_raveled = indices.ravel()
-        vertices_map = arange(len(vertices), dtype=indices.dtype)
-        for a in range(len(vertices) - 1):
-            if vertices_map[a] == a:
-                combine = a + 1 + flatnonzero(isclose(vertices[a], vertices[a+1:], rtol, atol).all(axis=1))
-                vertices_map[combine] = a
+        vertices_map = ConvexDecompositionModel._ComputeDuplicatedVerticesMap(vertices, rtol, atol).astype(indices.dtype)
         indices = vertices_map[indices.ravel()].reshape(-1, 3)
         
         vertices_0 = vertices[indices[:, 0]]
@@ -387,32 +494,34 @@ class ConvexDecompositionModel(DatabaseGenerator):
             originaledges_n[:, 3] = offsets + j1#where(swap, j1, j0)
             originaledges_n[:, 4] = swap
         
-        # find the connecting edges across the new faces
-        offset = 0
-        verticesofinterest = {}
-        for i,edge in enumerate(originaledges):
-            inds = flatnonzero(logical_and(edge[0]==originaledges[i+1:,0],edge[1]==originaledges[i+1:,1]))
-            if len(inds) > 0:
-                # add 2 triangles for the edge, and 2 for each vertex
-                cedge = originaledges[i+1+inds[0]]
-                if not edge[0] in verticesofinterest:
-                    verticesofinterest[edge[0]] = len(newvertices)+offset
-                    offset += 1
-                if not edge[1] in verticesofinterest:
-                    verticesofinterest[edge[1]] = len(newvertices)+offset
-                    offset += 1
-                newindices = r_[newindices,[[edge[2],cedge[3],edge[3]],[edge[3],cedge[3],cedge[2]]]]
-                if edge[4] == 0:
-                    newindices = r_[newindices, [[edge[3],cedge[2],verticesofinterest[edge[0]]],[cedge[3],edge[2],verticesofinterest[edge[1]]]]]
-                else:
-                    newindices = r_[newindices, [[cedge[3],edge[2],verticesofinterest[edge[0]]],[edge[3],cedge[2],verticesofinterest[edge[1]]]]]
-        if offset > 0:
-            newvertices = r_[newvertices,zeros((offset,3))]
-        # for every vertex, add a point representing the mean of surrounding extruded vertices
-        for originalvertex, newvertex in verticesofinterest.iteritems():
-            vertexindices = flatnonzero(indices==originalvertex)
-            assert(len(vertexindices) > 0)
-            newvertices[newvertex,:] = mean(newvertices[vertexindices],0)
+        # find the connecting edges across the new faces: every edge is connected to the next edge with the same vertices. Sorting the edges by vertices, and then by position, puts them next to each other
+        edgeorder = lexsort((arange(len(originaledges)), originaledges[:,1], originaledges[:,0]))
+        sortededges = originaledges[edgeorder]
+        connected = flatnonzero(logical_and(sortededges[:-1,0]==sortededges[1:,0], sortededges[:-1,1]==sortededges[1:,1]))
+        pairorder = argsort(edgeorder[connected], kind='mergesort')
+        edges = sortededges[connected[pairorder]]
+        cedges = sortededges[connected[pairorder]+1]
+        if len(edges) > 0:
+            # add 2 triangles for the edge, and 2 for each vertex. The new vertices are numbered in the order the original vertices are first met
+            originalvertices = edges[:,0:2].ravel()
+            uniquevertices, firstindices, inverse = unique(originalvertices, return_index=True, return_inverse=True)
+            ranks = empty(len(uniquevertices), int)
+            ranks[argsort(firstindices, kind='mergesort')] = arange(len(uniquevertices))
+            verticesofinterest = (len(newvertices)+ranks[inverse]).reshape(-1, 2)
+            swapped = (edges[:,4] != 0)[:, newaxis]
+            edgeindices = empty((len(edges), 4, 3), int)
+            edgeindices[:,0] = c_[edges[:,2],cedges[:,3],edges[:,3]]
+            edgeindices[:,1] = c_[edges[:,3],cedges[:,3],cedges[:,2]]
+            edgeindices[:,2] = c_[where(swapped, c_[cedges[:,3],edges[:,2]], c_[edges[:,3],cedges[:,2]]), verticesofinterest[:,0]]
+            edgeindices[:,3] = c_[where(swapped, c_[edges[:,3],cedges[:,2]], c_[cedges[:,3],edges[:,2]]), verticesofinterest[:,1]]
+            newindices = r_[newindices, edgeindices.reshape(-1, 3)]
+            
+            # for every vertex, add a point representing the mean of surrounding extruded vertices
+            numvertices = len(newvertices)
+            counts = bincount(indices.ravel(), minlength=len(vertices))[uniquevertices]
+            means = c_[[bincount(indices.ravel(), weights=newvertices[:,j], minlength=len(vertices))[uniquevertices] for j in range(3)]].T/counts[:, newaxis]
+            newvertices = r_[newvertices,zeros((len(uniquevertices),3))]
+            newvertices[numvertices+ranks] = means
         assert(not any(isnan(newvertices)))
         
         # make sure all faces are facing outward
@@ -420,17 +529,101 @@ class ConvexDecompositionModel(DatabaseGenerator):
             newvertices_0 = newvertices[newindices[:, 0]]
             flip = inner1d(cross(newvertices[newindices[:, 1]] - newvertices_0,
                                  newvertices[newindices[:, 2]] - newvertices_0), newvertices_0 - M) < 0
-            for n, inds in enumerate(newindices):
-                if flip[n]:
-                    inds[1],inds[2] = inds[2],inds[1]
+            newindices[flip, 1:3] = newindices[flip, 2:0:-1]
         
         return newvertices,newindices
     
+    @staticmethod
+    def _ComputeDuplicatedVerticesMap(vertices, rtol=1e-05, atol=1e-08):
+        """maps every vertex to the first vertex it is merged with. In order of index, every vertex a that is not merged yet takes all the later vertices b with isclose(vertices[a], vertices[b]).
+        """
+        vertices_map = arange(len(vertices))
+        if len(vertices) < 2:
+            return vertices_map
+        first, second = ConvexDecompositionModel._FindCandidatePairs(vertices, atol + rtol*numpy.max(abs(vertices)))
+        close = (abs(vertices[first] - vertices[second]) <= atol + rtol*abs(vertices[second])).all(axis=1)
+        first = first[close]
+        second = second[close]
+        order = argsort(first, kind='mergesort')
+        mergedmap = range(len(vertices))
+        for a, b in izip(first[order].tolist(), second[order].tolist()):
+            if mergedmap[a] == a:
+                mergedmap[b] = a
+        return array(mergedmap)
+    
+    @staticmethod
+    def _FindCandidatePairs(points, tol):
+        """finds the pairs of points that can be closer than tol in every coordinate, by hashing the points on a grid with cells larger than tol: such points are in the same or adjacent cells.
+
+        :return: (first, second) the indices of the candidate pairs, first < second
+        """
+        if len(points) < 2:
+            return zeros(0,int), zeros(0,int)
+        numdims = points.shape[1]
+        cellsize = tol*(1+1e-9) if tol > 0 else 1.0
+        while True:
+            cells = floor(points/cellsize).astype(int64)
+            # number the cells with the ranks of their coordinates. Coarser cells give the same candidates and more of them, they are only used if the keys would overflow
+            axisvalues = []
+            axisranks = []
+            numkeys = 1
+            for j in range(numdims):
+                values, ranks = unique(cells[:,j], return_inverse=True)
+                axisvalues.append(values)
+                axisranks.append(ranks.ravel())
+                numkeys *= len(values)
+            if numkeys < 2**62:
+                break
+            cellsize *= 2
+        def GetCellKeys(offset):
+            keys = zeros(len(cells), int64)
+            valid = ones(len(cells), bool)
+            for j in range(numdims):
+                ranks = axisranks[j] + offset[j]
+                if offset[j] != 0:
+                    ranks = minimum(maximum(ranks, 0), len(axisvalues[j])-1)
+                    valid &= axisvalues[j][ranks] == cells[:,j] + offset[j]
+                keys = keys*len(axisvalues[j]) + ranks
+            return keys, valid
+        
+        cellkeys, valid = GetCellKeys((0,)*numdims)
+        cellorder = argsort(cellkeys, kind='mergesort')
+        sortedkeys = cellkeys[cellorder]
+        # visit every pair of adjacent cells once: the same cell, and the offsets whose first non-zero coordinate is positive
+        offsets = [(0,)*numdims]
+        for j in range(numdims):
+            tails = [()]
+            for k in range(numdims-j-1):
+                tails = [tail + (d,) for tail in tails for d in (-1,0,1)]
+            offsets += [(0,)*j + (1,) + tail for tail in tails]
+        allfirst = []
+        allsecond = []
+        for offset in offsets:
+            if offset == offsets[0]:
+                # the queries in sorted order are much faster to search
+                first = cellorder
+                querykeys = sortedkeys
+            else:
+                keys, valid = GetCellKeys(offset)
+                first = flatnonzero(valid)
+                querykeys = keys[first]
+            lower = searchsorted(sortedkeys, querykeys, 'left')
+            counts = searchsorted(sortedkeys, querykeys, 'right') - lower
+            first = repeat(first, counts)
+            second = cellorder[repeat(lower - cumsum(counts) + counts, counts) + arange(len(first))]
+            if offset == offsets[0]:
+                keep = first < second
+                first = first[keep]
+                second = second[keep]
+            allfirst.append(minimum(first, second))
+            allsecond.append(maximum(first, second))
+        return concatenate(allfirst), concatenate(allsecond)
+    
     @staticmethod
     def ComputeHullPlanes(hull,thresh=0.99999):
         """computes the planes of a hull
         
-        The computed planes point outside of the mesh. Therefore a point is inside only if the distance to all planes is negative.
+        The computed planes point outside of the mesh. Therefore a point is inside only if the distance to all planes is negative. The normals of the planes have unit length, so the distances are in the units of the hull.
         """
         if len(hull[0]) == 0:
             return zeros((0,4),float)
@@ -439,64 +632,124 @@ class ConvexDecompositionModel(DatabaseGenerator):
         v0 = hull[0][hull[1][:,0],:]
         v1 = hull[0][hull[1][:,1],:]-v0
         v2 = hull[0][hull[1][:,2],:]-v0
-        normals = cross(v1,v2,1)/sqrt(sum(v1**2)*sum(v2**2)) # need to multiply by lengths because of floating-point precision problems
-        planes = c_[normals,-sum(normals*v0,1)]
+        # normalize each face by its own area, degenerate faces do not define a plane
+        normals = cross(v1,v2,1)
+        lengths = sqrt(sum(normals**2,1))
+        validfaces = flatnonzero(lengths>0)
+        normals = normals[validfaces]/lengths[validfaces,newaxis]
+        planes = c_[normals,-sum(normals*v0[validfaces],1)]
         meandist = dot(planes[:,0:3],vm)+planes[:,3]
         planes = r_[planes[flatnonzero(meandist<-1e-7)],-planes[flatnonzero(meandist>1e-7)]]
         if len(planes) == 0:
             return planes
-        normalizedplanes = planes/transpose(tile(sqrt(sum(planes**2,1)),(4,1)))
-        # prune similar planes
+        normalizedplanes = planes/sqrt(sum(planes**2,1))[:,newaxis]
+        # prune similar planes, a plane is removed if it is similar to any plane before it. The normalized planes are similar when closer than sqrt(2*(1-thresh)), so only the nearby planes are compared
         uniqueplanes = ones(len(planes),bool)
-        for i in range(len(normalizedplanes)-1):
-            uniqueplanes[i+1:] &= dot(normalizedplanes[i+1:,:],normalizedplanes[i])<thresh
+        first, second = ConvexDecompositionModel._FindCandidatePairs(normalizedplanes, sqrt(2*(1-thresh)) if thresh < 1 else 0.0)
+        similar = logical_not(sum(normalizedplanes[first]*normalizedplanes[second],1)<thresh)
+        uniqueplanes[second[similar]] = False
         return planes[uniqueplanes]
     
     def testPointsInside(self,points):
         """tests if a point is inside the convex mesh of the robot.
 
-        Returns an array the same length as points that specifies whether the point is in or not. This method is not meant to be optimized (use C++ for that).
+        Returns an array the same length as points that specifies whether the point is in or not. The points are first culled with the bounding boxes of the links, of the geometries and of the hulls, so only the points close to a hull are tested against its planes.
         """
+        points = asarray(points)
+        inside = zeros(len(points),bool)
+        linkhulls = self._GetPointQueryHulls()
         with self.env:
-            inside = zeros(len(points),bool)
             leftinds = arange(len(points))
-            leftpoints = points[:]
             for ilink,link in enumerate(self.robot.GetLinks()):
                 if len(leftinds) == 0:
                     break
+                Tlink = link.GetTransform()
+                geometryboxes = []
                 for ig,geom in enumerate(link.GetGeometries()):
-                    T = dot(link.GetTransform(),geom.GetTransform())
-                    localpoints = transformInversePoints(T,leftpoints)
-                    cdhulls = [cdhull for ig2,cdhull in self.linkgeometry[ilink] if ig2==ig]
-                    if len(cdhulls) > 0:
-                        for ihull,hull in enumerate(cdhulls[0]):
-                            insideinds = numpy.all(dot(localpoints,transpose(hull[2][:,0:3]))+tile(hull[2][:,3],(len(localpoints),1))<=0,1)
-                            inside[leftinds[flatnonzero(insideinds)]] = True
-                            outsideinds = flatnonzero(insideinds==0)
-                            if len(outsideinds) > 0:
-                                leftpoints = leftpoints[outsideinds]
-                                leftinds = leftinds[outsideinds]
-                                localpoints = localpoints[outsideinds]
-                            if len(leftinds) == 0:
-                                break
+                    hulls = linkhulls[ilink].get(ig)
+                    if hulls is not None:
+                        if len(hulls) == 0:
+                            continue
+                        aabbmin = numpy.min([hull[0] for hull in hulls],0)
+                        aabbmax = numpy.max([hull[1] for hull in hulls],0)
+                    else:
+                        if geom.GetType() == KinBody.Link.GeomType.Box:
+                            aabbmax = array(geom.GetBoxExtents())
+                        elif geom.GetType() == KinBody.Link.GeomType.Sphere:
+                            aabbmax = geom.GetSphereRadius()*ones(3)
+                        elif geom.GetType() == KinBody.Link.GeomType.Cylinder:
+                            # cylinders are oriented along the z-axis
+                            aabbmax = array([geom.GetCylinderRadius(),geom.GetCylinderRadius(),0.5*geom.GetCylinderHeight()])
+                        else:
+                            continue
+                        aabbmin = -aabbmax
+                    T = dot(Tlink,geom.GetTransform())
+                    geometryboxes.append((geom,T,hulls,self._ComputeWorldAABB(T,aabbmin,aabbmax)))
+                if len(geometryboxes) == 0:
+                    continue
+                
+                # cull with the box around all the geometries of the link
+                linkmin = numpy.min([box[3][0] for box in geometryboxes],0)
+                linkmax = numpy.max([box[3][1] for box in geometryboxes],0)
+                linkinds = leftinds[self._PointsInAABB(points[leftinds],linkmin,linkmax)]
+                for geom,T,hulls,(worldmin,worldmax) in geometryboxes:
+                    if len(linkinds) == 0:
+                        break
+                    geominds = linkinds[self._PointsInAABB(points[linkinds],worldmin,worldmax)]
+                    if len(geominds) == 0:
                         continue
+                    localpoints = transformInversePoints(T,points[geominds])
+                    if hulls is not None:
+                        insideinds = zeros(len(geominds),bool)
+                        for hullmin,hullmax,planes in hulls:
+                            hullinds = flatnonzero(self._PointsInAABB(localpoints,hullmin,hullmax))
+                            insideinds[self._PointsInsideHull(localpoints,planes,hullinds)] = True
                     elif geom.GetType() == KinBody.Link.GeomType.Box:
                         insideinds = numpy.all(numpy.less_equal(abs(localpoints), geom.GetBoxExtents()) ,1)
                     elif geom.GetType() == KinBody.Link.GeomType.Sphere:
                         insideinds = numpy.less_equal(sum(localpoints**2,1), geom.GetSphereRadius()**2)
                     elif geom.GetType() == KinBody.Link.GeomType.Cylinder:
-                        insideinds = numpy.less_equal(abs(localpoints[:,1]), 0.5*geom.GetCylinderHeight()) and numpy.less_equal(localpoint[:,0]**2+localpoint[:2]**2, geom.GetCylinderRadius()**2)
-                    else:
-                        continue
-                    inside[leftinds[flatnonzero(insideinds)]] = True
-                    outsideinds = flatnonzero(insideinds==0)
-                    if len(outsideinds) > 0:
-                        leftpoints = leftpoints[outsideinds]
-                        leftinds = leftinds[outsideinds]
-                    if len(leftinds) == 0:
-                        break
+                        insideinds = numpy.logical_and(numpy.less_equal(abs(localpoints[:,2]), 0.5*geom.GetCylinderHeight()), numpy.less_equal(localpoints[:,0]**2+localpoints[:,1]**2, geom.GetCylinderRadius()**2))
+                    inside[geominds[insideinds]] = True
+                    linkinds = linkinds[logical_not(inside[linkinds])]
+                leftinds = leftinds[logical_not(inside[leftinds])]
         return inside
-
+    
+    def _GetPointQueryHulls(self):
+        """returns for every link a dictionary from the geometry index to the list of (aabbmin, aabbmax, planes) of its hulls, in the geometry frame. Hulls without planes are left out since they cannot contain points. Recomputed only when linkgeometry changes.
+        """
+        if self._pointqueryhulls is None or self._pointqueryhulls[0] is not self.linkgeometry:
+            linkhulls = []
+            for linkgeometry in self.linkgeometry:
+                geometryhulls = {}
+                for ig,hulls in linkgeometry:
+                    geometryhulls[ig] = [(numpy.min(hull[0],0),numpy.max(hull[0],0),hull[2]) for hull in hulls if len(hull[0]) > 0 and len(hull[2]) > 0]
+                linkhulls.append(geometryhulls)
+            self._pointqueryhulls = (self.linkgeometry,linkhulls)
+        return self._pointqueryhulls[1]
+    
+    @staticmethod
+    def _ComputeWorldAABB(T,aabbmin,aabbmax):
+        """returns the (min, max) corners of the world axis-aligned box containing the box (aabbmin, aabbmax) transformed by T
+        """
+        center = dot(T[0:3,0:3],0.5*(aabbmin+aabbmax))+T[0:3,3]
+        extents = dot(abs(T[0:3,0:3]),0.5*(aabbmax-aabbmin))
+        return center-extents, center+extents
+    
+    @staticmethod
+    def _PointsInAABB(points,aabbmin,aabbmax):
+        return numpy.all(logical_and(points >= aabbmin, points <= aabbmax),1)
+    
+    @staticmethod
+    def _PointsInsideHull(points,planes,inds):
+        """returns the indices among inds of the points inside all the planes. The points out of a plane are dropped before testing the next plane.
+        """
+        for plane in planes:
+            if len(inds) == 0:
+                break
+            inds = inds[dot(points[inds],plane[0:3])+plane[3] <= 0]
+        return inds
+    
     def GetGeometryInfosFromLink(self,ilink,preservetransform=False,color=None):
         """gets a list of geometries for the link
         :param preservetransform: if True, will set the same geometry transform as the original geometry. Otherwise will pre-multiply with the new trimesh.
@@ -650,6 +903,8 @@ class ConvexDecompositionModel(DatabaseGenerator):
                           help='Whether or not to perform island generation at each split.  Currently disabled due to bug in RemoveTjunctions (default=%default).')
         parser.add_option('--convexHullLinks',action='store',type='str',dest='convexHullLinks',default='',
                           help='comma separated list of link names to compute convex hull for instead')
+        parser.add_option('--numprocesses',action='store',type='int',dest='numprocesses',default=None,
+                          help='if greater than 1, the number of processes decomposing the geometries in parallel (default=%default)')
         return parser
     @staticmethod
     def RunFromParser(Model=None,parser=None,args=None,**kwargs):
@@ -667,6 +922,26 @@ class ConvexDecompositionModel(DatabaseGenerator):
             env.Destroy()
             RaveDestroy()
 
+def _ComputeGeometryHulls(args):
+    """computes the padded hulls and their planes for one geometry, the unit of work of ConvexDecompositionModel.generate. Defined at module level so that it can be sent to a process pool.
+
+    :param args: (vertices, indices, decompose, padding, convexparams). If decompose is False, the indices are the triangles of the convex hull, which is padded unless padding is None.
+    :return: list of (vertices,indices,planes), or None if a hull has NaNs
+    """
+    vertices, indices, decompose, padding, convexparams = args
+    if decompose:
+        orghulls = ConvexDecompositionModel._ComputePaddedConvexDecomposition(vertices,indices,padding,convexparams)
+    elif padding is None:
+        orghulls = [(vertices,indices)]
+    else:
+        orghulls = [ConvexDecompositionModel.PadMesh(vertices,indices,padding)]
+    cdhulls = []
+    for hull in orghulls:
+        if any(isnan(hull[0])):
+            return None
+        cdhulls.append((hull[0],hull[1],ConvexDecompositionModel.ComputeHullPlanes(hull)))
+    return cdhulls
+
 def run(*args,**kwargs):
     """Command-line execution of the example. ``args`` specifies a list of the arguments to the script.
     """
@@ -1042,7 +1042,7 @@ class InverseKinematicsModel(DatabaseGenerator):
                         sols = self.manip.FindIKSolutions(ikparam,IkFilterOptions.CheckEnvCollisions)
                         weights = self.robot.GetDOFWeights(self.manip.GetArmIndices())
                         log.info('found %d solutions'%len(sols))
-                        sols = TSP(sols,lambda x,y: sum(weights*(x-y)**2))
+                        sols = TSP(sols,weights=weights,start=self.robot.GetDOFValues(self.manip.GetArmIndices()))[0]
                         # find shortest route
                         for sol in sols:
                             self.robot.SetDOFValues(sol,self.manip.GetArmIndices())
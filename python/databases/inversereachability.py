@@ -50,13 +50,14 @@ __copyright__ = 'Copyright (C) 2009-2010 Rosen Diankov (rosen.diankov@gmail.com)
 __license__ = 'Apache License, Version 2.0'
 
 import time,bisect
+from collections import OrderedDict
 
 if not __openravepy_build_doc__:
     from numpy import *
 else:
     from numpy import array
 
-from ..openravepy_int import RaveFindDatabaseFile, RaveCreateRobot, IkParameterization, rotationMatrixFromAxisAngle, poseFromMatrix, matrixFromPose, matrixFromQuat, matrixFromAxisAngle, poseMult, quatFromAxisAngle, IkFilterOptions
+from ..openravepy_int import RaveFindDatabaseFile, RaveCreateRobot, IkParameterization, rotationMatrixFromAxisAngle, poseFromMatrix, poseFromMatrices, matrixFromPose, matrixFromQuat, matrixFromAxisAngle, poseMult, quatFromAxisAngle, IkFilterOptions
 from ..openravepy_ext import quatArrayTMult, quatArrayTDist, poseMultArrayT, normalizeZRotation
 from . import DatabaseGenerator
 from .. import pyANN
@@ -74,6 +75,36 @@ try:
 except ImportError:
     print 'could not import scipy.optimize.leastsq'
 
+def _ComputeEquivalenceClassStatistics(args):
+    """Computes the statistics of one equivalence class of base transforms.
+
+    Defined at the module level so that it can be dispatched to a multiprocessing pool.
+
+    :param args: tuple of (equivalenttrans,Nminimum) where equivalenttrans is a Nx8 array of the base poses and number of solutions
+    :return: (mean,std,samples) of the equivalence class
+    """
+    equivalenttrans,Nminimum = args
+    normalizedqarray,zangles = normalizeZRotation(equivalenttrans[:,0:4])
+    # get the 'mean' of the normalized quaternions best describing the distribution
+    # for initialization, make sure all quaternions are on the same hemisphere
+    identityquat = tile(array((1.0,0,0,0)),(normalizedqarray.shape[0],1))
+    normalizedqarray[flatnonzero(sum((normalizedqarray+identityquat)**2,1) < sum((normalizedqarray-identityquat)**2, 1)),0:4] *= -1
+    q0 = sum(normalizedqarray,axis=0)
+    q0 /= sqrt(sum(q0**2))
+    if len(normalizedqarray) >= Nminimum:
+        qmean,success = leastsq(lambda q: quatArrayTDist(q/sqrt(sum(q**2)),normalizedqarray), normalizedqarray[0],maxfev=10000)
+        qmean /= sqrt(sum(qmean**2))
+    else:
+        qmean = q0
+    qstd = sqrt(sum(quatArrayTDist(qmean,normalizedqarray)**2)/len(normalizedqarray))
+    # compute statistics, store the angle, xy offset, and remaining unprocessed data
+    czangles = cos(zangles)
+    szangles = sin(zangles)
+    equivalenttransinv = -c_[czangles*equivalenttrans[:,4]+szangles*equivalenttrans[:,5],-szangles*equivalenttrans[:,4]+czangles*equivalenttrans[:,5]]
+    return (r_[qmean,mean(equivalenttrans[:,6])],
+            r_[qstd,std(equivalenttrans[:,6])],
+            c_[-zangles,equivalenttransinv,equivalenttrans[:,7:]])
+
 class InverseReachabilityModel(DatabaseGenerator):
     """Inverts the reachability and computes probability distributions of the robot's base given an end effector position"""
     def __init__(self,robot,id=None):
@@ -81,12 +112,16 @@ class InverseReachabilityModel(DatabaseGenerator):
         self.rmodel = kinematicreachability.ReachabilityModel(robot=robot)
         self.ikmodel = inversekinematics.InverseKinematicsModel(robot=robot,iktype=IkParameterization.Type.Transform6D)
         self.equivalenceclasses = None
+        self.equivalencekdtree = None
         self.rotweight = 0.2 # in-plane rotation weight with respect to xy offset
+        self.maxbasedistributioncachebytes = 100*1024*1024 # max memory used by the cached base distributions
+        self.clearBaseDistributionCache()
         self.id=id
         with self.robot:
             self.jointvalues = self.robot.GetDOFValues(self.getdofindices(self.manip))
     def clone(self,envother):
         clone = DatabaseGenerator.clone(self,envother)
+        clone.clearBaseDistributionCache()
         return clone        
     def has(self):
         return self.equivalenceclasses is not None and len(self.equivalenceclasses) > 0
@@ -117,6 +152,8 @@ class InverseReachabilityModel(DatabaseGenerator):
         samplingbandwidth = array([self.quatdelta*0.1,self.xyzdelta*0.1])
         self.equivalenceweights = array([-0.5/(e[1]+samplingbandwidth)**2 for e in self.equivalenceclasses])
         self.equivalenceoffset = array([self.classnormalizationconst(e[1]+samplingbandwidth) for e in self.equivalenceclasses])
+        self.equivalencekdtree = None
+        self.clearBaseDistributionCache()
 
     def save(self):
         DatabaseGenerator.save(self,(self.equivalenceclasses,self.rotweight,self.xyzdelta,self.quatdelta,self.jointvalues))
@@ -155,7 +192,9 @@ class InverseReachabilityModel(DatabaseGenerator):
         heightthresh=None
         quatthresh=None
         Nminimum=None
+        numthreads=None
         if options is not None:
+            numthreads=options.numthreads
             if options.heightthresh is not None:
                 heightthresh=options.heightthresh
             if options.quatthresh is not None:
@@ -170,12 +209,17 @@ class InverseReachabilityModel(DatabaseGenerator):
                 heightthresh=0.05
             if quatthresh is None:
                 quatthresh=0.15            
-        self.generate(heightthresh=heightthresh,quatthresh=quatthresh,Nminimum=Nminimum)
+        self.generate(heightthresh=heightthresh,quatthresh=quatthresh,Nminimum=Nminimum,numthreads=numthreads)
         self.save()
-    def generate(self,heightthresh=None,quatthresh=None,Nminimum=None):
+    def generate(self,heightthresh=None,quatthresh=None,Nminimum=None,numthreads=None):
         """First transform all end effectors to the identity and get the robot positions,
         then cluster the robot position modulo in-plane rotation (z-axis) and position (xy),
-        then compute statistics for each cluster."""
+        then compute statistics for each cluster.
+
+        The kdtree of the robot positions is built only once, positions are marked as consumed as the clusters are extracted.
+
+        :param numthreads: if > 1, will compute the statistics of the clusters in parallel with a process pool
+        """
         # disable every body but the target and robot
         bodies = [(b,b.IsEnabled()) for b in self.env.GetBodies() if b != self.robot]
         for b in bodies:
@@ -212,65 +256,106 @@ class InverseReachabilityModel(DatabaseGenerator):
             searchtrans = c_[basetrans[:,0:4],basetrans[:,6:7]]
             kdtree = kinematicreachability.ReachabilityModel.QuaternionKDTree(searchtrans,1.0/self.rotweight)
             transdensity = kdtree.kFRSearchArray(searchtrans,0.25*quateucdist2,0,quatthresh*0.2)[2]
-            basetrans = basetrans[argsort(-transdensity),:]
+            # the clusters are seeded from the densest points first
+            seedorder = argsort(-transdensity)
+            seedrank = zeros(len(seedorder),int)
+            seedrank[seedorder] = arange(len(seedorder))
             Nminimum = max(Nminimum,4)
-            # find all equivalence classes
+            # find all equivalence classes. the same kdtree is used for all the queries, poses are marked as they are consumed by an equivalence class
             quatrolls = array([quatFromAxisAngle(array((0,0,1)),roll) for roll in arange(0,2*pi,quatthresh*0.5)])
-            self.equivalenceclasses = []
-            while len(basetrans) > 0:
-                searchtrans = c_[basetrans[:,0:4],basetrans[:,6:7]]
-                kdtree = kinematicreachability.ReachabilityModel.QuaternionKDTree(searchtrans,1.0/self.rotweight)
-                querypoints = c_[quatArrayTMult(quatrolls, searchtrans[0][0:4]),tile(searchtrans[0][4:],(len(quatrolls),1))]
-                foundindices = zeros(len(searchtrans),bool)
-                for querypoint in querypoints:
-                    k = min(len(searchtrans),1000)
-                    neighs,dists,kball = kdtree.kFRSearchArray(reshape(querypoint,(1,5)),quateucdist2,k,quatthresh*0.01)
-                    if k < kball:
-                        neighs,dists,kball = kdtree.kFRSearchArray(reshape(querypoint,(1,5)),quateucdist2,kball,quatthresh*0.01)
-                    foundindices[neighs] = True
-                equivalenttrans = basetrans[flatnonzero(foundindices),:]
-                normalizedqarray,zangles = normalizeZRotation(equivalenttrans[:,0:4])
-                # get the 'mean' of the normalized quaternions best describing the distribution
-                # for initialization, make sure all quaternions are on the same hemisphere
-                identityquat = tile(array((1.0,0,0,0)),(normalizedqarray.shape[0],1))
-                normalizedqarray[flatnonzero(sum((normalizedqarray+identityquat)**2,1) < sum((normalizedqarray-identityquat)**2, 1)),0:4] *= -1
-                q0 = sum(normalizedqarray,axis=0)
-                q0 /= sqrt(sum(q0**2))
-                if len(normalizedqarray) >= Nminimum:
-                    qmean,success = leastsq(lambda q: quatArrayTDist(q/sqrt(sum(q**2)),normalizedqarray), normalizedqarray[0],maxfev=10000)
-                    qmean /= sqrt(sum(qmean**2))
-                else:
-                    qmean = q0
-                qstd = sqrt(sum(quatArrayTDist(qmean,normalizedqarray)**2)/len(normalizedqarray))
-                # compute statistics, store the angle, xy offset, and remaining unprocessed data
-                czangles = cos(zangles)
-                szangles = sin(zangles)
-                equivalenttransinv = -c_[czangles*equivalenttrans[:,4]+szangles*equivalenttrans[:,5],-szangles*equivalenttrans[:,4]+czangles*equivalenttrans[:,5]]
-                equivalenceclass = (r_[qmean,mean(equivalenttrans[:,6])],
-                                    r_[qstd,std(equivalenttrans[:,6])],
-                                    c_[-zangles,equivalenttransinv,equivalenttrans[:,7:]])
-                self.equivalenceclasses.append(equivalenceclass)
-                basetrans = basetrans[flatnonzero(foundindices==False),:]
-                log.info('new equivalence class outliers: %d/%d, left over trans: %d',self.testEquivalenceClass(equivalenceclass)*len(zangles),len(zangles),len(basetrans))
+            consumed = zeros(len(basetrans),bool)
+            classindices = []
+            iseed = 0
+            numleft = len(basetrans)
+            while numleft > 0:
+                while consumed[seedorder[iseed]]:
+                    iseed += 1
+                seedindex = seedorder[iseed]
+                querypoints = c_[quatArrayTMult(quatrolls, searchtrans[seedindex][0:4]),tile(searchtrans[seedindex][4:],(len(quatrolls),1))]
+                k = min(2*len(searchtrans),1000)
+                neighs,dists,kball = kdtree.kFRSearchArray(querypoints,quateucdist2,k,quatthresh*0.01)
+                if k < numpy.max(kball):
+                    neighs,dists,kball = kdtree.kFRSearchArray(querypoints,quateucdist2,min(2*len(searchtrans),numpy.max(kball)),quatthresh*0.01)
+                neighs = unique(neighs[neighs>=0])
+                inds = union1d([seedindex],neighs[consumed[neighs]==False])
+                # order the class from the densest pose, which starts the quaternion mean search
+                inds = inds[argsort(seedrank[inds])]
+                consumed[inds] = True
+                numleft -= len(inds)
+                classindices.append(inds)
+                log.debug('new equivalence class size: %d, left over trans: %d',len(inds),numleft)
+            log.info('found %d equivalence classes, computing statistics',len(classindices))
+            if numthreads is not None and numthreads > 1 and len(classindices) > 1:
+                from multiprocessing import Pool
+                pool = Pool(numthreads)
+                try:
+                    self.equivalenceclasses = pool.map(_ComputeEquivalenceClassStatistics,[(basetrans[inds,:],Nminimum) for inds in classindices])
+                finally:
+                    pool.terminate()
+                    pool.join()
+            else:
+                self.equivalenceclasses = [_ComputeEquivalenceClassStatistics((basetrans[inds,:],Nminimum)) for inds in classindices]
+            for equivalenceclass in self.equivalenceclasses:
+                log.info('new equivalence class outliers: %d/%d',self.testEquivalenceClass(equivalenceclass)*len(equivalenceclass[2]),len(equivalenceclass[2]))
         finally:
             statesaver.Release()
             for b,enable in bodies:
                 b.Enable(enable)
         self.preprocess()
         
-    def getEquivalenceClass(self,Tgrasp):
+    def _ComputeBestEquivalenceClasses(self,Tbase,Tgrasps,usekdtree=False,chunksize=10000):
+        """Finds the closest equivalence class for every grasp with respect to the manipulator base in one vectorized pass.
+
+        :param Tbase: the manipulator base transform
+        :param Tgrasps: Nx4x4 array of grasp transforms
+        :param usekdtree: if True, only the nearest class means returned by a kdtree are evaluated
+        :return: bestindices,bestlogll,posetargets,znormangles where posetargets is the Nx7 array of the grasps in the base coordinate system
+        """
+        Tgrasps = reshape(Tgrasps,(-1,4,4))
+        if len(Tgrasps) == 0:
+            return array([],int),array([]),zeros((0,7)),array([])
+        posetargets = poseFromMatrices(swapaxes(dot(linalg.inv(Tbase),Tgrasps),0,1))
+        qnormalized,znormangles = normalizeZRotation(posetargets[:,0:4])
+        bestindices = zeros(len(Tgrasps),int)
+        bestlogll = zeros(len(Tgrasps))
+        if usekdtree and len(self.equivalencemeans) > 16:
+            if self.equivalencekdtree is None:
+                self.equivalencekdtree = kinematicreachability.ReachabilityModel.QuaternionKDTree(self.equivalencemeans,1.0/self.rotweight)
+            neighs,dists = self.equivalencekdtree.kSearchArray(c_[qnormalized,posetargets[:,6:7]],16,0.0)
+            # evaluate the exact log-likelihood only on the candidate classes
+            quatdists = arccos(minimum(1.0,abs(sum(qnormalized[:,newaxis,:]*self.equivalencemeans[neighs,0:4],2))))
+            logll = quatdists**2*self.equivalenceweights[neighs,0] + (posetargets[:,6:7]-self.equivalencemeans[neighs,4])**2*self.equivalenceweights[neighs,1] + self.equivalenceoffset[neighs]
+            bestcandidates = argmax(logll,1)
+            bestindices = neighs[arange(len(neighs)),bestcandidates]
+            bestlogll = logll[arange(len(neighs)),bestcandidates]
+        else:
+            # split into chunks to avoid creating large NxK matrices
+            for i in range(0,len(Tgrasps),chunksize):
+                quatdists = arccos(minimum(1.0,abs(dot(qnormalized[i:(i+chunksize)],transpose(self.equivalencemeans[:,0:4])))))
+                logll = quatdists**2*self.equivalenceweights[:,0] + (posetargets[i:(i+chunksize),6:7]-self.equivalencemeans[:,4])**2*self.equivalenceweights[:,1] + self.equivalenceoffset
+                bestindices[i:(i+chunksize)] = argmax(logll,1)
+                bestlogll[i:(i+chunksize)] = logll[arange(len(logll)),bestindices[i:(i+chunksize)]]
+        return bestindices,bestlogll,posetargets,znormangles
+
+    def getEquivalenceClassIndices(self,Tgrasps,usekdtree=False):
+        """Returns the index of the closest equivalence class and its log-likelihood for every grasp.
+
+        :param Tgrasps: Nx4x4 array of grasp transforms in the global coordinate system
+        :param usekdtree: if True, uses a kdtree over the class means to prune the classes evaluated for each grasp
+        :return: bestindices,logll arrays of length N
+        """
         with self.env:
             Tbase = self.manip.GetBase().GetTransform()
         posebase = poseFromMatrix(Tbase)
         qbaserobotnorm,zbaseangle = normalizeZRotation(reshape(posebase[0:4],(1,4)))
         if quatArrayTDist([1.0,0,0,0],qbaserobotnorm) > 0.05:
             raise planning_error('out of plane rotations for base are not supported')
-        posetarget = poseFromMatrix(dot(linalg.inv(Tbase),Tgrasp))
-        qnormalized,znormangle = normalizeZRotation(reshape(posetarget[0:4],(1,4)))
-        # find the closest cluster
-        logll = quatArrayTDist(qnormalized[0],self.equivalencemeans[:,0:4])**2*self.equivalenceweights[:,0] + (posetarget[6]-self.equivalencemeans[:,4])**2*self.equivalenceweights[:,1] + self.equivalenceoffset
-        bestindex = argmax(logll)
-        return self.equivalenceclasses[bestindex],logll[bestindex]
+        bestindices,bestlogll,posetargets,znormangles = self._ComputeBestEquivalenceClasses(Tbase,Tgrasps,usekdtree=usekdtree)
+        return bestindices,bestlogll
+
+    def getEquivalenceClass(self,Tgrasp):
+        bestindices,bestlogll = self.getEquivalenceClassIndices(reshape(Tgrasp,(1,4,4)))
+        return self.equivalenceclasses[bestindices[0]],bestlogll[0]
 
     def computeBaseDistribution(self,Tgrasp,logllthresh=2.0,zaxis=None):
         """Return a function of the distribution of possible positions of the robot such that Tgrasp is reachable. Also returns a sampler function"""
@@ -293,13 +378,11 @@ class InverseReachabilityModel(DatabaseGenerator):
         searchradius=9.0*sum(bandwidth**2)
         searcheps=bandwidth[0]*0.1
         
-        posetarget = poseFromMatrix(dot(linalg.inv(Tbase),Tgrasp))
-        qnormalized,znormangle = normalizeZRotation(reshape(posetarget[0:4],(1,4)))
         # find the closest cluster
-        logll = quatArrayTDist(qnormalized[0],self.equivalencemeans[:,0:4])**2*self.equivalenceweights[:,0] + (posetarget[6]-self.equivalencemeans[:,4])**2*self.equivalenceweights[:,1] + self.equivalenceoffset
-        bestindex = argmax(logll)
-        if logll[bestindex] < logllthresh:
-            log.info('inversereachability: could not find base distribution: index=%d',logll[bestindex])
+        bestindices,bestlogll,posetargets,znormangles = self._ComputeBestEquivalenceClasses(Tbase,reshape(Tgrasp,(1,4,4)))
+        bestindex,posetarget,znormangle = bestindices[0],posetargets[0],znormangles[0]
+        if bestlogll[0] < logllthresh:
+            log.info('inversereachability: could not find base distribution: index=%d',bestlogll[0])
             return None,None,None
 
         # transform the equivalence class to the global coord system and create a kdtree for faster retrieval
@@ -342,22 +425,59 @@ class InverseReachabilityModel(DatabaseGenerator):
             return poseMultArrayT(poserobot,c_[cos(samples[:,0]),zeros((N,2)),sin(samples[:,0]),samples[:,1:3],tile(Tbase[2,3],N)]),self.necessaryjointstate()
         return gaussiankerneldensity,gaussiankernelsampler,bounds
 
-    def computeAggregateBaseDistribution(self,Tgrasps,logllthresh=2.0,zaxis=None):
+    @staticmethod
+    def _QuantizePose(pose,resolution=0.001):
+        """quantizes a 7D pose to a tuple of integers that can be used as a hash key"""
+        pose = array(pose)
+        if pose[0] < 0:
+            pose[0:4] *= -1 # q and -q are the same rotation
+        return tuple(numpy.round(pose/resolution).astype(int))
+
+    def _AddToBaseDistributionCache(self,key,distribution,numbytes):
+        """adds a distribution to the LRU cache and evicts the least recently used ones until the cache fits in maxbasedistributioncachebytes"""
+        if numbytes > self.maxbasedistributioncachebytes:
+            return
+        self._basedistributioncache[key] = (distribution,numbytes)
+        self._basedistributioncachebytes += numbytes
+        while self._basedistributioncachebytes > self.maxbasedistributioncachebytes:
+            oldkey,(olddistribution,oldnumbytes) = self._basedistributioncache.popitem(last=False)
+            self._basedistributioncachebytes -= oldnumbytes
+
+    def clearBaseDistributionCache(self):
+        """clears all the distributions cached by computeAggregateBaseDistribution"""
+        self._basedistributioncache = OrderedDict()
+        self._basedistributioncachebytes = 0
+
+    def computeAggregateBaseDistribution(self,Tgrasps,logllthresh=2.0,zaxis=None,cachekey=None,Ttarget=None):
         """Return a function of the distribution of possible positions of the robot such that any grasp from Tgrasps is reachable.
-        Also computes a sampler function that returns a random position of the robot along with the index into Tgrasps"""
+        Also computes a sampler function that returns a random position of the robot along with the index into Tgrasps
+
+        :param cachekey: if not None, a hashable object identifying the grasp set (for example the target and grasp model). The constructed distribution is cached using cachekey, the quantized target pose Ttarget, the quantized offset of the robot from the manipulator base and the quantized height and out of plane rotation of the base. The distribution does not depend on the planar pose of the base, so revisiting the same target after the robot drove somewhere else does not rebuild it. Tgrasps is not iterated on a cache hit.
+        :param Ttarget: the transform of the target the grasps are computed for, used in the cache key
+        """
         if zaxis is not None:
             raise NotImplementedError('cannot specify a custom zaxis yet')
         with self.env:
             Tbase = self.manip.GetBase().GetTransform()
             poserobot = poseFromMatrix(dot(self.robot.GetTransform(),linalg.inv(Tbase)))
         
-        rotweight = self.rotweight
-        irotweight = 1.0/rotweight
         posebase = poseFromMatrix(Tbase)
         qbaserobotnorm,zbaseangle = normalizeZRotation(reshape(posebase[0:4],(1,4)))
         if quatArrayTDist([1.0,0,0,0],qbaserobotnorm) > 0.05:
             raise planning_error('out of plane rotations for base are not supported')
         
+        key = None
+        if cachekey is not None:
+            # the distribution is computed in the base frame and transformed back by the planar pose of the base, so only the rest of the base pose is in the key
+            key = (cachekey,logllthresh,self._QuantizePose(poseFromMatrix(Ttarget)) if Ttarget is not None else None,self._QuantizePose(r_[qbaserobotnorm[0],0,0,Tbase[2,3]]),self._QuantizePose(poserobot))
+            cached = self._basedistributioncache.pop(key,None)
+            if cached is not None:
+                # reinsert to mark as most recently used
+                self._basedistributioncache[key] = cached
+                return cached[0]
+        
+        rotweight = self.rotweight
+        irotweight = 1.0/rotweight
         bandwidth = array((rotweight*self.quatdelta ,self.xyzdelta,self.xyzdelta))
         ibandwidth=-0.5/bandwidth**2
         # normalization for the weights so that integrated volume is 1. this is necessary when comparing across different distributions?
@@ -365,32 +485,30 @@ class InverseReachabilityModel(DatabaseGenerator):
         searchradius=9.0*sum(bandwidth**2)
         searcheps=bandwidth[0]*0.1
         
-        points = zeros((0,3))
-        weights = array(())
+        Tgrasps = list(Tgrasps)
+        # find the closest cluster of all the grasps at once
+        bestindices,bestlogll,posetargets,znormangles = self._ComputeBestEquivalenceClasses(Tbase,array([Tgrasp for Tgrasp,graspindex in Tgrasps]))
+        allpoints = []
+        allweights = []
         graspindices = []
         graspindexoffsets = []
-        highestlogll = -inf
-        for Tgrasp,graspindex in Tgrasps:
-            posetarget = poseFromMatrix(dot(linalg.inv(Tbase),Tgrasp))
-            qnormalized,znormangle = normalizeZRotation(reshape(posetarget[0:4],(1,4)))
-            # find the closest cluster
-            logll = quatArrayTDist(qnormalized[0],self.equivalencemeans[:,0:4])**2*self.equivalenceweights[:,0] + (posetarget[6]-self.equivalencemeans[:,4])**2*self.equivalenceweights[:,1] + self.equivalenceoffset
-            bestindex = argmax(logll)
-            highestlogll = max(highestlogll,logll[bestindex])
-            if logll[bestindex] <logllthresh:
-                continue
-            graspindices.append(graspindex)
-            graspindexoffsets.append(len(points))
+        numpoints = 0
+        for i in flatnonzero(bestlogll >= logllthresh):
+            graspindices.append(Tgrasps[i][1])
+            graspindexoffsets.append(numpoints)
             # transform the equivalence class to the global coord system and create a kdtree for faster retrieval
-            equivalenceclass = self.equivalenceclasses[bestindex]
+            equivalenceclass = self.equivalenceclasses[bestindices[i]]
             # transform points by the grasp pose
-            newpoints = c_[equivalenceclass[2][:,0]+znormangle,dot(equivalenceclass[2][:,1:3],transpose(rotationMatrixFromAxisAngle([0,0,1],znormangle)[0:2,0:2])) + tile(posetarget[4:6], (len(equivalenceclass[2]),1))]
-            points = r_[points,newpoints]
-            weights = r_[weights,equivalenceclass[2][:,3]*normalizationconst]
+            znormangle = znormangles[i]
+            allpoints.append(c_[equivalenceclass[2][:,0]+znormangle,dot(equivalenceclass[2][:,1:3],transpose(rotationMatrixFromAxisAngle([0,0,1],znormangle)[0:2,0:2])) + posetargets[i,4:6]])
+            allweights.append(equivalenceclass[2][:,3]*normalizationconst)
+            numpoints += len(equivalenceclass[2])
 
-        if len(points) == 0:
-            log.info('inversereachability: could not find base distribution, logllthresh too high? logll=%f', highestlogll)
+        if numpoints == 0:
+            log.info('inversereachability: could not find base distribution, logllthresh too high? logll=%f', numpy.max(bestlogll) if len(bestlogll) > 0 else -inf)
             return None,None,None
+        points = concatenate(allpoints)
+        weights = concatenate(allweights)
         
         # transform points by the base pose
         points[:,0] += zbaseangle
@@ -428,6 +546,8 @@ class InverseReachabilityModel(DatabaseGenerator):
             samples = random.normal(sampledpoints,bandwidth*weight)
             samples[:,0] *= 0.5*irotweight
             return poseMultArrayT(poserobot,c_[cos(samples[:,0]),zeros((N,2)),sin(samples[:,0]),samples[:,1:3],tile(Tbase[2,3],N)]),sampledgraspindices,self.necessaryjointstate()
+        if key is not None:
+            self._AddToBaseDistributionCache(key,(gaussiankerneldensity,gaussiankernelsampler,bounds),points.nbytes*3+weights.nbytes+cumweights.nbytes)
         return gaussiankerneldensity,gaussiankernelsampler,bounds
 
     def sampleBaseDistributionIterator(self,Tgrasps,logllthresh=2.0,weight=1.0,Nprematuresamples=1,zaxis=None):
@@ -452,16 +572,15 @@ class InverseReachabilityModel(DatabaseGenerator):
         graspindices = []
         graspindexoffsets = []
         Tbaserot = c_[rotationMatrixFromAxisAngle([0,0,1],zbaseangle)[0:2,0:2],posebase[4:6]]
-        for Tgrasp,graspindex in Tgrasps:
-            posetarget = poseFromMatrix(dot(linalg.inv(Tbase),Tgrasp))
-            qnormalized,znormangle = normalizeZRotation(reshape(posetarget[0:4],(1,4)))
-            # find the closest cluster
-            logll = quatArrayTDist(qnormalized[0],self.equivalencemeans[:,0:4])**2*self.equivalenceweights[:,0] + (posetarget[6]-self.equivalencemeans[:,4])**2*self.equivalenceweights[:,1] + self.equivalenceoffset
-            bestindex = argmax(logll)
-            if logll[bestindex] < logllthresh:
-                continue
+        Tgrasps = list(Tgrasps)
+        # find the closest cluster of all the grasps at once
+        bestindices,bestlogll,posetargets,znormangles = self._ComputeBestEquivalenceClasses(Tbase,array([Tgrasp for Tgrasp,graspindex in Tgrasps]))
+        for i in flatnonzero(bestlogll >= logllthresh):
+            graspindex = Tgrasps[i][1]
+            posetarget = posetargets[i]
+            znormangle = znormangles[i]
             # transform the equivalence class to the global coord system and create a kdtree for faster retrieval
-            equivalenceclass = self.equivalenceclasses[bestindex]
+            equivalenceclass = self.equivalenceclasses[bestindices[i]]
             # transform points by the grasp pose
             Ttargetrot = c_[rotationMatrixFromAxisAngle([0,0,1],znormangle)[0:2,0:2],posetarget[4:6]]
             Trot = dot(Tbaserot, r_[Ttargetrot,[[0,0,1]]])
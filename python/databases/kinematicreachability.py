@@ -60,7 +60,7 @@ else:
 from ..openravepy_int import RaveFindDatabaseFile, IkParameterization, rotationMatrixFromQArray, poseFromMatrix
 from ..openravepy_ext import transformPoints, quatArrayTDist
 from .. import metaclass, pyANN
-from ..misc import SpaceSamplerExtra
+from ..misc import SpaceSamplerExtra, ChunkedArray
 from . import DatabaseGenerator
 from . import convexdecomposition, inversekinematics
 
@@ -97,6 +97,13 @@ class ReachabilityModel(DatabaseGenerator):
             neighs[neighs>=self.numposes] -= self.numposes
             poses[:,4:] *= self.itransmult
             return neighs,dists
+        def kSearchArray(self,poses,k,eps):
+            """returns distance squared"""
+            poses[:,4:] *= self.transmult
+            neighs,dists = self.nnposes.kSearchArray(poses,k,eps)
+            neighs[neighs>=self.numposes] -= self.numposes
+            poses[:,4:] *= self.itransmult
+            return neighs,dists
         def kFRSearch(self,pose,radiussq,k,eps):
             """returns distance squared"""
             pose[4:] *= self.transmult
@@ -113,14 +120,23 @@ class ReachabilityModel(DatabaseGenerator):
             return neighs,dists,kball
 
     xyzdelta = None # the sampling discretization of the XYZ space
-    reachabilitystats = None # Nx8 array of all the poses that are reachable. The first 7 columns are the quaternion and translation, the last column is the number of IK solutions present
-    reachability3d = None # a KxKxK voxelized map that repsents the density of solutions for each XYZ point. The higher the density, the more rotations the arm can be solved for. Use xyzdelta to from 3D point to voxel index.
+    # the reachable poses are stored compactly as indices into the XYZ voxel grid and the sampled rotations. Use reachabilitystats to get the decoded poses.
+    reachabilityvoxelindices = None # N uint32 array of the flattened voxel index of every reachable pose
+    reachabilityrotationindices = None # N uint16 array of the index into reachabilityrotations of every reachable pose
+    reachabilitycounts = None # N uint8 (uint16 if necessary) array of the number of IK solutions of every reachable pose
+    reachabilityrotations = None # Kx4 array of the quaternions sampled for every voxel
+    reachabilityrotcount3d = None # a KxKxK voxelized map of the number of rotations the arm can be solved for at each XYZ point
+    reachabilitysolcount3d = None # a KxKxK voxelized map of the number of IK solutions summed over all the rotations at each XYZ point
     def __init__(self,robot):
         DatabaseGenerator.__init__(self,robot=robot)
         self.ikmodel = inversekinematics.InverseKinematicsModel(robot=robot,iktype=IkParameterization.Type.Transform6D)
-        self.reachabilitystats = None
-        self.reachability3d = None
-        self.reachabilitydensity3d = None
+        self.reachabilityvoxelindices = None
+        self.reachabilityrotationindices = None
+        self.reachabilitycounts = None
+        self.reachabilityrotations = None
+        self.reachabilityrotcount3d = None
+        self.reachabilitysolcount3d = None
+        self.baseanchor = None
         self.pointscale = None
         self.xyzdelta = None
         self.quatdelta = None
@@ -130,10 +146,41 @@ class ReachabilityModel(DatabaseGenerator):
         clone = DatabaseGenerator.clone(self,envother)
         return clone
     def has(self):
-        return len(self.reachabilitydensity3d) > 0 and len(self.reachability3d) > 0 and len(self.reachabilitystats) > 0
+        return self.reachabilityvoxelindices is not None and len(self.reachabilityvoxelindices) > 0 and self.reachabilityrotcount3d is not None and len(self.reachabilityrotcount3d) > 0
+
+    @property
+    def reachabilitystats(self):
+        """Nx8 array of all the poses that are reachable. The first 7 columns are the quaternion and translation, the last column is the number of IK solutions present.
+
+        Decoded from the compact voxel and rotation indices every time it is accessed.
+        """
+        if self.reachabilityvoxelindices is None:
+            return None
+        voxelindices = self._GetValue(self.reachabilityvoxelindices)
+        nsteps = self.pointscale[1]
+        shape = (int(2*nsteps),)*3
+        translations = c_[unravel_index(voxelindices,shape)]-nsteps
+        translations *= self.xyzdelta
+        translations += self.baseanchor
+        rotations = self._GetValue(self.reachabilityrotations)
+        return c_[rotations[self._GetValue(self.reachabilityrotationindices)],translations,self._GetValue(self.reachabilitycounts)]
+
+    @property
+    def reachability3d(self):
+        """a KxKxK voxelized map that repsents the density of solutions for each XYZ point. The higher the density, the more rotations the arm can be solved for. Use xyzdelta to from 3D point to voxel index."""
+        if self.reachabilityrotcount3d is None:
+            return None
+        return self._GetValue(self.reachabilityrotcount3d)/float(len(self.reachabilityrotations))
+
+    @property
+    def reachabilitydensity3d(self):
+        """a KxKxK voxelized map of the average number of IK solutions for each XYZ point"""
+        if self.reachabilitysolcount3d is None:
+            return None
+        return self._GetValue(self.reachabilitysolcount3d)/float(len(self.reachabilityrotations))
 
     def getversion(self):
-        return 5
+        return 6
     
     def save(self):
         try:
@@ -157,13 +204,14 @@ class ReachabilityModel(DatabaseGenerator):
             return False
 
     def SavePickle(self):
-        DatabaseGenerator.save(self,(self.reachabilitystats,self.reachabilitydensity3d,self.reachability3d, self.pointscale,self.xyzdelta,self.quatdelta))
+        DatabaseGenerator.save(self,(self.reachabilityvoxelindices,self.reachabilityrotationindices,self.reachabilitycounts,self.reachabilityrotations,self.reachabilityrotcount3d,self.reachabilitysolcount3d,self.baseanchor,self.pointscale,self.xyzdelta,self.quatdelta))
         
     def LoadPickle(self):
         params = DatabaseGenerator.load(self)
         if params is None:
             return False
-        self.reachabilitystats,self.reachabilitydensity3d,self.reachability3d,self.pointscale,self.xyzdelta,self.quatdelta = params
+        self.reachabilityvoxelindices,self.reachabilityrotationindices,self.reachabilitycounts,self.reachabilityrotations,self.reachabilityrotcount3d,self.reachabilitysolcount3d,self.baseanchor,self.pointscale,self.xyzdelta,self.quatdelta = params
+        self.kdtree3d = self.kdtree6d = None
         return self.has()
 
     def SaveHDF5(self):
@@ -178,9 +226,13 @@ class ReachabilityModel(DatabaseGenerator):
         f=h5py.File(filename,'w')
         try:
             f['version'] = self.getversion()
-            f['reachabilitystats'] = self.reachabilitystats
-            f['reachabilitydensity3d'] = self.reachabilitydensity3d
-            f['reachability3d'] = self.reachability3d
+            f['reachabilityvoxelindices'] = self.reachabilityvoxelindices
+            f['reachabilityrotationindices'] = self.reachabilityrotationindices
+            f['reachabilitycounts'] = self.reachabilitycounts
+            f['reachabilityrotations'] = self.reachabilityrotations
+            f['reachabilityrotcount3d'] = self.reachabilityrotcount3d
+            f['reachabilitysolcount3d'] = self.reachabilitysolcount3d
+            f['baseanchor'] = self.baseanchor
             f['pointscale'] = self.pointscale
             f['xyzdelta'] = self.xyzdelta
             f['quatdelta'] = self.quatdelta
@@ -200,12 +252,17 @@ class ReachabilityModel(DatabaseGenerator):
                 log.error('version is wrong %s!=%s ',f['version'],self.getversion())
                 return False
 
-            self.reachabilitystats = f['reachabilitystats']
-            self.reachabilitydensity3d = f['reachabilitydensity3d']
-            self.reachability3d = f['reachability3d']
+            self.reachabilityvoxelindices = f['reachabilityvoxelindices']
+            self.reachabilityrotationindices = f['reachabilityrotationindices']
+            self.reachabilitycounts = f['reachabilitycounts']
+            self.reachabilityrotations = f['reachabilityrotations'].value
+            self.reachabilityrotcount3d = f['reachabilityrotcount3d']
+            self.reachabilitysolcount3d = f['reachabilitysolcount3d']
+            self.baseanchor = f['baseanchor'].value
             self.pointscale = f['pointscale'].value
             self.xyzdelta = f['xyzdelta'].value
             self.quatdelta = f['quatdelta'].value
+            self.kdtree3d = self.kdtree6d = None
             self._databasefile = f
             f = None
             return self.has()
@@ -268,8 +325,10 @@ class ReachabilityModel(DatabaseGenerator):
                     links.append(newlink)
         return links
 
-    def generatepcg(self,maxradius=None,translationonly=False,xyzdelta=None,quatdelta=None,usefreespace=False):
+    def generatepcg(self,maxradius=None,translationonly=False,xyzdelta=None,quatdelta=None,usefreespace=False,statsfilename=None):
         """Generate producer, consumer, and gatherer functions allowing parallelization
+
+        :param statsfilename: if not None, the reachability stats are streamed into this raw file during generation rather than kept in memory
         """
         if not self.ikmodel.load():
             self.ikmodel.autogenerate()
@@ -312,9 +371,14 @@ class ReachabilityModel(DatabaseGenerator):
                 self.quatdelta = mean(neighdists)
             log.info('radius: %f, xyzsamples: %d, quatdelta: %f, rot samples: %d, freespace: %d',maxradius,len(insideinds),self.quatdelta,len(rotations),usefreespace)
             
-        self.reachabilitydensity3d = zeros(prod(shape))
-        self.reachability3d = zeros(prod(shape))
-        self.reachabilitystats = []
+        if len(rotations) > 65535:
+            raise ValueError('too many rotation samples (%d), increase quatdelta'%len(rotations))
+        self.baseanchor = array(baseanchor)
+        self.reachabilityrotations = array([[1.0,0,0,0]]) if translationonly else array(qarray)
+        solcount3d = zeros(prod(shape),uint32)
+        rotcount3d = zeros(prod(shape),uint16)
+        # accumulate the (voxel index, rotation index, number of solutions) of every reachable pose in preallocated chunks rather than a list of small arrays
+        stats = ChunkedArray(3,dtype=uint32,filename=statsfilename)
 
         def producer():
             T = eye(4)
@@ -326,35 +390,40 @@ class ReachabilityModel(DatabaseGenerator):
         def consumer(ind,T):
             with self.robot:
                 self.robot.SetTransform(Trobot)
-                reachabilitystats = []
                 numvalid = 0
                 numrotvalid = 0
                 T = array(T)
-                for rotation in rotations:
+                reachabilitystats = zeros((len(rotations),3),uint32)
+                reachabilitystats[:,0] = ind
+                for irotation,rotation in enumerate(rotations):
                     T[0:3,0:3] = rotation
                     if usefreespace:
                         solutions = self.manip.FindIKSolutions(T,0)
                         if solutions is not None:
-                            reachabilitystats.append(r_[poseFromMatrix(T),len(solutions)])
+                            reachabilitystats[numrotvalid,1:3] = (irotation,len(solutions))
                             numvalid += len(solutions)
                             numrotvalid += 1
                     else:
                         solution = self.manip.FindIKSolution(T,0)
                         if solution is not None:
-                            reachabilitystats.append(r_[poseFromMatrix(T),1])
+                            reachabilitystats[numrotvalid,1:3] = (irotation,1)
                             numvalid += 1
                             numrotvalid += 1
-                return ind,reachabilitystats, numvalid, numrotvalid
+                return ind,reachabilitystats[0:numrotvalid], numvalid, numrotvalid
 
         def gatherer(ind=None,reachabilitystats=None,numvalid=None,numrotvalid=None):
             if ind is not None:
-                self.reachabilitystats += reachabilitystats
-                self.reachabilitydensity3d[ind] = numvalid/float(len(rotations))
-                self.reachability3d[ind] = numrotvalid/float(len(rotations))
+                stats.extend(reachabilitystats)
+                solcount3d[ind] = numvalid
+                rotcount3d[ind] = numrotvalid
             else:
-                self.reachability3d = reshape(self.reachability3d,shape)
-                self.reachabilitydensity3d = reshape(self.reachabilitydensity3d,shape)
-                self.reachabilitystats = array(self.reachabilitystats)
+                self.reachabilityrotcount3d = reshape(rotcount3d,shape)
+                self.reachabilitysolcount3d = reshape(solcount3d,shape)
+                allstats = stats.getarray()
+                self.reachabilityvoxelindices = array(allstats[:,0],uint32)
+                self.reachabilityrotationindices = array(allstats[:,1],uint16)
+                counts = allstats[:,2]
+                self.reachabilitycounts = array(counts,uint8 if len(counts) == 0 or numpy.max(counts) <= 255 else uint16)
 
         return producer, consumer, gatherer, len(insideinds)
 
@@ -85,6 +85,8 @@ class LinkStatisticsModel(DatabaseGenerator):
     """Computes the convex decomposition of all of the robot's links"""
     
     grabbedjointspheres = None # a list of (grabbedinfo, dict) that stores swept spheres of each joint. key is joint index. 
+    maxgrabbedjointspheres = 32 # the maximum length of grabbedjointspheres, the oldest grabbed configurations are removed first
+    _grabbedjointspheresindex = None # (grabbedjointspheres, dict, [numindexed]) where dict maps _GetGrabbedKey to the indices of the first numindexed entries of grabbedjointspheres
     def __init__(self,robot):
         DatabaseGenerator.__init__(self,robot=robot)
     
@@ -201,18 +203,47 @@ class LinkStatisticsModel(DatabaseGenerator):
             self.grabbedjointspheres = [(self.robot.GetGrabbedInfo(), self._ComputeJointSpheres())]
     
     def _GetJointSpheresFromGrabbed(self, grabbedinfo):
-        for testgrabbedinfo, testjointspheres in self.grabbedjointspheres:
-            if len(testgrabbedinfo) == len(grabbedinfo):
-                if all([(grabbedinfo[i]._grabbedname == testgrabbedinfo[i]._grabbedname and grabbedinfo[i]._robotlinkname == testgrabbedinfo[i]._robotlinkname and sum(abs(grabbedinfo[i]._trelative-testgrabbedinfo[i]._trelative)) <= 1e-7 and grabbedinfo[i]._setRobotLinksToIgnore == testgrabbedinfo[i]._setRobotLinksToIgnore) for i in range(len(grabbedinfo))]):
-                    return testjointspheres
+        index = self._GetGrabbedJointSpheresIndex()
+        for igrabbed in index.get(self._GetGrabbedKey(grabbedinfo), []):
+            testgrabbedinfo, testjointspheres = self.grabbedjointspheres[igrabbed]
+            if all([sum(abs(grabbedinfo[i]._trelative-testgrabbedinfo[i]._trelative)) <= 1e-7 for i in range(len(grabbedinfo))]):
+                return testjointspheres
         
         log.debug('adding new linkstatistic for grabbed bodies: %r', [g._grabbedname for g in grabbedinfo])
         jointspheres = self._ComputeJointSpheres()
+        if len(self.grabbedjointspheres) >= self.maxgrabbedjointspheres and len(self.grabbedjointspheres) > 1:
+            # keep the first configuration, which was computed by generate
+            del self.grabbedjointspheres[1:len(self.grabbedjointspheres)-self.maxgrabbedjointspheres+2]
+            self._grabbedjointspheresindex = None
         self.grabbedjointspheres.append((grabbedinfo, jointspheres)) # tuple copies so that it doesn't change...
+        self._GetGrabbedJointSpheresIndex()
         return jointspheres
     
+    @staticmethod
+    def _GetGrabbedKey(grabbedinfo):
+        """returns a hashable key of the fields of grabbedinfo that have to be equal for two grabbed configurations to have the same joint spheres. The relative transforms are compared separately since they only need to be close.
+        """
+        return tuple([(g._grabbedname, g._robotlinkname, tuple(sorted(g._setRobotLinksToIgnore))) for g in grabbedinfo])
+    
+    def _GetGrabbedJointSpheresIndex(self):
+        """returns the dictionary from _GetGrabbedKey to the indices in grabbedjointspheres, indexing the entries added since the last call
+        """
+        if self._grabbedjointspheresindex is None or self._grabbedjointspheresindex[0] is not self.grabbedjointspheres:
+            self._grabbedjointspheresindex = (self.grabbedjointspheres, {}, [0])
+        grabbedjointspheres, index, numindexed = self._grabbedjointspheresindex
+        for igrabbed in range(numindexed[0], len(grabbedjointspheres)):
+            index.setdefault(self._GetGrabbedKey(grabbedjointspheres[igrabbed][0]), []).append(igrabbed)
+        numindexed[0] = len(grabbedjointspheres)
+        return index
+    
     def _ComputeJointSpheres(self):
         jointspheres = {}
+        # the joints attached to each parent link, in joint index order
+        linkchildjoints = {}
+        for testj in self.robot.GetJoints():
+            parentlink = testj.GetHierarchyParentLink()
+            if parentlink is not None:
+                linkchildjoints.setdefault(parentlink.GetIndex(), []).append(testj)
         for j in self.robot.GetDependencyOrderedJoints()[::-1]:
             if not j.IsRevolute(0):
                 continue
@@ -231,7 +262,10 @@ class LinkStatisticsModel(DatabaseGenerator):
             minpos = spherepos - sphereradius*ones([1,1,1])
             maxpos = spherepos + sphereradius*ones([1,1,1])
 
-            childjoints = [testj for testj in self.robot.GetJoints() if testj.GetHierarchyParentLink() in childlinks]
+            childjoints = []
+            for childlink in childlinks:
+                childjoints += linkchildjoints.get(childlink.GetIndex(), [])
+            childjoints.sort(key=lambda testj: testj.GetJointIndex())
             for childjoint in childjoints:
                 if childjoint.GetJointIndex() in jointspheres:
                     childpos, childradius = jointspheres[childjoint.GetJointIndex()]
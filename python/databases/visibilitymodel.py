@@ -71,6 +71,8 @@ __license__ = 'Apache License, Version 2.0'
 
 import time
 import os.path
+from itertools import izip
+from collections import OrderedDict
 
 if not __openravepy_build_doc__:
     from ..openravepy_int import *
@@ -91,6 +93,7 @@ class VisibilityModel(DatabaseGenerator):
     visibilitytransforms = None # a list of camera pose in the pattern coordinate system
     targetlink = None # the target link object
     targetgeomname = None # name of a geometry object inside target link to constrain the visiblity checking
+    maxcameramasks = 16 # the maximum number of cached GetCameraRobotMask images, the oldest are removed first
     
     class GripperVisibility:
         """Used to hide links not beloning to gripper.
@@ -142,6 +145,7 @@ class VisibilityModel(DatabaseGenerator):
         self.rmodel = self.ikmodel = None
         self.preshapes = None
         self.iktype = iktype
+        self._cameramasks = None
         self.preprocess()
     def clone(self,envother):
         clone = DatabaseGenerator.clone(self,envother)
@@ -150,6 +154,7 @@ class VisibilityModel(DatabaseGenerator):
         clone.ikmodel = self.ikmodel.clone(envother) if not self.ikmodel is None else None
         clone.visualprob = self.visualprob.clone(envother)
         clone.basemanip = self.basemanip.clone(envother)
+        clone._cameramasks = None
         clone.preprocess()
         return clone
     def has(self):
@@ -362,48 +367,69 @@ class VisibilityModel(DatabaseGenerator):
                 time.sleep(0.01)
 
     def computeValidTransform(self,returnall=False,checkcollision=True,computevisibility=True,randomize=False):
+        """returns a list of (jointvalues,index) for the visibility transforms that have IK solutions and see the target.
+
+        The grasp transforms of all candidates are computed in one step. IK is solved per candidate and visibility is only checked for IK-feasible candidates.
+        """
         with self.robot:
             if self.manip.CheckIndependentCollision():
                 raise planning_error('robot independent links are initiallly in collision')
             validjoints = []
+            if len(self.visibilitytransforms) == 0:
+                return validjoints
             if randomize:
                 order = random.permutation(len(self.visibilitytransforms))
             else:
-                order = xrange(len(self.visibilitytransforms))
-            for i in order:
-                pose = self.visibilitytransforms[i]
-                Trelative = dot(linalg.inv(self.attachedsensor.GetTransform()),self.manip.GetEndEffectorTransform())
-                Tcamera = dot(self.targetlink.GetParent().GetTransform(),matrixFromPose(pose))
-                Tgrasp = dot(Tcamera,Trelative)
+                order = arange(len(self.visibilitytransforms))
+            Trelative = dot(linalg.inv(self.attachedsensor.GetTransform()),self.manip.GetEndEffectorTransform())
+            cameraposes = poseMultArrayT(poseFromMatrix(self.targetlink.GetParent().GetTransform()),self.visibilitytransforms[order])
+            Tgrasps = dot(array(matrixFromPoses(cameraposes)),Trelative)
+            armindices = self.manip.GetArmIndices()
+            # the IK solvers take one pose per call, and checking the poses in order lets the search stop at the first valid one
+            for i,Tgrasp in izip(order,Tgrasps):
                 s = self.manip.FindIKSolution(Tgrasp,checkcollision)
-                if s is not None:
-                    self.robot.SetDOFValues(s,self.manip.GetArmIndices())
-                    if computevisibility and not self.visualprob.ComputeVisibility():
-                        continue
-                    validjoints.append((s,i))
-                    if not returnall:
-                        return validjoints
-                    print 'found',len(validjoints)
+                if s is None:
+                    continue
+                self.robot.SetDOFValues(s,armindices)
+                if computevisibility and not self.visualprob.ComputeVisibility():
+                    continue
+                validjoints.append((s,i))
+                if not returnall:
+                    return validjoints
+                print 'found',len(validjoints)
             return validjoints
 
-    def pruneTransformations(self,thresh=0.04,numminneighs=10,maxdist=None,translationonly=True):
+    def pruneTransformations(self,thresh=0.04,numminneighs=10,maxdist=None,translationonly=True,rotthresh=0.2):
+        """returns the visibility transforms whose reachability density is above numminneighs, sorted from the most reachable.
+
+        :param thresh: translation radius of the density query
+        :param translationonly: if False, the end effector poses are queried in the 6D reachability space
+        :param rotthresh: quaternion distance added to the 6D query radius
+        """
         if self.rmodel is None:
             self.rmodel = kinematicreachability.ReachabilityModel(robot=self.robot)
             if not self.rmodel.load():
                 # do not autogenerate since that would force this model to depend on the reachability
                 self.rmodel = None
-                return array(visibilitytransforms)
+                return array(self.visibilitytransforms)
         kdtree=self.rmodel.ComputeNN(translationonly)
         if maxdist is not None:
             visibilitytransforms = self.visibilitytransforms[invertPoses(self.visibilitytransforms)[:,6]<maxdist]
         else:
             visibilitytransforms = self.visibilitytransforms
+        if len(visibilitytransforms) == 0:
+            return visibilitytransforms
         newtrans = poseMultArrayT(poseFromMatrix(dot(linalg.inv(self.manip.GetBase().GetTransform()),self.targetlink.GetParent().GetTransform())),visibilitytransforms)
         if translationonly:
             transdensity = kdtree.kFRSearchArray(newtrans[:,4:7],thresh**2,0,thresh*0.01)[2]
-            I=flatnonzero(transdensity>numminneighs)
-            return visibilitytransforms[I[argsort(-transdensity[I])]]
-        raise ValueError('not supported')
+        else:
+            # end effector poses are the camera poses right multiplied by Trelative, computed as inv(inv(Trelative)*inv(Tcamera))
+            Trelative = dot(linalg.inv(self.attachedsensor.GetTransform()),self.manip.GetEndEffectorTransform())
+            eeposes = invertPoses(poseMultArrayT(poseFromMatrix(linalg.inv(Trelative)),invertPoses(newtrans)))
+            radiussq = (thresh*kdtree.transmult)**2+rotthresh**2
+            transdensity = kdtree.kFRSearchArray(eeposes,radiussq,0,sqrt(radiussq)*0.01)[2]
+        I=flatnonzero(transdensity>numminneighs)
+        return visibilitytransforms[I[argsort(-transdensity[I])]]
 #         Imask = GetCameraRobotMask(orenv,options.robotfile,sensorindex=options.sensorindex,gripperjoints=gripperjoints,robotjoints=robotjoints,robotjointinds=robotjointinds,rayoffset=options.rayoffset)
 #         # save as a ascii matfile
 #         numpy.savetxt(options.savefile,Imask,'%d')
@@ -413,17 +439,38 @@ class VisibilityModel(DatabaseGenerator):
 #         except:
 #             pass
 
-#     def GetCameraRobotMask(self,rayoffset=0):
-#         with self.env:
-#             inds = array(range(self.width*self.height))
-#             imagepoints = array((mod(inds,self.width),floor(inds/self.width)))
-#             camerapoints = dot(linalg.inv(self.KK), r_[imagepoints,ones((1,imagepoints.shape[1]))])
-#             Tcamera = self.attached.GetSensor().GetTransform()
-#             raydirs = dot(Tcamera[0:3,0:3], camerapoints / tile(sqrt(sum(camerapoints**2,0)),(3,1)))
-#             rays = r_[tile(Tcamera[0:3,3:4],(1,raydirs.shape[1]))+rayoffset*raydirs,100.0*raydirs]
-#             hitindices,hitpositions = self.prob.GetEnv().CheckCollisionRays(rays,self.robot,False)
-#             # gather all the rays that hit and form an image
-#             return reshape(array(hitindices,'float'),(height,width))
+    def GetCameraRobotMask(self,rayoffset=0,maxdist=100.0,quantization=1e-3,chunksize=20000):
+        """returns a height x width boolean image that is True for every pixel whose camera ray hits the robot.
+
+        Masks are cached by the quantized robot joint values and robot pose relative to the camera.
+        :param rayoffset: the offset to move the ray origin (prevents meaningless collisions)
+        :param maxdist: the length of every ray
+        :param quantization: the resolution used to compare robot configurations in the cache
+        :param chunksize: the maximum number of rays passed to one CheckCollisionRays call
+        """
+        with self.env:
+            Tcamera = self.attachedsensor.GetTransform()
+            Trobotincamera = dot(linalg.inv(Tcamera),self.robot.GetTransform())
+            key = (tuple(around(self.robot.GetDOFValues()/quantization).astype(int64)), tuple(around(Trobotincamera[0:3,:].flatten()/quantization).astype(int64)), rayoffset, maxdist)
+            if self._cameramasks is None:
+                self._cameramasks = OrderedDict()
+            Imask = self._cameramasks.get(key,None)
+            if Imask is not None:
+                return Imask
+            height,width = self.dims[0:2]
+            imagepoints = c_[tile(arange(width),height),repeat(arange(height),width),ones(width*height)]
+            camerapoints = dot(imagepoints,transpose(linalg.inv(self.KK)))
+            raydirs = dot(camerapoints/sqrt(sum(camerapoints**2,1))[:,newaxis],transpose(Tcamera[0:3,0:3]))
+            rays = c_[Tcamera[0:3,3]+rayoffset*raydirs,maxdist*raydirs]
+            hits = zeros(len(rays),bool)
+            for istart in xrange(0,len(rays),chunksize):
+                collision,info = self.env.CheckCollisionRays(rays[istart:(istart+chunksize)],self.robot)
+                hits[istart:(istart+chunksize)] = collision
+            Imask = reshape(hits,(height,width))
+            if len(self._cameramasks) >= self.maxcameramasks:
+                self._cameramasks.popitem(last=False)
+            self._cameramasks[key] = Imask
+            return Imask
 
     def getCameraImage(self,delay=1.0):
         sensor=self.attachedsensor.GetSensor()
@@ -446,24 +446,54 @@ def ComputeCylinderYMesh(radius,height,angledelta=0.1):
         iprev = i
     return vertices,numpy.array(indices)
 
-def TSP(solutions,distfn=None):
+def TSP(solutions,distfn=None,weights=None,start=None,maxiter=100):
     """solution to travelling salesman problem. orders the set of solutions such that visiting them one after another is fast.
+
+    The order is built greedily from the nearest neighbors and then shortened with 2-opt moves. Returns the ordered solutions and their indices into solutions.
+    :param distfn: symmetric distance function between two solutions. If None, uses the squared distance weighted by weights
+    :param weights: the weight of every dimension for the default distance
+    :param start: if not None, the tour starts at this configuration, which is not part of the returned solutions. Otherwise the tour starts at the first solution
+    :param maxiter: the maximum number of passes of 2-opt moves
     """
-    if distfn is None:
-        # create a dummy distance fn
-        distfn = lambda x,y: sum((x-y)**2)
-    
     newsolutions = numpy.array(solutions)
-    newindices = numpy.arange(len(solutions))
-    for i in range(newsolutions.shape[0]-2):
-        n = newsolutions.shape[0]-i-1
-        dists = [distfn(newsolutions[i,:],newsolutions[j,:]) for j in range(i+1,newsolutions.shape[0])]
-        minind = numpy.argmin(dists)+i+1
-        sol = numpy.array(newsolutions[i+1,:])
-        newsolutions[i+1,:] = newsolutions[minind,:]
-        newsolutions[minind,:] = sol
-        newindices[i+1], newindices[minind] = newindices[minind], newindices[i+1]
-    return newsolutions, newindices
+    if len(newsolutions) == 0:
+        return newsolutions, numpy.arange(0)
+    points = newsolutions if start is None else numpy.r_[newsolutions,[start]]
+    if distfn is None:
+        weightedpoints = points if weights is None else points*numpy.sqrt(weights)
+        sqrnorms = numpy.sum(weightedpoints**2,1)
+        dists = numpy.maximum(sqrnorms[:,numpy.newaxis]+sqrnorms[numpy.newaxis,:]-2*numpy.dot(weightedpoints,numpy.transpose(weightedpoints)),0)
+    else:
+        # distfn is symmetric, so it is only called on the pairs i < j
+        dists = numpy.zeros((len(points),len(points)))
+        for i in range(len(points)):
+            for j in range(i+1,len(points)):
+                dists[i,j] = dists[j,i] = distfn(points[i],points[j])
+    # the first element of path is fixed, it is either start or the first solution
+    path = [len(points)-1 if start is not None else 0]
+    visited = numpy.zeros(len(points),bool)
+    visited[path[0]] = True
+    for i in range(len(points)-1):
+        inext = numpy.argmin(numpy.where(visited,numpy.inf,dists[path[-1]]))
+        visited[inext] = True
+        path.append(inext)
+    path = numpy.array(path)
+    n = len(path)
+    for iter in range(maxiter):
+        improved = False
+        for i in range(1,n-1):
+            # reversing path[i:j+1] replaces edges (path[i-1],path[i]) and (path[j],path[j+1]) with (path[i-1],path[j]) and (path[i],path[j+1])
+            js = numpy.arange(i+1,n)
+            deltas = dists[path[i-1],path[js]]-dists[path[i-1],path[i]]
+            deltas[:-1] += dists[path[i],path[js[:-1]+1]]-dists[path[js[:-1]],path[js[:-1]+1]]
+            ibest = numpy.argmin(deltas)
+            if deltas[ibest] < -1e-12:
+                path[i:js[ibest]+1] = path[i:js[ibest]+1][::-1]
+                improved = True
+        if not improved:
+            break
+    newindices = path if start is None else path[1:]
+    return newsolutions[newindices], newindices
 
 def sequence_cross_product(*sequences):
     """iterates through the cross product of all items in the sequences"""
@@ -482,6 +512,68 @@ def sequence_cross_product(*sequences):
         else:
             break
 
+class ChunkedArray:
+    """Accumulates rows of a 2D array into fixed-size preallocated chunks.
+
+    Appending never copies the previously stored rows, and :meth:`getarray` frees each chunk as soon as it is copied into the final array, so peak memory is close to the size of the final array. If filename is set, the rows are streamed into a raw file instead and :meth:`getarray` returns a read-only numpy.memmap of it.
+    """
+    def __init__(self,numcols,dtype=numpy.float64,chunksize=65536,filename=None):
+        """
+        :param numcols: number of columns of every row
+        :param chunksize: number of rows of every preallocated chunk
+        :param filename: if not None, the file to stream the rows into
+        """
+        self.numcols = numcols
+        self.dtype = numpy.dtype(dtype)
+        self.chunksize = chunksize
+        self.filename = filename
+        self._chunks = []
+        self._chunkoffset = chunksize # number of rows used in the last chunk
+        self._numrows = 0
+        self._file = open(filename,'wb') if filename is not None else None
+
+    def __len__(self):
+        return self._numrows
+
+    def extend(self,rows):
+        """appends a Nxnumcols array of rows"""
+        rows = numpy.asarray(rows,self.dtype).reshape((-1,self.numcols))
+        if self._file is not None:
+            rows.tofile(self._file)
+            self._numrows += len(rows)
+            return
+
+        index = 0
+        while index < len(rows):
+            if self._chunkoffset >= self.chunksize:
+                self._chunks.append(numpy.empty((self.chunksize,self.numcols),self.dtype))
+                self._chunkoffset = 0
+            num = min(len(rows)-index,self.chunksize-self._chunkoffset)
+            self._chunks[-1][self._chunkoffset:(self._chunkoffset+num)] = rows[index:(index+num)]
+            self._chunkoffset += num
+            index += num
+        self._numrows += len(rows)
+
+    def getarray(self):
+        """returns all the rows as one array and releases the chunks. Can only be called once."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            if self._numrows == 0:
+                return numpy.zeros((0,self.numcols),self.dtype)
+            return numpy.memmap(self.filename,dtype=self.dtype,mode='r',shape=(self._numrows,self.numcols))
+
+        result = numpy.empty((self._numrows,self.numcols),self.dtype)
+        offset = 0
+        while len(self._chunks) > 0:
+            chunk = self._chunks.pop(0)
+            num = min(self.chunksize,self._numrows-offset)
+            result[offset:(offset+num)] = chunk[0:num]
+            offset += num
+        self._chunkoffset = self.chunksize
+        self._numrows = 0
+        return result
+
 class MultiManipIKSolver:
     """Finds the simultaneous IK solutions of all disjoint manipulators (no manipulators share a joint).
 
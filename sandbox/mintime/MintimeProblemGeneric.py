@@ -28,6 +28,19 @@ import bisect
 
 
 
+def cache_key(*values):
+    """Key of the values of some arrays or lists of numbers, used to detect
+    that the inputs of a preprocessing stage changed
+
+    """
+    key=[]
+    for x in values:
+        x=asarray(x,dtype=float)
+        key.append((x.shape,x.tostring()))
+    return tuple(key)
+
+
+
 class MintimeProblemGeneric():
 
     def __init__(self,robot,traj):
@@ -43,32 +56,61 @@ class MintimeProblemGeneric():
         self.qdd_vect=traj.qdd_vect
         self.isset_dynamics_limits=False
         self.isset_velocity_limits=False
+        self.preprocess_cache={}
        
 
     def preprocess(self):
-        """Preprocess, must be called before running the ProfileIntegrator"""
- 
+        """Preprocess, must be called before running the ProfileIntegrator
+
+        The stages whose inputs did not change since the last call are not
+        recomputed, so that the same path can be retimed under different
+        limits at a lower cost. Call clear_cache after modifying the robot or
+        the parameters of the dynamics (e.g. zmp_params)
+        to force a full recomputation.
+
+        """
+        cache=self.preprocess_cache
+
        # Sample the dynamics
-        self.sample_dynamics()
+        dynamics_key=cache_key(self.q_vect,self.qd_vect,self.qdd_vect)
+        if cache.get('dynamics')!=dynamics_key:
+            self.sample_dynamics()
+            cache.clear()
+            cache['dynamics']=dynamics_key
 
         # Compute the max velocity curve caused by accelerations limits
         if(self.isset_dynamics_limits):
-            self.compute_maxvel_accel_curve()
-            self.maxvel_curve=array(self.maxvel_accel_curve)
+            accel_key=(dynamics_key,self.dynamics_limits_key())
+            if cache.get('accel')!=accel_key:
+                self.compute_maxvel_accel_curve()
+                cache['accel']=accel_key
         else:
             raise NameError('Second order (torques, zmp,...) limits are required')
 
         # Compute the max velocity curve caused by velocity limits
+        velocity_key=None
         if(self.isset_velocity_limits):
-            self.compute_maxvel_velocity_curve()
-            for i in range(self.n_steps):
-                self.maxvel_curve[i]=min(self.maxvel_accel_curve[i],self.maxvel_velocity_curve[i])
-
-
-        # Compute the switch points
-        self.find_tangent_disc_points()
-        self.find_zero_inertia_points()
-        self.merge_switch_points_lists()
+            velocity_key=(dynamics_key,cache_key(self.qd_max))
+            if cache.get('velocity')!=velocity_key:
+                self.compute_maxvel_velocity_curve()
+                cache['velocity']=velocity_key
+
+        # Merge the max velocity curves and compute the switch points
+        switch_key=(accel_key,velocity_key,cache_key(self.disc_thr))
+        if cache.get('switch')!=switch_key:
+            self.maxvel_curve=array(self.maxvel_accel_curve)
+            if(self.isset_velocity_limits):
+                for i in range(self.n_steps):
+                    self.maxvel_curve[i]=min(self.maxvel_accel_curve[i],self.maxvel_velocity_curve[i])
+            self.find_tangent_disc_points()
+            self.find_zero_inertia_points()
+            self.merge_switch_points_lists()
+            cache['switch']=switch_key
+
+
+    def clear_cache(self):
+        """Force the next call to preprocess to recompute all the stages"""
+        self.preprocess_cache={}
         
 
 
@@ -136,6 +178,11 @@ class MintimeProblemGeneric():
         raise NameError('Some virtual methods need be implemented')
 
 
+    def dynamics_limits_key(self):
+        """Key of the current dynamics limits, cf cache_key"""
+        raise NameError('Some virtual methods need be implemented')
+
+
     def sample_dynamics(self):
         """Sample the dynamics coefficients along the trajectory"""
         raise NameError('Some virtual methods need be implemented')
@@ -271,7 +318,7 @@ class MintimeProblemGeneric():
 
 
     def linear_interpolate(self,s,value_vect,t_vect=None,elim_out=False):
-        if t_vect==None:
+        if t_vect is None:
             t_vect=self.t_vect
             n_steps=self.n_steps
         else:
@@ -299,7 +346,7 @@ class MintimeProblemGeneric():
 
 
     def linear_interpolate_multi(self,s,value_vect_list,t_vect=None):
-        if t_vect==None:
+        if t_vect is None:
             t_vect=self.t_vect
             n_steps=self.n_steps
         else:
@@ -44,33 +44,16 @@ class MintimeProblemTorque(MintimeProblemGeneric.MintimeProblemGeneric):
         self.tau_max=limits[1]
         self.isset_dynamics_limits=True
 
+    def dynamics_limits_key(self):
+        return MintimeProblemGeneric.cache_key(self.tau_min,self.tau_max)
+
 
 ################################ Dynamics ################################
 
 
     def sample_dynamics(self):
         """Sample the dynamics coefficients along the trajectory"""
-        a_vect=zeros((self.dim,self.n_steps))
-        b_vect=zeros((self.dim,self.n_steps))
-        c_vect=zeros((self.dim,self.n_steps))
-
-        for i in range(self.n_steps):
-            q=self.q_vect[:,i]
-            qd=self.qd_vect[:,i]
-            qdd=self.qdd_vect[:,i]
-            with self.robot:
-                self.robot.SetDOFValues(q)
-                self.robot.SetDOFVelocities(qd)
-                tm,tc,tg = self.robot.ComputeInverseDynamics(qdd,None,returncomponents=True)
-                to = self.robot.ComputeInverseDynamics(qd) - tc - tg
-
-            a_vect[:,i]=to
-            b_vect[:,i]=tm+tc
-            c_vect[:,i]=tg
-
-        self.a_vect=a_vect
-        self.b_vect=b_vect
-        self.c_vect=c_vect   
+        [self.a_vect,self.b_vect,self.c_vect]=SampleDynamicsCoefficients(self.robot,self.q_vect,self.qd_vect,self.qdd_vect)
 
  
 
@@ -94,28 +77,29 @@ class MintimeProblemTorque(MintimeProblemGeneric.MintimeProblemGeneric):
         (s,sdot) -- point of the phase plane
 
         """
-        tau_min=self.tau_min
-        tau_max=self.tau_max
         [a,b,c]=self.dynamics_coefficients(s)
-        alpha=-1e15
-        beta=1e15
-        ialpha=0
-        ibeta=0
-        for i in range(self.dim):
-            if a[i]>0:
-                tau_min_i=tau_min[i]
-                tau_max_i=tau_max[i]
-            else:
-                tau_min_i=tau_max[i]
-                tau_max_i=tau_min[i]
-            alpha_i=(tau_min_i-b[i]*sdot**2-c[i])/a[i]
-            beta_i=(tau_max_i-b[i]*sdot**2-c[i])/a[i]
-            if alpha_i>alpha:
-                alpha=alpha_i
-                ialpha=i
-            if beta_i<beta:
-                beta=beta_i
-                ibeta=i
+        # Swap the torque bounds of the joints with negative a[i], all
+        # joints at once
+        pos=a>0
+        tau_min=where(pos,self.tau_min,self.tau_max)
+        tau_max=where(pos,self.tau_max,self.tau_min)
+        alpha_vect=(tau_min-b*sdot**2-c)/a
+        beta_vect=(tau_max-b*sdot**2-c)/a
+        # As with a loop over the joints starting from alpha=-1e15 and
+        # beta=1e15, the NaN bounds (a[i]==0) are ignored, the bounds are
+        # clamped to +-1e15 and the index is 0 if no joint gives a bound
+        alpha_vect[isnan(alpha_vect)]=-1e15
+        beta_vect[isnan(beta_vect)]=1e15
+        ialpha=int(argmax(alpha_vect))
+        ibeta=int(argmin(beta_vect))
+        alpha=alpha_vect[ialpha]
+        beta=beta_vect[ibeta]
+        if alpha<=-1e15:
+            alpha=-1e15
+            ialpha=0
+        if beta>=1e15:
+            beta=1e15
+            ibeta=0
         return [alpha,beta,ialpha,ibeta]
 
 
@@ -226,6 +210,32 @@ class MintimeProblemTorque(MintimeProblemGeneric.MintimeProblemGeneric):
 
 ################## Trajectory utilities ################################
 
+def SampleDynamicsCoefficients(robot,q_vect,qd_vect,qdd_vect):
+    """Compute the dynamics coefficients a, b, c at all the samples of a trajectory
+
+    q_vect, qd_vect, qdd_vect -- dim x n_steps arrays
+    Returns the dim x n_steps arrays [a_vect,b_vect,c_vect]. The environment
+    is locked and the robot state saved only once for all the samples.
+
+    """
+    [dim,n_steps]=shape(q_vect)
+    a_vect=zeros((dim,n_steps))
+    b_vect=zeros((dim,n_steps))
+    c_vect=zeros((dim,n_steps))
+
+    with robot.GetEnv():
+        with robot:
+            for i in range(n_steps):
+                robot.SetDOFValues(q_vect[:,i])
+                robot.SetDOFVelocities(qd_vect[:,i])
+                tm,tc,tg = robot.ComputeInverseDynamics(qdd_vect[:,i],None,returncomponents=True)
+                a_vect[:,i]=robot.ComputeInverseDynamics(qd_vect[:,i]) - tc - tg
+                b_vect[:,i]=tm+tc
+                c_vect[:,i]=tg
+
+    return [a_vect,b_vect,c_vect]
+
+
 def ComputeTorques(robot,traj,grav):
 
     robot.GetEnv().GetPhysicsEngine().SetGravity(grav)
@@ -237,16 +247,12 @@ def ComputeTorques(robot,traj,grav):
     qdd_vect=traj.qdd_vect
     tau_vect=zeros(shape(q_vect))
 
-    for i in range(n_steps):
-        q=q_vect[:,i]
-        qd=qd_vect[:,i]
-        qdd=qdd_vect[:,i]
+    with robot.GetEnv():
         with robot:
-            robot.SetDOFValues(q)
-            robot.SetDOFVelocities(qd)
-            tau = robot.ComputeInverseDynamics(qdd,None,returncomponents=False)
-
-        tau_vect[:,i]=tau
+            for i in range(n_steps):
+                robot.SetDOFValues(q_vect[:,i])
+                robot.SetDOFVelocities(qd_vect[:,i])
+                tau_vect[:,i] = robot.ComputeInverseDynamics(qdd_vect[:,i],None,returncomponents=False)
 
     #Smooth out the first steps
     if n_steps>2:
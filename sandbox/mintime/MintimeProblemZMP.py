@@ -50,39 +50,30 @@ class MintimeProblemZMP(MintimeProblemGeneric.MintimeProblemGeneric):
         self.ymax=limits[3]        
         self.isset_dynamics_limits=True
 
+    def dynamics_limits_key(self):
+        return MintimeProblemGeneric.cache_key([self.xmin,self.xmax,self.ymin,self.ymax])
+
 
 ################################ Dynamics ################################
 
 
     def sample_dynamics(self):
         """Sample the dynamics coefficients along the trajectory"""
-        self.ax_vect=zeros(self.n_steps)
-        self.bx_vect=zeros(self.n_steps)
-        self.cx_vect=zeros(self.n_steps)
-        self.ay_vect=zeros(self.n_steps)
-        self.by_vect=zeros(self.n_steps)
-        self.cy_vect=zeros(self.n_steps)
-        self.d_vect=zeros(self.n_steps)
-        self.e_vect=zeros(self.n_steps)
-        self.f_vect=zeros(self.n_steps)
-
-        for i in range(self.n_steps):
-            q=self.q_vect[:,i]
-            qd=self.qd_vect[:,i]
-            qdd=self.qdd_vect[:,i]
-
-            # Here we assume there is no baselink rotation
-            [ax,bx,cx,ay,by,cy,d,e,f]=ZMP.ComputeCoefsFractionZMP([q[0:3],qd[0:3],qdd[0:3],q[6:len(q)],qd[6:len(q)],qdd[6:len(q)]],self.zmp_params)
-
-            self.ax_vect[i]=ax
-            self.bx_vect[i]=bx
-            self.cx_vect[i]=cx
-            self.ay_vect[i]=ay
-            self.by_vect[i]=by
-            self.cy_vect[i]=cy
-            self.d_vect[i]=d
-            self.e_vect[i]=e
-            self.f_vect[i]=f
+        # One row of [ax,bx,cx,ay,by,cy,d,e,f] per sample
+        coefs_vect=zeros((self.n_steps,9))
+        robot=self.zmp_params['robot']
+
+        with robot.GetEnv():
+            for i in range(self.n_steps):
+                q=self.q_vect[:,i]
+                qd=self.qd_vect[:,i]
+                qdd=self.qdd_vect[:,i]
+
+                # Here we assume there is no baselink rotation
+                coefs_vect[i]=ZMP.ComputeCoefsFractionZMP([q[0:3],qd[0:3],qdd[0:3],q[6:len(q)],qd[6:len(q)],qdd[6:len(q)]],self.zmp_params)
+
+        self.coefs_vect=coefs_vect
+        [self.ax_vect,self.bx_vect,self.cx_vect,self.ay_vect,self.by_vect,self.cy_vect,self.d_vect,self.e_vect,self.f_vect]=transpose(coefs_vect)
 
 
     def dynamics_coefficients(self,s):
@@ -91,7 +82,7 @@ class MintimeProblemZMP(MintimeProblemGeneric.MintimeProblemGeneric):
         s -- point on the trajectory
 
         """
-        return self.linear_interpolate(s,transpose(array([self.ax_vect,self.bx_vect,self.cx_vect,self.ay_vect,self.by_vect,self.cy_vect,self.d_vect,self.e_vect,self.f_vect])))
+        return self.linear_interpolate(s,self.coefs_vect)
 
 
 
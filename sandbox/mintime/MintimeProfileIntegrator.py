@@ -26,12 +26,172 @@ Cf. Pham, Asian-MMS 2012, http://www.normalesup.org/~pham/docs/shortcuts.pdf
 from numpy import *
 from pylab import *
 import bisect
+import multiprocessing
 import MintimeProblemGeneric
 
 
 
 
 
+# Integrator and switch points of the current batch, inherited by the
+# forked worker processes of compute_limiting_curves_batch
+batch_integrator=None
+batch_points=[]
+
+
+def integrate_batch_point(i):
+    [si,sdoti,typei]=batch_points[i]
+    return batch_integrator.integrate_switch_point(si,sdoti,typei)
+
+
+
+
+
+class ProfileCursor():
+    """Linear interpolation of the profile (s_traj,sdot_traj), with the same results
+    as MintimeProblemGeneric.linear_interpolate, for successive points s that
+    are close to each other, as during the integration: the search starts
+    from the index found at the previous call instead of bisecting again
+
+    """
+
+    def __init__(self,s_traj,sdot_traj,elim_out=True):
+        self.s_traj=s_traj
+        self.sdot_traj=sdot_traj
+        self.n=len(s_traj)
+        self.elim_out=elim_out
+        self.i=0
+
+
+    def value(self,s):
+        s_traj=self.s_traj
+        n=self.n
+        if n==0:
+            return 1e15
+        if s<s_traj[0]:
+            if self.elim_out:
+                return 1e15
+            s=s_traj[0]+1e-5
+        if s>s_traj[n-1]:
+            if self.elim_out:
+                return 1e15
+            s=s_traj[n-1]-1e-5
+        # Find the first i such that s_traj[i]>=s
+        i=self.i
+        while i<n-1 and s_traj[i]<s:
+            i+=1
+        while i>0 and s_traj[i-1]>=s:
+            i-=1
+        self.i=i
+        if i==0:
+            return self.sdot_traj[0]
+        r=(s-s_traj[i-1])/(s_traj[i]-s_traj[i-1])
+        return (1-r)*self.sdot_traj[i-1]+r*self.sdot_traj[i]
+
+
+
+
+
+class ProfileIndex():
+    """Lowest value at s of a list of profiles. The s axis is cut at the ends
+    of the profiles and each piece stores the profiles defined on it, so that
+    a query bisects the cuts and interpolates only these profiles, each by a
+    searchsorted on its s array, instead of all the profiles of the list
+
+    """
+
+    def __init__(self,s_traj_list,sdot_traj_list):
+        self.s_traj_list=s_traj_list
+        self.sdot_traj_list=sdot_traj_list
+        self.n=0
+        self.profiles=[]
+        self.cuts=[]
+        # Profiles defined at each cut and on the whole piece between
+        # successive cuts, in the order of the list
+        self.at_cuts=[]
+        self.between_cuts=[]
+        self.update()
+
+
+    def update(self):
+        """Index the profiles appended to the lists since the last update"""
+        for j in range(self.n,len(self.s_traj_list)):
+            s_traj=array(self.s_traj_list[j],dtype=float)
+            self.profiles.append([s_traj,array(self.sdot_traj_list[j],dtype=float)])
+            if len(s_traj)==0:
+                continue
+            k_start=self.insert_cut(s_traj[0])
+            k_end=self.insert_cut(s_traj[-1])
+            for k in range(k_start,k_end):
+                self.at_cuts[k].append(j)
+                self.between_cuts[k].append(j)
+            self.at_cuts[k_end].append(j)
+        self.n=len(self.s_traj_list)
+
+
+    def insert_cut(self,s):
+        """Returns the index of the cut at s, inserting it if needed. The
+        profiles defined on the piece that is split are defined on both new
+        pieces and at the new cut
+
+        """
+        cuts=self.cuts
+        k=bisect.bisect_left(cuts,s)
+        if k<len(cuts) and cuts[k]==s:
+            return k
+        if k>0 and k<len(cuts):
+            piece=self.between_cuts[k-1]
+            self.at_cuts.insert(k,list(piece))
+            self.between_cuts.insert(k,list(piece))
+        else:
+            # No profile is defined beyond the first and last cuts
+            self.at_cuts.insert(k,[])
+            if len(cuts)>0:
+                self.between_cuts.insert(min(k,len(cuts)-1),[])
+        cuts.insert(k,s)
+        return k
+
+
+    def value(self,j,s):
+        """Linear interpolation of the profile j at s, with the same results
+        as MintimeProblemGeneric.linear_interpolate for s in the profile
+
+        """
+        [s_traj,sdot_traj]=self.profiles[j]
+        # First i such that s_traj[i]>=s
+        i=searchsorted(s_traj,s)
+        if i==0:
+            return sdot_traj[0]
+        r=(s-s_traj[i-1])/(s_traj[i]-s_traj[i-1])
+        return (1-r)*sdot_traj[i-1]+r*sdot_traj[i]
+
+
+    def lowest(self,s):
+        """Returns [index,sdot] of the lowest profile at s, [0,1e15] if no
+        profile is defined at s
+
+        """
+        cuts=self.cuts
+        i=bisect.bisect_left(cuts,s)
+        if i<len(cuts) and cuts[i]==s:
+            candidates=self.at_cuts[i]
+        elif i>0 and i<len(cuts):
+            candidates=self.between_cuts[i-1]
+        else:
+            candidates=[]
+        sdot_min=1e15
+        index_min=0
+        for j in candidates:
+            sdot=self.value(j,s)
+            if sdot<sdot_min:
+                sdot_min=sdot
+                index_min=j
+        return [index_min,sdot_min]
+
+
+
+
+
 class MintimeProfileIntegrator():
     
 
@@ -56,6 +216,22 @@ class MintimeProfileIntegrator():
 
         self.possible=True
 
+        # Python lists of the profiles and max velocity curves used by the
+        # cursors, indexed by id of the original array
+        self.list_cache={}
+
+        # Indices of the lists of profiles, indexed by id of the list
+        self.profile_indices={}
+
+        # If batch_mode is True, the profiles from the switch points are
+        # integrated speculatively in n_processes worker processes, then merged
+        self.batch_mode=False
+        self.n_processes=1
+
+        # If not None, integrate_backward appends the interval [s_min,s_max]
+        # where it evaluated the current forward profile
+        self.fw_queries=None
+
 
 
 
@@ -126,6 +302,9 @@ class MintimeProfileIntegrator():
 
     def compute_limiting_curves(self):
 
+        if self.batch_mode:
+            return self.compute_limiting_curves_batch()
+
         main_status="NothingToReport"
         width=self.width
         duration=self.pb.traj.duration
@@ -200,12 +379,191 @@ class MintimeProfileIntegrator():
         return main_status
 
 
+    def integrate_switch_point(self,si,sdoti,typei):
+        """Integrate backward and forward from one switch point against the
+        current profiles, without modifying the state of the integrator
+
+        Returns [status,segment,backward,forward,inserted,queried] where
+        segment is the zero-inertia segment (or None), backward and forward
+        are [s_traj,sdot_traj,status], inserted is the list of [s,sdot,type]
+        of the switch points found during the integration and queried is the
+        list of the intervals where the forward profile was evaluated
+
+        """
+        saved=[self.sws,self.swsd,self.swt]
+        self.sws=[]
+        self.swsd=[]
+        self.swt=[]
+        self.fw_queries=[]
+        status="NothingToReport"
+        segment=None
+        backward=None
+        forward=None
+
+        if typei=='v' or typei=='t':
+            sdoti=self.find_sdot_max(si,sdoti)
+            if sdoti<1e-5:
+                status="CouldnotCrossSwitch/T"
+            [sb,sf]=[si,si]
+            [sdotb,sdotf]=[sdoti,sdoti]
+
+        elif typei=='z':
+            [sb,sdotb,sf,sdotf]=self.find_sdot_max_zi(si,sdoti)
+            if sdotb<0:
+                status="CouldnotCrossSwitch/Z"
+            segment=[array([sb,sf]),array([sdotb,sdotf])]
+
+        if status=="NothingToReport":
+            backward=self.integrate_backward(sb,sdotb)
+            forward=self.integrate_forward(sf,sdotf)
+
+        inserted=[[self.sws[i],self.swsd[i],self.swt[i]] for i in range(len(self.sws))]
+        queried=self.fw_queries
+        self.fw_queries=None
+        [self.sws,self.swsd,self.swt]=saved
+        return [status,segment,backward,forward,inserted,queried]
+
+
+    def is_speculation_valid(self,queried,s_traj_fw):
+        """Test whether a result of integrate_switch_point computed when the
+        forward profile was s_traj_fw is the same as with the current forward
+        profile: this is the case if the profile did not change or if none of
+        the queried intervals meets the old or the current profile, which
+        both evaluate to 1e15 there
+
+        """
+        if s_traj_fw is self.cur_s_traj_fw:
+            return True
+        for s_traj in [s_traj_fw,self.cur_s_traj_fw]:
+            if len(s_traj)==0:
+                continue
+            for [s_min,s_max] in queried:
+                if s_min<=s_traj[-1] and s_max>=s_traj[0]:
+                    return False
+        return True
+
+
+    def compute_limiting_curves_batch(self):
+        """Same as compute_limiting_curves, but the pending switch points are
+        first integrated speculatively, in n_processes worker processes,
+        against the forward profile known at the beginning of the batch. The
+        switch points are then processed in the sequential order: a
+        speculative result is used only if is_speculation_valid, otherwise
+        the switch point is integrated again, so that the results are the
+        same as in the sequential version. This pays off when the backward
+        profiles from the switch points do not reach the forward profiles
+
+        """
+        global batch_integrator,batch_points
+
+        main_status="NothingToReport"
+
+        if len(self.sws)==0:
+            self.sws=list(self.pb.sw_s_list)
+            self.swsd=list(self.pb.sw_sdot_list)
+            self.swt=list(self.pb.sw_type_list)
+
+        s_traj_fw=self.cur_s_traj_fw
+        results={}
+        if self.n_processes>1:
+            indices=[]
+            for i in range(len(self.sws)):
+                [si,sdoti]=[self.sws[i],self.swsd[i]]
+                if not (self.is_above(si,sdoti,self.cur_s_traj_fw,self.cur_sdot_traj_fw) or self.is_above(si,sdoti,self.cur_s_traj_bw,self.cur_sdot_traj_bw)):
+                    indices.append(i)
+            if len(indices)>1:
+                # The forked workers inherit the integrator and the problem,
+                # so that only the indices and the results are pickled
+                batch_integrator=self
+                batch_points=[[self.sws[i],self.swsd[i],self.swt[i]] for i in indices]
+                pool=multiprocessing.Pool(min(self.n_processes,len(indices)))
+                try:
+                    results=dict(zip(indices,pool.map(integrate_batch_point,range(len(indices)))))
+                finally:
+                    pool.close()
+                    pool.join()
+                    batch_integrator=None
+                    batch_points=[]
+
+        pending=[[self.sws[i],self.swsd[i],self.swt[i],results.get(i)] for i in range(len(self.sws))]
+        self.sws=[]
+        self.swsd=[]
+        self.swt=[]
+
+        while len(pending)>0:
+
+            [si,sdoti,typei,result]=pending.pop(0)
+
+            if self.is_above(si,sdoti,self.cur_s_traj_fw,self.cur_sdot_traj_fw) or self.is_above(si,sdoti,self.cur_s_traj_bw,self.cur_sdot_traj_bw):
+                continue
+
+            if result is None or not self.is_speculation_valid(result[5],s_traj_fw):
+                result=self.integrate_switch_point(si,sdoti,typei)
+            [status,segment,backward,forward,inserted,queried]=result
+
+            # The switch points found during the integration come first, as
+            # in the sequential version
+            pending[0:0]=[[s,sdot,t,None] for [s,sdot,t] in inserted]
+
+            if status!="NothingToReport":
+                main_status=status
+                self.possible=False
+                break
+
+            if segment is not None:
+                self.s_traj_list.append(segment[0])
+                self.sdot_traj_list.append(segment[1])
+
+            stop=False
+
+            #Backward part
+            [s_backward,sdot_backward,status]=backward
+            if status=="TouchedBottom":
+                main_status=status
+                self.possible=False
+                stop=True
+
+            if len(s_backward)>0:
+                self.s_traj_list.append(s_backward)
+                self.sdot_traj_list.append(sdot_backward)
+
+            #Forward part
+            [s_forward,sdot_forward,status]=forward
+            if status=="TouchedBottom":
+                main_status=status
+                self.possible=False
+                stop=True
+
+            if len(s_forward)>0:
+                self.s_traj_list.append(s_forward)
+                self.sdot_traj_list.append(sdot_forward)
+                self.cur_s_traj_fw=s_forward
+                self.cur_sdot_traj_fw=sdot_forward
+
+            if stop:
+                break
+
+        # Keep the remaining switch points, as the sequential version does
+        for [si,sdoti,typei,result] in pending:
+            self.sws.append(si)
+            self.swsd.append(sdoti)
+            self.swt.append(typei)
+
+        return main_status
+
+
+
 
 ########################### Integrate forward #############################
 
     def integrate_forward(self,s_start,sdot_start,width=1e15,test_list=False):
 
         dt_integ=self.dt_integ
+        duration=self.pb.duration
+        accel_limits=self.pb.accel_limits
+        maxvel=self.maxvel_cursor()
+        maxvel_velocity=self.maxvel_velocity_cursor()
+        bw=self.cursor(self.cur_s_traj_bw,self.cur_sdot_traj_bw)
         s_curr=s_start
         sdot_curr=sdot_start
         s_res=[]
@@ -218,11 +576,11 @@ class MintimeProfileIntegrator():
             if len(s_res)>width:
                 status="OverpassedPalier"
                 break
-            if s_curr>self.pb.duration: 
+            if s_curr>duration: 
                 status="ReachedEnd"
                 break
             if sdot_curr<0: 
-                [alpha,beta,ialpha,ibeta]=self.pb.accel_limits(s_curr,sdot_curr)
+                [alpha,beta,ialpha,ibeta]=accel_limits(s_curr,sdot_curr)
                 if alpha>beta: #Double check because of possible discretization errors
                     status="CrossedMaxvel"
                 else:
@@ -232,12 +590,12 @@ class MintimeProfileIntegrator():
                 status="TouchedBottom"
                 break
            # If sdot_cur > combined max sdot curve
-            if sdot_curr>self.pb.maxvel_interp(s_curr):
+            if sdot_curr>maxvel.value(s_curr):
                 if(not self.pb.isset_velocity_limits):
                     status="CrossedMaxvel"
                     break
                 # If sdot_cur < sdot_vel, it means that sdot_cur > sdot_acc
-                if sdot_curr<self.pb.maxvel_velocity_interp(s_curr):
+                if sdot_curr<maxvel_velocity.value(s_curr):
                     status="CrossedMaxvel"
                     break
                 # Else: sdot_vel < sdot_cur < sdot_acc
@@ -249,13 +607,13 @@ class MintimeProfileIntegrator():
                             s_curr=s_res[-1]
                             sdot_curr=sdot_res[-1]
                         
-                        [alpha,beta,ialpha,ibeta]=self.pb.accel_limits(s_curr,sdot_curr)
+                        [alpha,beta,ialpha,ibeta]=accel_limits(s_curr,sdot_curr)
                         s_next=s_curr+sdot_curr*dt_integ
-                        sdot_next_vel=self.pb.maxvel_velocity_interp(s_next)
+                        sdot_next_vel=maxvel_velocity.value(s_next)
 
                         # If vel max curve comprised between min and max acc
                         # then follows vel max curve
-                        if sdot_next_vel<sdot_curr+beta*dt_integ and sdot_next_vel>sdot_curr+alpha*dt_integ and s_curr<self.pb.duration:
+                        if sdot_next_vel<sdot_curr+beta*dt_integ and sdot_next_vel>sdot_curr+alpha*dt_integ and s_curr<duration:
                             s_curr=s_next
                             sdot_curr=sdot_next_vel                            
                             s_res.append(s_curr)
@@ -276,11 +634,11 @@ class MintimeProfileIntegrator():
                         # and add this point to the switch point list
                         # This is taken from the Zlajpah ICRA 1996 paper
                         else:
-                            while s_curr+sdot_curr*dt_integ<self.pb.duration:
+                            while s_curr+sdot_curr*dt_integ<duration:
                                 print 'Zlajpah'
                                 s_next=s_curr+sdot_curr*dt_integ
-                                sdot_next_vel=self.pb.maxvel_velocity_interp(s_next)
-                                [alpha,beta,ialpha,ibeta]=self.pb.accel_limits(s_curr,sdot_curr)
+                                sdot_next_vel=maxvel_velocity.value(s_next)
+                                [alpha,beta,ialpha,ibeta]=accel_limits(s_curr,sdot_curr)
                                 if sdot_next_vel>sdot_curr+alpha*dt_integ:
                                     self.sws.insert(0,s_curr)
                                     self.swsd.insert(0,sdot_curr)
@@ -297,7 +655,7 @@ class MintimeProfileIntegrator():
                             
             # Here sdot_cur < combined max sdot curve, so integrate the max acc
             else:                    
-                [alpha,beta,ialpha,ibeta]=self.pb.accel_limits(s_curr,sdot_curr)
+                [alpha,beta,ialpha,ibeta]=accel_limits(s_curr,sdot_curr)
                 start+=1
                 s_res.append(s_curr)
                 sdot_res.append(sdot_curr)
@@ -305,7 +663,7 @@ class MintimeProfileIntegrator():
                 s_next=s_curr+sdot_curr*dt_integ
                 s_curr=s_next
                 sdot_curr=sdot_next
-            if self.is_above(s_curr,sdot_curr,self.cur_s_traj_bw,self.cur_sdot_traj_bw) or (test_list and self.is_above_list(s_curr,sdot_curr)):
+            if sdot_curr>=bw.value(s_curr) or (test_list and self.is_above_list(s_curr,sdot_curr)):
                 s_res.append(s_curr)
                 sdot_res.append(sdot_curr)
                 status="CrossedBwTraj"
@@ -321,6 +679,9 @@ class MintimeProfileIntegrator():
     def integrate_backward(self,s_start,sdot_start,width=1e15,test_list=False):
 
         dt_integ=self.dt_integ
+        accel_limits=self.pb.accel_limits
+        maxvel=self.maxvel_cursor()
+        fw=self.cursor(self.cur_s_traj_fw,self.cur_sdot_traj_fw)
         s_curr=s_start
         sdot_curr=sdot_start
         s_res=[]
@@ -335,7 +696,7 @@ class MintimeProfileIntegrator():
                 status="ReachedBeginning"
                 break
             if sdot_curr<0: 
-                [alpha,beta,ialpha,ibeta]=self.pb.accel_limits(s_curr,sdot_curr)
+                [alpha,beta,ialpha,ibeta]=accel_limits(s_curr,sdot_curr)
                 if alpha>beta: #Double check because of possible discretization errors
                     status="CrossedMaxvel"
                 else:
@@ -344,11 +705,11 @@ class MintimeProfileIntegrator():
             if isnan(sdot_curr): 
                 status="TouchedBottom"
                 break
-            if sdot_curr>self.pb.maxvel_interp(s_curr): 
+            if sdot_curr>maxvel.value(s_curr): 
                 status="CrossedMaxvel"
                 break
 
-            [alpha,beta,ialpha,ibeta]=self.pb.accel_limits(s_curr,sdot_curr)
+            [alpha,beta,ialpha,ibeta]=accel_limits(s_curr,sdot_curr)
             start+=1
             s_res.append(s_curr)
             sdot_res.append(sdot_curr)
@@ -356,12 +717,18 @@ class MintimeProfileIntegrator():
             s_next=s_curr-sdot_curr*dt_integ
             s_curr=s_next
             sdot_curr=sdot_next
-            if self.is_above(s_curr,sdot_curr,self.cur_s_traj_fw,self.cur_sdot_traj_fw) or (test_list and self.is_above_list(s_curr,sdot_curr)):
+            if sdot_curr>=fw.value(s_curr) or (test_list and self.is_above_list(s_curr,sdot_curr)):
                 s_res.append(s_curr)
                 sdot_res.append(sdot_curr)
                 status='CrossedFwTraj'
-                return(array(s_res)[::-1],array(sdot_res)[::-1],status)
+                break
 
+        if self.fw_queries is not None:
+            # s decreases along the integration, unless it became nan
+            if s_curr<=s_start:
+                self.fw_queries.append([s_curr,s_start])
+            else:
+                self.fw_queries.append([-1e15,1e15])
         return(array(s_res)[::-1],array(sdot_res)[::-1],status)
 
 
@@ -483,6 +850,32 @@ class MintimeProfileIntegrator():
 ############################## Utilities ################################
 
 
+    # Element access is much faster on lists than on arrays, so the cursors
+    # work on list copies of the curves, computed once per curve
+    def as_list(self,x):
+        if isinstance(x,list):
+            return x
+        entry=self.list_cache.get(id(x))
+        if entry is None or entry[0] is not x:
+            entry=(x,list(x))
+            self.list_cache[id(x)]=entry
+        return entry[1]
+
+
+    def cursor(self,s_traj,sdot_traj,elim_out=True):
+        return ProfileCursor(self.as_list(s_traj),self.as_list(sdot_traj),elim_out)
+
+
+    def maxvel_cursor(self):
+        return self.cursor(self.pb.t_vect,self.pb.maxvel_curve,False)
+
+
+    def maxvel_velocity_cursor(self):
+        if not self.pb.isset_velocity_limits:
+            return None
+        return self.cursor(self.pb.t_vect,self.pb.maxvel_velocity_curve,False)
+
+
     # Test whether the point (s,sdot) is above the trajectory (s_traj,sdot_traj)
     def is_above(self,s,sdot,s_traj,sdot_traj):
         return sdot>=self.pb.linear_interpolate(s,sdot_traj,s_traj,elim_out=True)
@@ -490,24 +883,24 @@ class MintimeProfileIntegrator():
 
     # Test whether the point (s,sdot) is above the list of traj
     def is_above_list(self,s,sdot):
-        for i in range(len(self.s_traj_list)):
-            s_traj=self.s_traj_list[i]
-            sdot_traj=self.sdot_traj_list[i]
-            if self.is_above(s,sdot,s_traj,sdot_traj):
-                return True
-        return False
+        return sdot>=self.profile_index(self.s_traj_list,self.sdot_traj_list).lowest(s)[1]
             
 
     # Compute the index of the curve which is to the bottom and its value at s
     def compute_index(self,s,s_traj_list,sdot_traj_list):
-        sdot_min=1e15
-        index_min=0
-        for j in range(len(s_traj_list)):
-            sdot=self.pb.linear_interpolate(s,sdot_traj_list[j],s_traj_list[j],elim_out=True)
-            if sdot<sdot_min:
-                sdot_min=sdot
-                index_min=j
-        return [index_min,sdot_min]
+        return self.profile_index(s_traj_list,sdot_traj_list).lowest(s)
+
+
+    # Index of the list of profiles, updated with the profiles appended
+    # since the last call
+    def profile_index(self,s_traj_list,sdot_traj_list):
+        index=self.profile_indices.get(id(s_traj_list))
+        if index is None or index.s_traj_list is not s_traj_list:
+            index=ProfileIndex(s_traj_list,sdot_traj_list)
+            self.profile_indices[id(s_traj_list)]=index
+        else:
+            index.update()
+        return index
 
 
 
@@ -101,7 +101,7 @@ def Reverse(traj):
 def Sub(traj,t1,t2=None):
     new_traj=SampleTrajectory()
     new_traj.dim=traj.dim
-    if t2==None:
+    if t2 is None:
         t2=traj.n_steps
     new_traj.n_steps=t2-t1
     new_traj.t_step=traj.t_step
@@ -215,11 +215,11 @@ class MintimeTrajectory():
 class SampleTrajectory(MintimeTrajectory):
     
     def __init__(self,t_vect=None,q_vect=None,qd_vect=None,qdd_vect=None):
-        if t_vect!=None:
+        if t_vect is not None:
             self.t_vect=t_vect
             self.t_step=t_vect[1]-t_vect[0]
             self.duration=t_vect[-1]-t_vect[0]
-        if q_vect!=None:
+        if q_vect is not None:
             (dim,n_steps)=shape(q_vect)
             self.q_vect=q_vect
             self.dim=dim
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012 Quang-Cuong Pham <cuong.pham@normalesup.org>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Test file for the acceleration limits of MintimeProblemTorque: they must be
+the same as with a loop over the joints, also for the joints with a zero
+coefficient a
+"""
+
+
+
+from numpy import *
+import MintimeTrajectory
+import MintimeProblemTorque
+
+
+
+
+
+def accel_limits_loop(pb,s,sdot):
+    [a,b,c]=pb.dynamics_coefficients(s)
+    alpha=-1e15
+    beta=1e15
+    ialpha=0
+    ibeta=0
+    for i in range(pb.dim):
+        if a[i]>0:
+            tau_min_i=pb.tau_min[i]
+            tau_max_i=pb.tau_max[i]
+        else:
+            tau_min_i=pb.tau_max[i]
+            tau_max_i=pb.tau_min[i]
+        alpha_i=(tau_min_i-b[i]*sdot**2-c[i])/a[i]
+        beta_i=(tau_max_i-b[i]*sdot**2-c[i])/a[i]
+        if alpha_i>alpha:
+            alpha=alpha_i
+            ialpha=i
+        if beta_i<beta:
+            beta=beta_i
+            ibeta=i
+    return [alpha,beta,ialpha,ibeta]
+
+
+
+
+################## Define a test trajectory ##############
+
+
+q_list=[[0,0,0],[1,-1,0.5]]
+qd_list=[[0,0,0],[0,0,0]]
+T_list=[1]
+pwp_traj=MintimeTrajectory.Interpolate(q_list,qd_list,T_list)
+traj=pwp_traj.GetSampleTraj(1,0.01)
+
+
+
+
+################# Compare with the loop over the joints #################
+
+
+seterr(divide='ignore',invalid='ignore')
+random.seed(0)
+n=traj.n_steps
+s_list=linspace(0,1,23)
+
+pb=MintimeProblemTorque.MintimeProblemTorque(None,traj)
+pb.set_dynamics_limits([array([-10.,-5,-2]),array([10.,5,2])])
+# Joint 1 has a zero row in a: its bounds are 0/0 if tau=c, else +-inf.
+# Joint 2 has a zero row in a and b and c at the torque bound: 0/0 for alpha
+pb.a_vect=array([random.uniform(-1,1,n),zeros(n),zeros(n)])
+pb.b_vect=array([random.uniform(-1,1,n),random.uniform(-1,1,n),zeros(n)])
+pb.c_vect=array([random.uniform(-1,1,n),5*ones(n),2*ones(n)])
+for s in s_list:
+    for sdot in [0,0.5,2,10]:
+        assert(pb.accel_limits(s,sdot)==accel_limits_loop(pb,s,sdot))
+
+# No joint gives a bound
+pb.set_dynamics_limits([zeros(3),zeros(3)])
+pb.a_vect=zeros((3,n))
+pb.b_vect=zeros((3,n))
+pb.c_vect=zeros((3,n))
+for s in s_list:
+    assert(pb.accel_limits(s,1)==[-1e15,1e15,0,0])
+    assert(pb.accel_limits(s,1)==accel_limits_loop(pb,s,1))
+
+print 'The acceleration limits are the same as with a loop over the joints'
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012 Quang-Cuong Pham <cuong.pham@normalesup.org>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Test file for the batch mode of MintimeProfileIntegrator: the profiles and
+the final velocity profile must be the same as in the sequential mode
+"""
+
+
+
+from openravepy import *
+from numpy import *
+import time
+import MintimeTrajectory
+import MintimeProblemTorque
+import MintimeProfileIntegrator
+
+
+
+
+
+################# Loading the environment ########################
+
+
+env = Environment() # create openrave environment
+env.Load('robots/twodof.robot.xml')
+
+robot=env.GetRobots()[0]
+
+grav=[0,0,-9.8]
+env.GetPhysicsEngine().SetGravity(grav)
+
+n=robot.GetDOF()
+robot.SetDOFLimits(-10*ones(n),10*ones(n))
+
+
+
+
+################## Define a test trajectory ##############
+
+# Several waypoints, so that there are several switch points whose profiles
+# meet each other
+
+q_list=[[0,0],[-1.29,-0.1],[-2.5,-2.35],[-0.19,-1.69]]
+v=1e-2
+qd_list=[[v,v],[v,v],[v,v],[v,v]]
+T_list=[1,1,1]
+pwp_traj=MintimeTrajectory.Interpolate(q_list,qd_list,T_list)
+
+T=sum(T_list)
+n_discr=300.
+t_step=T/n_discr
+traj=pwp_traj.GetSampleTraj(T,t_step)
+
+tau_min=array([-40,-20])
+tau_max=array([40,20])
+qd_max=array([3,3])
+
+pb=MintimeProblemTorque.MintimeProblemTorque(robot,traj)
+pb.set_dynamics_limits([tau_min,tau_max])
+pb.set_velocity_limits(qd_max)
+pb.disc_thr=10 # Threshold in the discontinuity point search
+pb.preprocess()
+
+
+
+
+################### Run the algorithm ########################
+
+
+def run(batch_mode,n_processes):
+    algo=MintimeProfileIntegrator.MintimeProfileIntegrator(pb)
+    algo.dt_integ=t_step/10 # time step to integrate the limiting curves
+    algo.width=5 # window to test if we can get through a switching point
+    algo.palier=10 # length of the palier around zero inertia points
+    algo.tolerance_ends=1e-2 # threshold at the ends
+    algo.sdot_init=1e-4 # initial value of sdot
+    algo.sdot_final=1e-4 # final value of sdot
+    algo.batch_mode=batch_mode
+    algo.n_processes=n_processes
+    deb=time.time()
+    algo.integrate_all_profiles()
+    algo.integrate_final()
+    print 'batch_mode='+str(batch_mode)+', n_processes='+str(n_processes)+': possible='+str(algo.possible)+', '+str(len(algo.s_res))+' steps, '+str(len(algo.s_traj_list))+' profiles, '+str(time.time()-deb)+'s'
+    return algo
+
+
+print 'Switch points: '+str(len(pb.sw_s_list))
+
+sequential=run(False,1)
+for n_processes in [1,3]:
+    batch=run(True,n_processes)
+    assert(batch.possible==sequential.possible)
+    assert(len(batch.s_traj_list)==len(sequential.s_traj_list))
+    for i in range(len(sequential.s_traj_list)):
+        assert(array_equal(batch.s_traj_list[i],sequential.s_traj_list[i]))
+        assert(array_equal(batch.sdot_traj_list[i],sequential.sdot_traj_list[i]))
+    assert(array_equal(batch.s_res,sequential.s_res))
+    assert(array_equal(batch.sdot_res,sequential.sdot_res))
+
+print 'Batch and sequential modes give the same profiles'
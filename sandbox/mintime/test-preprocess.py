@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012 Quang-Cuong Pham <cuong.pham@normalesup.org>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Test file for the preprocessing cache of MintimeProblemGeneric: preprocessing
+again a problem whose limits changed must give the same results as
+preprocessing a new problem
+"""
+
+
+
+from openravepy import *
+from numpy import *
+import MintimeTrajectory
+import MintimeProblemTorque
+
+
+
+
+
+################# Loading the environment ########################
+
+
+env = Environment() # create openrave environment
+env.Load('robots/twodof.robot.xml')
+
+robot=env.GetRobots()[0]
+
+grav=[0,0,-9.8]
+env.GetPhysicsEngine().SetGravity(grav)
+
+n=robot.GetDOF()
+robot.SetDOFLimits(-10*ones(n),10*ones(n))
+
+
+
+
+################## Define a test trajectory ##############
+
+
+q_list=[[0,0],[-1.29,-0.1],[-2.5,-2.35],[-0.19,-1.69]]
+v=1e-2
+qd_list=[[v,v],[v,v],[v,v],[v,v]]
+T_list=[1,1,1]
+pwp_traj=MintimeTrajectory.Interpolate(q_list,qd_list,T_list)
+
+T=sum(T_list)
+n_discr=300.
+t_step=T/n_discr
+traj=pwp_traj.GetSampleTraj(T,t_step)
+
+tau_min=array([-40,-20])
+tau_max=array([40,20])
+
+
+
+
+################### Compare with new problems ########################
+
+
+def new_problem(qd_max,disc_thr):
+    pb=MintimeProblemTorque.MintimeProblemTorque(robot,traj)
+    pb.set_dynamics_limits([tau_min,tau_max])
+    pb.set_velocity_limits(qd_max)
+    pb.disc_thr=disc_thr
+    pb.preprocess()
+    return pb
+
+
+def check_same(pb,pb_ref):
+    assert(array_equal(pb.maxvel_accel_curve,pb_ref.maxvel_accel_curve))
+    assert(array_equal(pb.maxvel_velocity_curve,pb_ref.maxvel_velocity_curve))
+    assert(array_equal(pb.maxvel_curve,pb_ref.maxvel_curve))
+    assert(pb.sw_s_list==pb_ref.sw_s_list)
+    assert(pb.sw_sdot_list==pb_ref.sw_sdot_list)
+    assert(pb.sw_type_list==pb_ref.sw_type_list)
+
+
+pb=new_problem(array([3,3]),10)
+
+# Count the samplings of the dynamics, which must be done only once
+n_samplings=[0]
+sample_dynamics=pb.sample_dynamics
+def counted_sample_dynamics():
+    n_samplings[0]+=1
+    sample_dynamics()
+pb.sample_dynamics=counted_sample_dynamics
+
+for [qd_max,disc_thr] in [[array([3,3]),10],[array([1,2]),10],[array([1,2]),0.5],[array([3,3]),0.5],[array([3,3]),10]]:
+    pb.set_velocity_limits(qd_max)
+    pb.disc_thr=disc_thr
+    pb.preprocess()
+    pb_ref=new_problem(qd_max,disc_thr)
+    print 'qd_max='+str(qd_max)+', disc_thr='+str(disc_thr)+': '+str(len(pb.sw_s_list))+' switch points'
+    check_same(pb,pb_ref)
+
+assert(n_samplings[0]==0)
+
+# The torque limits too
+pb.set_dynamics_limits([tau_min/2,tau_max/2])
+pb.preprocess()
+pb_ref=MintimeProblemTorque.MintimeProblemTorque(robot,traj)
+pb_ref.set_dynamics_limits([tau_min/2,tau_max/2])
+pb_ref.set_velocity_limits(array([3,3]))
+pb_ref.disc_thr=10
+pb_ref.preprocess()
+check_same(pb,pb_ref)
+
+print 'Preprocessing again gives the same results as a new problem'
@@ -68,17 +68,33 @@ class GraspReachability(metaclass.AutoReloader):
             except openrave_exception,e:
                 print e
         return clone
-    def computeGraspDistribution(self,randomgrasps=False,**kwargs):
-        """computes distribution of all grasps"""
+    def getEnvironmentKey(self,target,resolution=0.001):
+        """returns a hashable key of the state of the bodies other than the robot and target: their geometry, enabled state, quantized pose and joint values"""
+        key = []
+        for body in self.env.GetBodies():
+            if body != self.robot and body != target:
+                state = r_[body.GetTransformPose(),body.GetDOFValues()]
+                key.append((body.GetName(),body.GetKinematicsGeometryHash(),body.IsEnabled(),tuple(numpy.round(state/resolution).astype(int))))
+        return tuple(sorted(key))
+    def computeGraspDistribution(self,randomgrasps=False,usecache=False,**kwargs):
+        """computes distribution of all grasps
+
+        :param usecache: if True, the distributions are cached by the inverse reachability models using the target pose and the state of the other bodies (see getEnvironmentKey), so revisiting a target at the same pose does not recompute the valid grasps
+        """
         densityfns = []
         samplerfns = []
         totalbounds = None
         for irmodel,gmodel in self.irgmodels:
-            validgrasps,validindices = gmodel.computeValidGrasps(checkik=False,backupdist=0.01)
-            def graspiter():
+            def graspiter(gmodel=gmodel):
+                # valid grasps are only computed if the distribution is not cached
+                validgrasps,validindices = gmodel.computeValidGrasps(checkik=False,backupdist=0.01)
                 for grasp,graspindex in izip(validgrasps,validindices):
                     yield gmodel.getGlobalGraspTransform(grasp,collisionfree=True),(gmodel,graspindex)
-            densityfn,samplerfn,bounds = irmodel.computeAggregateBaseDistribution(graspiter(),**kwargs)
+            if usecache:
+                cachekey = (gmodel.target.GetName(),gmodel.target.GetKinematicsGeometryHash(),gmodel.manip.GetName(),self.getEnvironmentKey(gmodel.target))
+                densityfn,samplerfn,bounds = irmodel.computeAggregateBaseDistribution(graspiter(),cachekey=cachekey,Ttarget=gmodel.target.GetTransform(),**kwargs)
+            else:
+                densityfn,samplerfn,bounds = irmodel.computeAggregateBaseDistribution(graspiter(),**kwargs)
             if densityfn is not None:
                 densityfns.append(densityfn)
                 samplerfns.append(samplerfn)
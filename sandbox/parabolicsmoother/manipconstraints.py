@@ -1,4 +1,4 @@
-from numpy import arange ,array, cross, hstack, linalg, sqrt
+from numpy import arange ,array, atleast_2d, cross, einsum, hstack, linalg, sqrt, zeros
 from openravepy import AABB
 import os
 import sys
@@ -123,38 +123,56 @@ class ManipConstraintChecker2(object):
         return AABB(pos, extents)
 
     
-    def _ComputeManipMaxSpeedAccel(self, q, qd, qdd):
-        speedaccels = [] # list of lists of the form (speed, accel) for manipulators
-        for manipinfo in self._listCheckManips:
-            with self.robot:
-                endeffindex = manipinfo.plink.GetIndex()
-
-                self.robot.SetDOFValues(q, manipinfo.vuseddofindices)
-                self.robot.SetDOFVelocities(qd)
-                linkvels = self.robot.GetLinkVelocities()
-                linkaccels = self.robot.GetLinkAccelerations(qdd)
-                endeffvellin = linkvels[endeffindex][:3]
-                endeffvelang = linkvels[endeffindex][3:]
-                endeffacclin = linkaccels[endeffindex][:3]
-                endeffaccang = linkaccels[endeffindex][3:]
-                
-                Teff = manipinfo.plink.GetTransform()
-
-            speedaccel = [0, 0]
-            for point in manipinfo.checkpoints:
-                newpoint = Teff[0:3, 0:3].dot(point)
+    def _ComputeEndEffectorVelAccels(self, manipinfo, Q, Qd, Qdd):
+        """Returns the linear and angular velocities and accelerations of the end-effector, (T, 3)
+        arrays each, and its rotation matrices, a (T, 3, 3) array, for all the samples of the (T,
+        ndof) arrays Q, Qd, Qdd.
+        """
+        nsamples = len(Q)
+        linkvelaccels = zeros((nsamples, 2, 6))
+        rotations = zeros((nsamples, 3, 3))
+        with self.robot:
+            endeffindex = manipinfo.plink.GetIndex()
+            for isample in xrange(nsamples):
+                self.robot.SetDOFValues(Q[isample], manipinfo.vuseddofindices)
+                self.robot.SetDOFVelocities(Qd[isample])
+                linkvelaccels[isample, 0] = self.robot.GetLinkVelocities()[endeffindex]
+                linkvelaccels[isample, 1] = self.robot.GetLinkAccelerations(Qdd[isample])[endeffindex]
+                rotations[isample] = manipinfo.plink.GetTransform()[0:3, 0:3]
+        return linkvelaccels[:, 0, :3], linkvelaccels[:, 0, 3:], linkvelaccels[:, 1, :3], linkvelaccels[:, 1, 3:], rotations
 
-                vpoint = endeffvellin + cross(endeffvelang, newpoint)
-                actualmanipspeed = linalg.norm(vpoint)
-                if actualmanipspeed > speedaccel[0]:
-                    speedaccel[0] = actualmanipspeed
 
-                apoint = endeffacclin + cross(endeffvelang, cross(endeffvelang, newpoint)) + cross(endeffaccang, newpoint)
-                actualmanipaccel = linalg.norm(apoint)
-                if actualmanipaccel > speedaccel[1]:
-                    speedaccel[1] = actualmanipaccel
+    @staticmethod
+    def _ComputePointSpeedsAccels(checkpoints, endeffvellin, endeffvelang, endeffacclin, endeffaccang, rotations):
+        """Returns the (T, P) arrays of speeds and accelerations of the P checkpoints (given in the
+        end-effector frame) for all the T samples.
+        """
+        newpoints = einsum('tij,pj->tpi', rotations, checkpoints)
+        velang = endeffvelang[:, None, :]
+        vpoints = endeffvellin[:, None, :] + cross(velang, newpoints)
+        apoints = endeffacclin[:, None, :] + cross(velang, cross(velang, newpoints)) + cross(endeffaccang[:, None, :], newpoints)
+        return sqrt((vpoints**2).sum(axis=2)), sqrt((apoints**2).sum(axis=2))
+
 
-            speedaccels.append(speedaccel)
+    def ComputeManipMaxSpeedAccels(self, Q, Qd, Qdd):
+        """Batched version of _ComputeManipMaxSpeedAccel. Q, Qd, Qdd are (T, ndof) arrays of
+        positions, velocities and accelerations. Returns a list with, for each manipulator, a pair
+        of (T,) arrays holding the max speed and max acceleration over the checkpoints.
+        """
+        Q = atleast_2d(Q)
+        Qd = atleast_2d(Qd)
+        Qdd = atleast_2d(Qdd)
+        speedaccels = []
+        for manipinfo in self._listCheckManips:
+            speeds, accels = self._ComputePointSpeedsAccels(array(manipinfo.checkpoints), *self._ComputeEndEffectorVelAccels(manipinfo, Q, Qd, Qdd))
+            speedaccels.append((speeds.max(axis=1), accels.max(axis=1)))
+        return speedaccels
+
+
+    def _ComputeManipMaxSpeedAccel(self, q, qd, qdd):
+        speedaccels = [] # list of lists of the form (speed, accel) for manipulators
+        for speeds, accels in self.ComputeManipMaxSpeedAccels([q], [qd], [qdd]):
+            speedaccels.append([speeds[0], accels[0]])
         return speedaccels
                     
 
@@ -167,37 +185,12 @@ class ManipConstraintChecker2(object):
         
         point = manipinfo.checkpoints[ipoint]
         T = arange(0, traj.GetDuration(), timestep)
-        speeds, accels = [], []
-
-        with self.robot:
-            endeffindex = manipinfo.plink.GetIndex()
-            for t in T:
-                q = curvesnd.EvalPos(t)
-                qd = curvesnd.EvalVel(t)
-                qdd = curvesnd.EvalAcc(t)
-
-                self.robot.SetDOFValues(q, manipinfo.vuseddofindices)
-                self.robot.SetDOFVelocities(qd)
-                linkvels = self.robot.GetLinkVelocities()
-                linkaccels = self.robot.GetLinkAccelerations(qdd)
-                endeffvellin = linkvels[endeffindex][:3]
-                endeffvelang = linkvels[endeffindex][3:]
-                endeffacclin = linkaccels[endeffindex][:3]
-                endeffaccang = linkaccels[endeffindex][3:]
-                Teff = manipinfo.plink.GetTransform()
-
-                newpoint = Teff[0:3, 0:3].dot(point)
-
-                vpoint = endeffvellin + cross(endeffvelang, newpoint)
-                actualmanipspeed = linalg.norm(vpoint)
-
-                apoint = endeffacclin + cross(endeffvelang, cross(endeffvelang, newpoint)) + cross(endeffaccang, newpoint)
-                actualmanipaccel = linalg.norm(apoint)
-
-                speeds.append(actualmanipspeed)
-                accels.append(actualmanipaccel)
+        Q = curvesnd.EvalPos(T)
+        Qd = curvesnd.EvalVel(T)
+        Qdd = curvesnd.EvalAcc(T)
 
-        return T, speeds, accels
+        speeds, accels = self._ComputePointSpeedsAccels(array([point]), *self._ComputeEndEffectorVelAccels(manipinfo, Q, Qd, Qdd))
+        return T, list(speeds[:, 0]), list(accels[:, 0])
 
 
     def ComputeGlobalPoint(self, ipoint, imanip=0, q=None):
@@ -2,7 +2,6 @@ from ramp import *
 import mpmath as mp
 import numpy as np
 import bisect
-from copy import deepcopy
 
 
 class ParabolicPath(object):
@@ -10,6 +9,7 @@ class ParabolicPath(object):
     def __init__(self, curvesndVect=[]):
         self.curvesndVect = []
         self.duratoin = zero
+        self._packedtable = None
         
         for curvesnd in curvesndVect:
             self.AppendParabolicCurvesND(curvesnd)
@@ -20,8 +20,9 @@ class ParabolicPath(object):
     
         
     def AppendParabolicCurvesND(self, curvesnd):
+        self._packedtable = None
         if (self.IsEmpty()):
-            self.curvesndVect.append(deepcopy(curvesnd))
+            self.curvesndVect.append(curvesnd.Copy())
             self.duration = curvesnd.duration
 
             self.mainSwitchpoints = [0, self.duration]
@@ -31,7 +32,7 @@ class ParabolicPath(object):
             self.v0Vect = np.array(curvesnd.v0Vect)
             self.v1Vect = np.array(curvesnd.v1Vect)
         else:
-            self.curvesndVect.append(deepcopy(curvesnd))
+            self.curvesndVect.append(curvesnd.Copy())
             self.curvesndVect[-1].SetInitialValues(self.x1Vect)
             self.x1Vect = self.curvesndVect[-1].x1Vect
             self.v1Vect = self.curvesndVect[-1].v1Vect
@@ -53,24 +54,44 @@ class ParabolicPath(object):
 
     
     def EvalPos(self, t):
+        if np.ndim(t) > 0:
+            # array of times, returns a (len(t), ndof) array
+            return EvalPackedTable(self.GetPackedTable(), t, 0, self.duration)
         index, remainder = self.FindParabolicCurvesNDIndex(t)
         return self.curvesndVect[index].EvalPos(remainder)
 
     
     def EvalVel(self, t):
+        if np.ndim(t) > 0:
+            # array of times, returns a (len(t), ndof) array
+            return EvalPackedTable(self.GetPackedTable(), t, 1, self.duration)
         index, remainder = self.FindParabolicCurvesNDIndex(t)
         return self.curvesndVect[index].EvalVel(remainder)
     
     
     def EvalAcc(self, t):
+        if np.ndim(t) > 0:
+            # array of times, returns a (len(t), ndof) array
+            return EvalPackedTable(self.GetPackedTable(), t, 2, self.duration)
         index, remainder = self.FindParabolicCurvesNDIndex(t)
         return self.curvesndVect[index].EvalAcc(remainder)
 
     
+    def GetPackedTable(self):
+        """Concatenates the packed tables (see ParabolicCurvesND.GetPackedTable) of all the
+        ParabolicCurvesND in this path, shifting their switch times to the path time.
+        """
+        if self._packedtable is None:
+            tables = [curvesnd.GetPackedTable() for curvesnd in self.curvesndVect]
+            tswitch = np.hstack([table[0] + float(tstart) for table, tstart in zip(tables, self.mainSwitchpoints)])
+            self._packedtable = (tswitch,) + tuple(np.vstack([table[i] for table in tables]) for i in xrange(1, 4))
+        return self._packedtable
+
+    
     def FindParabolicCurvesNDIndex(self, t):
         t = ConvertFloatToMPF(t)
-        assert(t >= -epsilon)
-        assert(t <= Add(self.duration, epsilon))
+        assert(t >= -num.epsilon)
+        assert(t <= Add(self.duration, num.epsilon))
 
         if (t <= 0):
             index = 0
@@ -88,6 +109,7 @@ class ParabolicPath(object):
         assert(len(curvesndVect) > 0)
 
         self.curvesndVect = []
+        self._packedtable = None
         for curvesnd in curvesndVect:
             self.AppendParabolicCurvesND(curvesnd)
         return
@@ -105,15 +127,15 @@ class ParabolicPath(object):
         tempCurvesND.Initialize(self.curvesndVect[i0].curves)
         tempCurvesND.TrimBack(rem0)
         if (tempCurvesND.duration > 0):
-            newCurvesNDVect.append(deepcopy(tempCurvesND))
+            newCurvesNDVect.append(tempCurvesND.Copy())
 
         for curvesnd in curvesndVectIn:
-            newCurvesNDVect.append(deepcopy(curvesnd))
+            newCurvesNDVect.append(curvesnd.Copy())
 
         tempCurvesND.Initialize(self.curvesndVect[i1].curves)
         tempCurvesND.TrimFront(rem1)
         if (tempCurvesND.duration > 0):
-            newCurvesNDVect.append(deepcopy(tempCurvesND))
+            newCurvesNDVect.append(tempCurvesND.Copy())
 
         for i in xrange(i1 + 1, len(self.curvesndVect)):
             newCurvesNDVect.append(self.curvesndVect[i])
@@ -137,16 +159,16 @@ def ConvertDynamicPathStringIntoParabolicPath(dynamicpathstring):
         curves = [ParabolicCurve() for _ in xrange(ndof)]
         for idof in xrange(ndof):
             ramp1ddata = data[curoffset + 2 + idof]
-            x0, v0, x1, v1, a1, v, a2, tswitch1, tswitch2, ttotal = [mp.mpf(x) for x in ramp1ddata.split(" ")]
+            x0, v0, x1, v1, a1, v, a2, tswitch1, tswitch2, ttotal = [num.mpf(x) for x in ramp1ddata.split(" ")]
             ramps = []
             ramp0 = Ramp(v0, a1, tswitch1, x0)
-            if ramp0.duration > epsilon:
+            if ramp0.duration > num.epsilon:
                 ramps.append(ramp0)
             ramp1 = Ramp(v, 0, tswitch2 - tswitch1, ramp0.x1)
-            if ramp1.duration > epsilon:
+            if ramp1.duration > num.epsilon:
                 ramps.append(ramp1)
             ramp2 = Ramp(v, a2, ttotal - tswitch2, ramp1.x1)
-            if ramp2.duration > epsilon:
+            if ramp2.duration > num.epsilon:
                 ramps.append(ramp2)
             assert(len(ramps) > 0)
             curve = ParabolicCurve(ramps)
@@ -2,60 +2,249 @@ from mpmath import mp, iv, arange
 import numpy as np
 import matplotlib.pyplot as plt
 import bisect
-from copy import deepcopy
-
-_prec = 500
-epsilon = mp.mpf('1e-100')
-
-mp.dps = _prec
-iv.dps = _prec
-pointfive = mp.mpf('0.5')
-zero = mp.mpf('0')
-inf = mp.inf
+import cmath
+import math
+import operator
+from contextlib import contextmanager
 
 """
 ramp.py
 
-For testing and verifying results of precise interpolation.
+Parabolic ramps and curves used for testing and verifying the results of interpolation.
+
+All arithmetic goes through the number backend num. By default it is 'float64', which works on
+plain python floats and compares with a tolerance of 1e-10. The 'mpmath' backend keeps the
+original 500-digit arithmetic with a tolerance of 1e-100 and is meant for verifying the float64
+results, e.g.
+
+    with UseBackend('mpmath'):
+        ret = CheckParabolicCurvesND(curvesnd, ...)
+
+Modules built on top of this one should access the constants that depend on the backend through
+num (num.epsilon, num.mpf, ...) instead of importing them by value.
 """
 
+_prec = 500
+
+class _FloatInterval(object):
+    """Closed interval [a, b] mimicking the parts of mpmath's iv.mpf used in interpolation.py.
+    """
+    def __init__(self, a, b):
+        self.a = a
+        self.b = b
+
+    @property
+    def mid(self):
+        return 0.5*(self.a + self.b)
+
+    def __contains__(self, x):
+        return self.a <= x <= self.b
+
+    def __repr__(self):
+        return '[{0}, {1}]'.format(self.a, self.b)
+
+
+def _FloatSqrt(x):
+    if isinstance(x, complex) or x < 0:
+        return cmath.sqrt(x)
+    return math.sqrt(x)
+
+def _FloatNthRoot(x, n):
+    # mpmath returns the principal root for negative or complex arguments
+    if isinstance(x, complex) or x < 0:
+        return complex(x)**(1.0/n)
+    return x**(1.0/n)
+
+def _FloatSign(x):
+    return float((x > 0) - (x < 0))
+
+def _FloatSum(A):
+    try:
+        return math.fsum(A)
+    except TypeError:
+        # complex numbers
+        return sum(A)
+
+def _FloatProd(A):
+    return reduce(operator.mul, A, 1.0)
+
+def _FloatNStr(x, n=6):
+    if isinstance(x, complex):
+        return str(x)
+    return '%.*g'%(min(n, 17), x)
+
+def _FloatIsReal(x):
+    return not isinstance(x, complex) or abs(x.imag) <= num.epsilon
+
+def _FloatReal(x):
+    return x.real
+
+def _FloatFindRoot(f, x0, tol=1e-14, maxiter=100):
+    """Secant method replacement for mp.findroot.
+    """
+    x0 = float(x0)
+    x1 = x0*(1 + 1e-4) + 1e-4
+    f0 = f(x0)
+    f1 = f(x1)
+    for it in xrange(maxiter):
+        if f1 == f0:
+            break
+        x2 = x1 - f1*(x1 - x0)/(f1 - f0)
+        x0, f0 = x1, f1
+        x1, f1 = x2, f(x2)
+        if abs(x1 - x0) <= tol*max(1.0, abs(x1)):
+            return x1
+    if abs(f1) <= num.epsilon:
+        return x1
+    raise ValueError('findroot: could not find a root starting from x0 = %r'%x0)
+
+def _FloatConvert(a):
+    return float(a)
+
+def _MPConvert(a):
+    if type(a) is not mp.mpf:
+        return mp.mpf("{:.15e}".format(a))
+    else:
+        return a
+
+def _MPIsReal(x):
+    return type(x) is mp.mpf
+
+_backends = {
+    'float64': dict(
+        epsilon=1e-10,
+        mpf=float,
+        convert=_FloatConvert,
+        tonumber=_FloatConvert,
+        fabs=abs,
+        fadd=lambda a, b, exact=True: a + b,
+        fsub=lambda a, b, exact=True: a - b,
+        fmul=lambda a, b, exact=True: a*b,
+        fneg=lambda a, exact=True: -a,
+        fdiv=operator.truediv,
+        fsum=_FloatSum,
+        fprod=_FloatProd,
+        sqrt=_FloatSqrt,
+        nthroot=_FloatNthRoot,
+        power=operator.pow,
+        sign=_FloatSign,
+        log10=math.log10,
+        floor=math.floor,
+        ceil=math.ceil,
+        nstr=_FloatNStr,
+        findroot=_FloatFindRoot,
+        interval=_FloatInterval,
+        isreal=_FloatIsReal,
+        re=_FloatReal,
+    ),
+    'mpmath': dict(
+        epsilon=mp.mpf('1e-100'),
+        mpf=mp.mpf,
+        convert=mp.convert,
+        tonumber=_MPConvert,
+        fabs=mp.fabs,
+        fadd=mp.fadd,
+        fsub=mp.fsub,
+        fmul=mp.fmul,
+        fneg=mp.fneg,
+        fdiv=mp.fdiv,
+        fsum=mp.fsum,
+        fprod=mp.fprod,
+        sqrt=mp.sqrt,
+        nthroot=mp.nthroot,
+        power=mp.power,
+        sign=mp.sign,
+        log10=mp.log10,
+        floor=mp.floor,
+        ceil=mp.ceil,
+        nstr=mp.nstr,
+        findroot=mp.findroot,
+        interval=lambda a, b: iv.mpf([a, b]),
+        isreal=_MPIsReal,
+        re=mp.re,
+    ),
+}
+
+class NumberBackend(object):
+    """Holds the arithmetic primitives of the currently selected backend. There is only one
+    instance, num, so that modules importing it always see the current backend.
+    """
+    def __init__(self, name):
+        self.name = None
+        self.Set(name)
+
+    def Set(self, name):
+        if name not in _backends:
+            raise ValueError('unknown number backend %r, should be one of %s'%(name, sorted(_backends.keys())))
+        if name == 'mpmath':
+            mp.dps = _prec
+            iv.dps = _prec
+        self.__dict__.update(_backends[name])
+        self.name = name
+
+num = NumberBackend('float64')
+
+pointfive = 0.5
+zero = 0.0
+inf = float('inf')
+epsilon = num.epsilon # kept for backward compatibility, use num.epsilon
+
+def SetBackend(name):
+    """Selects the number backend, 'float64' (default) or 'mpmath'. Returns the previous one.
+    """
+    global epsilon
+    prevname = num.name
+    num.Set(name)
+    epsilon = num.epsilon
+    return prevname
+
+@contextmanager
+def UseBackend(name):
+    """Temporarily selects a number backend, typically 'mpmath' to verify float64 results.
+    """
+    prevname = SetBackend(name)
+    try:
+        yield num
+    finally:
+        SetBackend(prevname)
+
+
 # Aliases (alphabetically ordered)
 def Abs(a):
-    return mp.fabs(a)
+    return num.fabs(a)
 
 def Add(a, b):
-    return mp.fadd(a, b, exact=True)
+    return num.fadd(a, b, exact=True)
 
 def IsEqual(a, b):
     # It is better to check equality using this function than using == when a or b or both are a
     # product of some operations involving division.    
-    return Abs(Sub(a, b)) <= epsilon
+    return Abs(Sub(a, b)) <= num.epsilon
 
 def Mul(a, b):
-    return mp.fmul(a, b, exact=True)
+    return num.fmul(a, b, exact=True)
 
 def Neg(a):
-    return mp.fneg(a, exact=True)
+    return num.fneg(a, exact=True)
 
 def Prod(A):
     assert(len(A) > 0)
-    return mp.fprod(A)
+    return num.fprod(A)
 
 def Sqr(a):
-    return mp.fmul(a, a, exact=True)
+    return num.fmul(a, a, exact=True)
 
 def Sub(a, b):
-    return mp.fsub(a, b, exact=True)
+    return num.fsub(a, b, exact=True)
 
 def Sum(A):
     assert(len(A) > 0)
-    return mp.fsum(A)
+    return num.fsum(A)
 
 def ConvertFloatToMPF(a):
-    if type(a) is not mp.mpf:
-        return mp.mpf("{:.15e}".format(a))
-    else:
-        return a
+    """Converts a to the number type of the current backend (float or mp.mpf).
+    """
+    return num.tonumber(a)
 
 def ConvertFloatArrayToMPF(A):
     A_ = np.asarray([ConvertFloatToMPF(x) for x in A])
@@ -72,7 +261,7 @@ class Ramp(object):
     """
     def __init__(self, v0, a, dur, x0=zero):
         dur = ConvertFloatToMPF(dur)
-        assert(dur >= -epsilon)
+        assert(dur >= -num.epsilon)
 
         self.x0 = ConvertFloatToMPF(x0)
         self.v0 = ConvertFloatToMPF(v0)
@@ -86,7 +275,7 @@ class Ramp(object):
 
     def Initialize(self, v0, a, dur, x0=zero):
         dur = ConvertFloatToMPF(dur)
-        assert(dur >= -epsilon)
+        assert(dur >= -num.epsilon)
 
         self.x0 = ConvertFloatToMPF(x0)
         self.v0 = ConvertFloatToMPF(v0)
@@ -100,7 +289,7 @@ class Ramp(object):
 
     def UpdateDuration(self, newDur):
         newDur = ConvertFloatToMPF(newDur)
-        assert(newDur >= -epsilon)
+        assert(newDur >= -num.epsilon)
 
         self.duration = newDur
         self.v1 = Add(self.v0, Mul(self.a, self.duration))
@@ -115,8 +304,8 @@ class Ramp(object):
 
     def EvalPos(self, t):
         t = ConvertFloatToMPF(t)
-        assert(t >= -epsilon)
-        assert(t <= self.duration + epsilon)        
+        assert(t >= -num.epsilon)
+        assert(t <= self.duration + num.epsilon)        
 
         d_incr = Mul(t, Add(self.v0, Prod([pointfive, t, self.a])))
         return Add(self.x0, d_incr)
@@ -124,16 +313,16 @@ class Ramp(object):
     
     def EvalVel(self, t):
         t = ConvertFloatToMPF(t)
-        assert(t >= -epsilon)
-        assert(t <= self.duration + epsilon)
+        assert(t >= -num.epsilon)
+        assert(t <= self.duration + num.epsilon)
         
         return Add(self.v0, Mul(self.a, t))
         
 
     def EvalAcc(self, t):
         t = ConvertFloatToMPF(t)
-        assert(t >= -epsilon)
-        assert(t <= self.duration + epsilon)
+        assert(t >= -num.epsilon)
+        assert(t <= self.duration + num.epsilon)
 
         return self.a
 
@@ -160,7 +349,7 @@ class Ramp(object):
         elif (tb >= self.duration):
             tb = self.duration        
         
-        if (FuzzyZero(self.a, epsilon)):
+        if (FuzzyZero(self.a, num.epsilon)):
             if self.v0 > 0:
                 xmin = self.EvalPos(ta)
                 xmax = self.EvalPos(tb)
@@ -178,7 +367,7 @@ class Ramp(object):
             xmin = tempb
             xmax = tempa
         
-        tDeflection = Neg(mp.fdiv(self.v0, self.a))
+        tDeflection = Neg(num.fdiv(self.v0, self.a))
         if (tDeflection <= ta) or (tDeflection >= tb):
             return [xmin, xmax]
         
@@ -211,8 +400,8 @@ class Ramp(object):
         Cut reduces the duration of this ramp to t and returns the remaining ramp (duration - t).
         """
         t = ConvertFloatToMPF(t)
-        assert(t >= -epsilon)
-        assert(t <= self.duration + epsilon)
+        assert(t >= -num.epsilon)
+        assert(t <= self.duration + num.epsilon)
 
         if (t <= 0):
             remRamp = Ramp(self.v0, self.a, self.duration, self.x0)
@@ -230,8 +419,8 @@ class Ramp(object):
 
     def TrimFront(self, t):
         t = ConvertFloatToMPF(t)
-        assert(t >= -epsilon)
-        assert(t <= self.duration + epsilon)
+        assert(t >= -num.epsilon)
+        assert(t <= self.duration + num.epsilon)
 
         if (t <= 0):
             return
@@ -248,8 +437,8 @@ class Ramp(object):
 
     def TrimBack(self, t):
         t = ConvertFloatToMPF(t)
-        assert(t >= -epsilon)
-        assert(t <= self.duration + epsilon)
+        assert(t >= -num.epsilon)
+        assert(t <= self.duration + num.epsilon)
 
         if (t <= 0):
             self.Initialize(self.v0, 0, 0, self.x0)
@@ -264,158 +453,146 @@ class Ramp(object):
     def __repr__(self):
         bmin, bmax = self.GetPeaks()
         return "x0 = {0}; x1 = {1}; v0 = {2}; v1 = {3}; a = {4}; duration = {5}; bmin = {6}; bmax = {7}".\
-            format(mp.nstr(self.x0, n=_prec), mp.nstr(self.x1, n=_prec),
-                   mp.nstr(self.v0, n=_prec), mp.nstr(self.v1, n=_prec), mp.nstr(self.a, n=_prec),
-                   mp.nstr(self.duration, n=_prec), mp.nstr(bmin, n=_prec), mp.nstr(bmax, n=_prec))
+            format(num.nstr(self.x0, n=_prec), num.nstr(self.x1, n=_prec),
+                   num.nstr(self.v0, n=_prec), num.nstr(self.v1, n=_prec), num.nstr(self.a, n=_prec),
+                   num.nstr(self.duration, n=_prec), num.nstr(bmin, n=_prec), num.nstr(bmax, n=_prec))
 # end class Ramp
 
 
+def _NewRampData(rows):
+    """Returns rows of (x0, v0, a, duration) as an (n, 4) array. The array holds float64 with the
+    float64 backend and mp.mpf objects with the mpmath backend.
+    """
+    if num.name == 'float64':
+        return np.array(rows, dtype=np.float64).reshape(-1, 4)
+    rampdata = np.empty((len(rows), 4), dtype=object)
+    for irow, row in enumerate(rows):
+        rampdata[irow] = [ConvertFloatToMPF(x) for x in row]
+    return rampdata
+
+
 class ParabolicCurve(object):
     """
-    ramps    : a list of all ramps
+    rampdata : an (nRamps, 4) array holding (x0, v0, a, duration) of every ramp. It is never
+               modified in place, so copies of a curve can share it.
+    ramps    : a list of all ramps (Ramp objects created from rampdata)
     v0       : the initial velocity of this curve (v0 = ramps[0].v0)
     x0       : the initial displacement of this curve (x0 = ramps[0].x0)
     d        : the total displacement 'done' by this curve (i.e. x1 = x0 + d)
     duration : the total duration of this curve
-    switchpointsList : a list of all switch points (nSwitchpoints = nRamps + 1, i.e. we have 2 switch points for each ramp)
+    switchpoints : an array of all switch points (nSwitchpoints = nRamps + 1, i.e. we have 2 switch points for each ramp)
     """
     def __init__(self, ramps=[]):
-        self.switchpointsList = [] # a list of all switch points, including ones at t = 0 and t = duration
-        dur = zero
-        d = zero
-        self.ramps = []
-        
-        if len(ramps) == 0:
-            self.isEmpty = True
-            self.x0 = zero
-            self.x1 = zero
-            self.v0 = zero
-            self.v1 = zero
-            self.switchpointsList = []
-            self.duration = dur
-            self.d = d
-        else:
-            self.ramps = deepcopy(ramps) # copy all the ramps
-            self.isEmpty = False
-            self.v0 = self.ramps[0].v0
-            self.v1 = self.ramps[-1].v1
-            
-            self.switchpointsList.append(dur)
-            for ramp in self.ramps:
-                dur = Add(dur, ramp.duration)
-                self.switchpointsList.append(dur)
-                d = Add(d, ramp.d)
-            self.duration = dur
-            self.d = d
-
-            self.SetInitialValue(self.ramps[0].x0) # set self.x0
+        self.Initialize(ramps)
 
 
     def __getitem__(self, index):
-        return self.ramps[index]
+        x0, v0, a, dur = self.rampdata[index]
+        return Ramp(v0, a, dur, x0)
 
 
     def __len__(self):
-        return len(self.ramps)
+        return len(self.rampdata)
+
+
+    @property
+    def ramps(self):
+        return [Ramp(v0, a, dur, x0) for (x0, v0, a, dur) in self.rampdata]
+
+
+    @property
+    def switchpointsList(self):
+        return list(self.switchpoints)
 
 
     def Initialize(self, ramps):
-        self.switchpointsList = [] # a list of all switch points, including ones at t = 0 and t = duration
-        dur = zero
-        d = zero
-        self.ramps = []
-        
         if len(ramps) == 0:
             self.isEmpty = True
+            self.rampdata = _NewRampData([])
             self.x0 = zero
             self.x1 = zero
             self.v0 = zero
             self.v1 = zero
-            self.switchpointsList = []
-            self.duration = dur
-            self.d = d
+            self.switchpoints = self.rampdata[:, 3] # empty
+            self._displacements = self.rampdata[:, 3]
+            self.duration = zero
+            self.d = zero
         else:
-            self.ramps = deepcopy(ramps) # copy all the ramps
-            self.isEmpty = False
-            self.v0 = self.ramps[0].v0
-            self.v1 = self.ramps[-1].v1
-            
-            self.switchpointsList.append(dur)
-            for ramp in self.ramps:
-                dur = Add(dur, ramp.duration)
-                self.switchpointsList.append(dur)
-                d = Add(d, ramp.d)
-            self.duration = dur
-            self.d = d
+            self.InitializeFromArray(_NewRampData([(ramp.x0, ramp.v0, ramp.a, ramp.duration) for ramp in ramps]))
+
 
-            self.SetInitialValue(self.ramps[0].x0) # set self.x0
+    def InitializeFromArray(self, rampdata, x0=None):
+        """Initializes the curve from an (nRamps, 4) array of (x0, v0, a, duration) (see
+        _NewRampData). The array is used as is, without copying. The initial displacements of all
+        ramps are recomputed starting from x0 (default: rampdata[0, 0]).
+        """
+        assert(len(rampdata) > 0)
+        self.isEmpty = False
+        v0s = rampdata[:, 1]
+        accels = rampdata[:, 2]
+        durations = rampdata[:, 3]
+        displacements = durations*(v0s + pointfive*accels*durations)
+        self.switchpoints = np.hstack([rampdata[:1, 3]*0, np.cumsum(durations)])
+        self.duration = self.switchpoints[-1]
+        self.d = np.sum(displacements)
+        self.v0 = v0s[0]
+        self.v1 = Add(v0s[-1], Mul(accels[-1], durations[-1]))
+        self.rampdata = rampdata
+        self._displacements = displacements
+        self.SetInitialValue(rampdata[0, 0] if x0 is None else x0) # set self.x0
+
+
+    def Copy(self):
+        """Returns a copy of this curve. Since rampdata is never modified in place, the copy shares
+        it with this curve.
+        """
+        curve = ParabolicCurve.__new__(ParabolicCurve)
+        curve.__dict__.update(self.__dict__)
+        return curve
 
 
     def Append(self, curve):
         if self.isEmpty:
             if not curve.isEmpty:
-                self.ramps = deepcopy(curve.ramps)
-                self.x0 = curve.x0
-                self.x1 = curve.x1
-                self.v0 = curve.v0
-                self.v1 = curve.v1
-                self.switchpointsList = deepcopy(curve.switchpointsList)
-                self.isEmpty = False
-                self.duration = curve.duration
-                self.d = curve.d
+                self.__dict__.update(curve.__dict__)
             else:
                 # do nothing
                 pass
-        else:
-            dur = self.duration
-            d = self.d
-            for ramp in curve.ramps:
-                self.ramps.append(deepcopy(ramp))
-                # Update displacement
-                self.ramps[-1].SetInitialValue(self.ramps[-2].x1)
-                d = Add(d, self.ramps[-1].d)                
-                dur = Add(dur, self.ramps[-1].duration)
-                self.switchpointsList.append(dur)
-
-            self.v1 = self.ramps[-1].v1
-            self.duration = dur
-            self.d = d
-            self.x1 = Add(self.x0, self.d)
-
-
-    def Merge(self, prec=epsilon):
+        elif not curve.isEmpty:
+            self.InitializeFromArray(np.vstack([self.rampdata, curve.rampdata]), self.x0)
+
+
+    def Merge(self, prec=None):
         """
         Merge merges consecutive ramp(s) if they have the same acceleration
         """
+        if prec is None:
+            prec = num.epsilon
         if not self.isEmpty:
-            if Abs((Abs(mp.log10(prec)) - (Abs(mp.floor(mp.log10(prec)))))) < Abs((Abs(mp.log10(prec)) - (Abs(mp.ceil(mp.log10(prec)))))):
-                precexp = mp.floor(mp.log10(prec))
+            if Abs((Abs(num.log10(prec)) - (Abs(num.floor(num.log10(prec)))))) < Abs((Abs(num.log10(prec)) - (Abs(num.ceil(num.log10(prec)))))):
+                precexp = num.floor(num.log10(prec))
             else:
-                precexp = mp.ceil(mp.log10(prec))
-                
-            aCur = self.ramps[0].a
-            nmerged = 0 # the number of merged ramps
-            for i in xrange(1, len(self.ramps)):
-                j = i - nmerged
-                if (Abs(self.ramps[j].a) > 1):
-                    if Abs((Abs(mp.log10(Abs(self.ramps[j].a))) - (Abs(mp.floor(mp.log10(Abs(self.ramps[j].a))))))) < Abs((Abs(mp.log10(Abs(self.ramps[j].a))) - (Abs(mp.ceil(mp.log10(Abs(self.ramps[j].a))))))):
-                        threshold = 10**(precexp + mp.floor(mp.log10(Abs(self.ramps[j].a))) + 1)
+                precexp = num.ceil(num.log10(prec))
+
+            rows = [list(self.rampdata[0])]
+            aCur = rows[0][2]
+            for row in self.rampdata[1:]:
+                a = row[2]
+                if (Abs(a) > 1):
+                    if Abs((Abs(num.log10(Abs(a))) - (Abs(num.floor(num.log10(Abs(a))))))) < Abs((Abs(num.log10(Abs(a))) - (Abs(num.ceil(num.log10(Abs(a))))))):
+                        threshold = 10**(precexp + num.floor(num.log10(Abs(a))) + 1)
                     else:
-                        threshold = 10**(precexp + mp.ceil(mp.log10(Abs(self.ramps[j].a))) + 1)
+                        threshold = 10**(precexp + num.ceil(num.log10(Abs(a))) + 1)
                 else:
                     threshold = 10**(precexp)
-                if Abs(Sub(self.ramps[j].a, aCur)) < threshold:
+                if Abs(Sub(a, aCur)) < threshold:
                     # merge ramps
-                    redundantRamp = self.ramps.pop(j)
-                    newDur = Add(self.ramps[j - 1].duration, redundantRamp.duration)
-                    self.ramps[j - 1].UpdateDuration(newDur)
-
-                    # merge switchpointsList
-                    self.switchpointsList.pop(j)
-
-                    nmerged += 1
+                    rows[-1][3] = Add(rows[-1][3], row[3])
                 else:
-                    aCur = self.ramps[j].a
+                    rows.append(list(row))
+                    aCur = a
+            if len(rows) < len(self.rampdata):
+                self.InitializeFromArray(_NewRampData(rows), self.x0)
 
 
     def _FindRampIndex(self, t):
@@ -423,40 +600,42 @@ class ParabolicCurve(object):
         # assert(t > -epsilon)
         # assert(t < self.duration + epsilon)
 
-        if t < epsilon:
+        if t < num.epsilon:
             i = 0
             remainder = zero
         else:
-            i = bisect.bisect_left(self.switchpointsList, t) - 1
-            remainder = Sub(t, self.switchpointsList[i])
+            i = min(int(np.searchsorted(self.switchpoints, t, side='left')) - 1, len(self.rampdata) - 1)
+            remainder = Sub(t, self.switchpoints[i])
         return i, remainder
 
 
     def EvalPos(self, t):
         t = ConvertFloatToMPF(t)
-        assert(t >= -epsilon)
-        assert(t <= self.duration + epsilon)
+        assert(t >= -num.epsilon)
+        assert(t <= self.duration + num.epsilon)
 
         i, remainder = self._FindRampIndex(t)
-        return self.ramps[i].EvalPos(remainder)
+        x0, v0, a, dur = self.rampdata[i]
+        return Add(x0, Mul(remainder, Add(v0, Prod([pointfive, remainder, a]))))
 
 
     def EvalVel(self, t):
         t = ConvertFloatToMPF(t)
-        assert(t >= -epsilon)
-        assert(t <= self.duration + epsilon)
+        assert(t >= -num.epsilon)
+        assert(t <= self.duration + num.epsilon)
 
         i, remainder = self._FindRampIndex(t)
-        return self.ramps[i].EvalVel(remainder)
+        x0, v0, a, dur = self.rampdata[i]
+        return Add(v0, Mul(a, remainder))
 
 
     def EvalAcc(self, t):
         t = ConvertFloatToMPF(t)
-        assert(t >= -epsilon)
-        assert(t <= self.duration + epsilon)
+        assert(t >= -num.epsilon)
+        assert(t <= self.duration + num.epsilon)
 
         i, remainder = self._FindRampIndex(t)
-        return self.ramps[i].EvalAcc(remainder)
+        return self.rampdata[i, 2]
 
 
     def GetPeaks(self):
@@ -464,16 +643,22 @@ class ParabolicCurve(object):
 
 
     def _GetPeaks(self, ta, tb):
-        xmin = inf
-        xmax = -inf
-
-        for ramp in self.ramps:
-            [bmin, bmax] = ramp.GetPeaks()
-            if bmin < xmin:
-                xmin = bmin
-            if bmax > xmax:
-                xmax = bmax
-
+        # Like Ramp.GetPeaks, the extrema of each ramp are at its end points or at the time where its
+        # velocity crosses zero.
+        x0s, v0s, accels, durations = self.rampdata.T
+        x1s = x0s + self._displacements
+        candidates = [np.min(x0s), np.max(x0s), np.min(x1s), np.max(x1s)]
+        nonzero = np.abs(accels) > num.epsilon
+        if np.any(nonzero):
+            tDeflections = -v0s[nonzero]/accels[nonzero]
+            inside = (tDeflections > 0) & (tDeflections < durations[nonzero])
+            if np.any(inside):
+                t = tDeflections[inside]
+                xDeflections = x0s[nonzero][inside] + t*(v0s[nonzero][inside] + pointfive*accels[nonzero][inside]*t)
+                candidates += [np.min(xDeflections), np.max(xDeflections)]
+
+        xmin = min(candidates)
+        xmax = max(candidates)
         assert(xmin < inf)
         assert(xmax > -inf)
         return [xmin, xmax]
@@ -482,10 +667,11 @@ class ParabolicCurve(object):
     def SetInitialValue(self, x0):
         x0 = ConvertFloatToMPF(x0)
         self.x0 = x0
-        newx0 = x0
-        for ramp in self.ramps:
-            ramp.SetInitialValue(newx0)
-            newx0 = Add(newx0, ramp.d)
+        if not self.isEmpty:
+            rampdata = self.rampdata.copy()
+            rampdata[0, 0] = x0
+            rampdata[1:, 0] = x0 + np.cumsum(self._displacements[:-1])
+            self.rampdata = rampdata
         self.x1 = Add(self.x0, self.d)
 
 
@@ -494,8 +680,7 @@ class ParabolicCurve(object):
         assert(t >= 0)
         x0 = ConvertFloatToMPF(x0)
 
-        ramp0 = Ramp(0, 0, t, x0)
-        self.Initialize([ramp0])
+        self.InitializeFromArray(_NewRampData([(x0, 0, 0, t)]))
         return
 
 
@@ -507,51 +692,61 @@ class ParabolicCurve(object):
         v0 = ConvertFloatToMPF(v0)
         v1 = ConvertFloatToMPF(v1)
 
-        if FuzzyZero(t, epsilon):
+        if FuzzyZero(t, num.epsilon):
             a = 0
         else:
             tSqr = Sqr(t)
-            a = mp.fdiv(Neg(Sum([Mul(v0, tSqr), Mul(t, Sub(x0, x1)), Mul(2, Sub(v0, v1))])), Mul(t, Add(Mul(pointfive, tSqr), 2)))
-        ramp0 = Ramp(v0, a, t, x0)
-        self.Initialize([ramp0])
+            a = num.fdiv(Neg(Sum([Mul(v0, tSqr), Mul(t, Sub(x0, x1)), Mul(2, Sub(v0, v1))])), Mul(t, Add(Mul(pointfive, tSqr), 2)))
+        self.InitializeFromArray(_NewRampData([(x0, v0, a, t)]))
         return
 
 
     def SetZeroDuration(self, x0, v0):
-        ramp0 = Ramp(v0, 0, 0, x0)
-        self.Initialize([ramp0])
+        self.InitializeFromArray(_NewRampData([(x0, v0, 0, 0)]))
         return
-        
+
+
+    def _SplitRampData(self, t):
+        """Returns the ramp data before and after time t (0 < t < duration).
+        """
+        i, remainder = self._FindRampIndex(t)
+        x0, v0, a, dur = self.rampdata[i]
+        leftHalf = self.rampdata[0:i + 1].copy()
+        leftHalf[-1, 3] = remainder
+        if remainder >= dur and i + 1 < len(self.rampdata):
+            rightHalf = self.rampdata[i + 1:]
+        else:
+            rightHalf = self.rampdata[i:].copy()
+            rightHalf[0] = [Add(x0, Mul(remainder, Add(v0, Prod([pointfive, remainder, a])))),
+                            Add(v0, Mul(a, remainder)), a, Sub(dur, remainder)]
+        return leftHalf, rightHalf
+
         
     def Cut(self, t):
         t = ConvertFloatToMPF(t)
-        assert(t >= -epsilon)
-        assert(t <= self.duration + epsilon)
+        assert(t >= -num.epsilon)
+        assert(t <= self.duration + num.epsilon)
 
         if (t <= 0):
-            remCurve = ParabolicCurve(self.ramps)
+            remCurve = self.Copy()
             self.SetZeroDuration(self.x0, self.v0)
             return remCurve
         elif (t >= self.duration):
             remCurve = ParabolicCurve()
             remCurve.SetZeroDuration(self.x1, self.v1)
-            return
-
-        i, remainder = self._FindRampIndex(t)
-        leftHalf = self.ramps[0:i + 1]
-        rightHalf = self.ramps[i:]
+            return remCurve
 
-        leftHalf[-1].TrimBack(remainder)
-        rightHalf[0].TrimFront(remainder)
-        self.Initialize(leftHalf)
-        remCurve = ParabolicCurve(rightHalf)
+        leftHalf, rightHalf = self._SplitRampData(t)
+        self.InitializeFromArray(leftHalf)
+        remCurve = ParabolicCurve()
+        remCurve.InitializeFromArray(rightHalf)
         return remCurve
 
 
     def TrimFront(self, t):
         t = ConvertFloatToMPF(t)
-        assert(t >= -epsilon)
-        assert(t <= self.duration + epsilon)
+        assert(t >= -num.epsilon)
+        assert(t <= self.duration + num.epsilon)
 
         if (t <= 0):
             return
@@ -559,18 +754,15 @@ class ParabolicCurve(object):
             self.SetZeroDuration(self.x1, self.v1)
             return
 
-        i, remainder = self._FindRampIndex(t)
-        rightHalf = self.ramps[i:]
-
-        rightHalf[0].TrimFront(remainder)
-        self.Initialize(rightHalf)
+        leftHalf, rightHalf = self._SplitRampData(t)
+        self.InitializeFromArray(rightHalf)
         return
 
 
     def TrimBack(self, t):
         t = ConvertFloatToMPF(t)
-        assert(t >= -epsilon)
-        assert(t <= self.duration + epsilon)
+        assert(t >= -num.epsilon)
+        assert(t <= self.duration + num.epsilon)
 
         if (t <= 0):
             self.SetZeroDuration(self.x0, self.v0)
@@ -578,11 +770,8 @@ class ParabolicCurve(object):
         elif (t >= self.duration):
             return
 
-        i, remainder = self._FindRampIndex(t)
-        leftHalf = self.ramps[0:i + 1]
-
-        leftHalf[-1].TrimBack(remainder)
-        self.Initialize(leftHalf)
+        leftHalf, rightHalf = self._SplitRampData(t)
+        self.InitializeFromArray(leftHalf)
         return
 
 
@@ -647,60 +836,35 @@ class ParabolicCurve(object):
 # end class ParabolicCurve
 
 
+def EvalPackedTable(table, t, order, duration):
+    """Evaluates a table returned by ParabolicCurvesND.GetPackedTable at an array of times t.
+    order is 0 for positions, 1 for velocities and 2 for accelerations. Returns a (len(t), ndof)
+    float64 array.
+    """
+    tswitch, X, V, A = table
+    t = np.asarray(t, dtype=np.float64)
+    assert(np.all(t >= -num.epsilon))
+    assert(np.all(t <= float(duration) + num.epsilon))
+    # like the scalar version, a time falling on a switch point belongs to the preceding segment
+    indices = np.clip(np.searchsorted(tswitch, t, side='left') - 1, 0, len(tswitch) - 1)
+    dt = (t - tswitch[indices])[:, None]
+    if order == 0:
+        return X[indices] + dt*(V[indices] + 0.5*A[indices]*dt)
+    elif order == 1:
+        return V[indices] + A[indices]*dt
+    else:
+        return A[indices]
+
+
 class ParabolicCurvesND(object):
     """
     """
     def __init__(self, curves=[]):
-        if (len(curves) == 0):
-            self.curves = []
-            self.isEmpty = True
-            self.x0Vect = None
-            self.x1Vect = None
-            self.v0Vect = None
-            self.v1Vect = None
-            self.dVect = None
-            self.ndof = 0
-            self.switchpointsList = []
-            self.duration = zero
-        else:
-            # Check first if every curve in curves has the same duration.
-            # (if necessary) Trim all curve to have the same duration.
-            curves_ = deepcopy(curves)
-            minDur = curves_[0].duration
-            for curve in curves_[1:]:
-                assert(Abs(Sub(curve.duration, minDur)) < epsilon)
-                minDur = min(minDur, curve.duration)
-            # for curve in curves_:
-            #     deltaT = Sub(curve.duration, minDur)
-            #     curve.TrimBack(deltaT)
-
-            # Now all curves have the same duration
-            self.isEmpty = False
-            self.duration = minDur
-            self.curves = curves_
-            self.ndof = len(self.curves)
-            self.x0Vect = np.asarray([curve.x0 for curve in self.curves])
-            self.x1Vect = np.asarray([curve.x1 for curve in self.curves])
-            self.v0Vect = np.asarray([curve.v0 for curve in self.curves])
-            self.v1Vect = np.asarray([curve.v1 for curve in self.curves])
-            self.dVect = np.asarray([curve.d for curve in self.curves])
-            
-            # Create a list of switch points
-            switchpointsList = deepcopy(curves[0].switchpointsList)
-            for curve in self.curves[1:]:
-                for s in curve.switchpointsList:
-                    switchpointsList.insert(bisect.bisect_left(switchpointsList, s), s)
-
-            self.switchpointsList = []
-            if len(switchpointsList) > 0:
-                self.switchpointsList.append(switchpointsList[0])
-                for s in switchpointsList[1:]:
-                    if Sub(s, self.switchpointsList[-1]) > epsilon:
-                        # Add only non-redundant switch points
-                        self.switchpointsList.append(s)
+        self.Initialize(curves)
 
 
     def Initialize(self, curves):
+        self._packedtable = None
         if (len(curves) == 0):
             self.curves = []
             self.isEmpty = True
@@ -715,10 +879,10 @@ class ParabolicCurvesND(object):
         else:
             # Check first if every curve in curves has the same duration.
             # (if necessary) Trim all curve to have the same duration.
-            curves_ = deepcopy(curves)
+            curves_ = [curve.Copy() for curve in curves]
             minDur = curves_[0].duration
             for curve in curves_[1:]:
-                assert(Abs(Sub(curve.duration, minDur)) < epsilon)
+                assert(Abs(Sub(curve.duration, minDur)) < num.epsilon)
                 minDur = min(minDur, curve.duration)
             # for curve in curves_:
             #     deltaT = Sub(curve.duration, minDur)
@@ -736,16 +900,13 @@ class ParabolicCurvesND(object):
             self.dVect = np.asarray([curve.d for curve in self.curves])
             
             # Create a list of switch points
-            switchpointsList = deepcopy(curves[0].switchpointsList)
-            for curve in self.curves[1:]:
-                for s in curve.switchpointsList:
-                    switchpointsList.insert(bisect.bisect_left(switchpointsList, s), s)
+            switchpointsList = sorted(np.hstack([curve.switchpoints for curve in self.curves]))
 
             self.switchpointsList = []
             if len(switchpointsList) > 0:
                 self.switchpointsList.append(switchpointsList[0])
                 for s in switchpointsList[1:]:
-                    if Sub(s, self.switchpointsList[-1]) > epsilon:
+                    if Sub(s, self.switchpointsList[-1]) > num.epsilon:
                         # Add only non-redundant switch points
                         self.switchpointsList.append(s)
                         
@@ -759,17 +920,18 @@ class ParabolicCurvesND(object):
 
 
     def Append(self, curvesnd):
+        self._packedtable = None
         if self.isEmpty:
             if len(curvesnd) > 0:
                 self.duration = curvesnd.duration
-                self.curves = deepcopy(curvesnd.curves)
+                self.curves = [curve.Copy() for curve in curvesnd.curves]
                 self.ndof = len(self.curves)
                 self.x0Vect = np.asarray([curve.x0 for curve in self.curves])
                 self.x1Vect = np.asarray([curve.x1 for curve in self.curves])
                 self.v0Vect = np.asarray([curve.v0 for curve in self.curves])
                 self.v1Vect = np.asarray([curve.v1 for curve in self.curves])
                 self.dVect = np.asarray([curve.d for curve in self.curves])
-                self.switchpointsList = deepcopy(curvesnd.switchpointsList)
+                self.switchpointsList = list(curvesnd.switchpointsList)
                 self.isEmpty = False
         else:
             assert(self.ndof == curvesnd.ndof)
@@ -777,14 +939,26 @@ class ParabolicCurvesND(object):
             self.duration = Add(self.duration, curvesnd.duration)
             for (i, curve) in enumerate(curvesnd):
                 self.curves[i].Append(curve)
-                self.dVect[i] = Add(self.dVect[i], curve.d)
+            self.dVect = np.asarray([curve.d for curve in self.curves])
 
             newSwitchpoints = [Add(s, originalDur) for s in curvesnd.switchpointsList[1:]]
             self.switchpointsList.extend(newSwitchpoints)
             self.x1Vect = np.asarray([curve.x1 for curve in self.curves])
 
 
+    def Copy(self):
+        """Returns a copy of this object. The curves are copied with ParabolicCurve.Copy, which
+        shares their ramp data.
+        """
+        curvesnd = ParabolicCurvesND.__new__(ParabolicCurvesND)
+        curvesnd.__dict__.update(self.__dict__)
+        curvesnd.curves = [curve.Copy() for curve in self.curves]
+        curvesnd.switchpointsList = list(self.switchpointsList)
+        return curvesnd
+
+
     def SetInitialValues(self, x0Vect):
+        self._packedtable = None
         x0Vect_ = ConvertFloatArrayToMPF(x0Vect)
         self.x0Vect = np.array(x0Vect_)
         for (i, curve) in enumerate(self.curves):
@@ -792,28 +966,69 @@ class ParabolicCurvesND(object):
         self.x1Vect = np.asarray([Add(x0, d) for (x0, d) in zip(self.x0Vect, self.dVect)])
             
 
+    def GetPackedTable(self):
+        """Returns (tswitch, X, V, A) where tswitch holds the start times of the segments delimited
+        by the switch points of all DOFs and X, V, A are (len(tswitch), ndof) float64 arrays of the
+        positions, velocities and accelerations at the start of each segment. The table is cached
+        until the curves are modified through this object.
+        """
+        if self._packedtable is None:
+            if len(self.switchpointsList) > 1:
+                switchpoints = np.array(self.switchpointsList, dtype=np.float64)
+                tswitch = switchpoints[:-1]
+                # the ramp of each DOF is looked up at the middle of the segment since the switch
+                # points of the DOFs can differ by a few ulps from the merged ones
+                tmid = 0.5*(switchpoints[:-1] + switchpoints[1:])
+            else:
+                tswitch = np.zeros(1)
+                tmid = tswitch
+            X = np.empty((len(tswitch), self.ndof))
+            V = np.empty((len(tswitch), self.ndof))
+            A = np.empty((len(tswitch), self.ndof))
+            for idof, curve in enumerate(self.curves):
+                rampdata = np.asarray(curve.rampdata, dtype=np.float64)
+                rampstarts = np.asarray(curve.switchpoints[:-1], dtype=np.float64)
+                indices = np.maximum(np.searchsorted(rampstarts, tmid, side='right') - 1, 0)
+                dt = tswitch - rampstarts[indices]
+                a = rampdata[indices, 2]
+                V[:, idof] = rampdata[indices, 1] + a*dt
+                X[:, idof] = rampdata[indices, 0] + dt*(rampdata[indices, 1] + 0.5*a*dt)
+                A[:, idof] = a
+            self._packedtable = (tswitch, X, V, A)
+        return self._packedtable
+
+
     def EvalPos(self, t):
+        if np.ndim(t) > 0:
+            # array of times, returns a (len(t), ndof) array
+            return EvalPackedTable(self.GetPackedTable(), t, 0, self.duration)
         t = ConvertFloatToMPF(t)
-        assert(t >= -epsilon)
-        assert(t <= self.duration + epsilon)
+        assert(t >= -num.epsilon)
+        assert(t <= self.duration + num.epsilon)
         
         xVect = [curve.EvalPos(t) for curve in self.curves]
         return np.asarray(xVect)
 
 
     def EvalVel(self, t):
+        if np.ndim(t) > 0:
+            # array of times, returns a (len(t), ndof) array
+            return EvalPackedTable(self.GetPackedTable(), t, 1, self.duration)
         t = ConvertFloatToMPF(t)
-        assert(t >= -epsilon)
-        assert(t <= self.duration + epsilon)
+        assert(t >= -num.epsilon)
+        assert(t <= self.duration + num.epsilon)
         
         vVect = [curve.EvalVel(t) for curve in self.curves]
         return np.asarray(vVect)
 
 
     def EvalAcc(self, t):
+        if np.ndim(t) > 0:
+            # array of times, returns a (len(t), ndof) array
+            return EvalPackedTable(self.GetPackedTable(), t, 2, self.duration)
         t = ConvertFloatToMPF(t)
-        assert(t >= -epsilon)
-        assert(t <= self.duration + epsilon)
+        assert(t >= -num.epsilon)
+        assert(t <= self.duration + num.epsilon)
         
         aVect = [curve.EvalAcc(t) for curve in self.curves]
         return np.asarray(aVect)
@@ -883,8 +1098,8 @@ class ParabolicCurvesND(object):
 
     def Cut(self, t):
         t = ConvertFloatToMPF(t)
-        assert(t >= -epsilon)
-        assert(t <= Add(self.duration, epsilon))
+        assert(t >= -num.epsilon)
+        assert(t <= Add(self.duration, num.epsilon))
 
         if (t <= 0):
             remCurvesND = ParabolicCurvesND()
@@ -907,8 +1122,8 @@ class ParabolicCurvesND(object):
 
     def TrimFront(self, t):
         t = ConvertFloatToMPF(t)
-        assert(t >= -epsilon)
-        assert(t <= Add(self.duration, epsilon))
+        assert(t >= -num.epsilon)
+        assert(t <= Add(self.duration, num.epsilon))
 
         if (t <= 0):
             return
@@ -925,8 +1140,8 @@ class ParabolicCurvesND(object):
 
     def TrimBack(self, t):
         t = ConvertFloatToMPF(t)
-        assert(t >= -epsilon)
-        assert(t <= Add(self.duration, epsilon))
+        assert(t >= -num.epsilon)
+        assert(t <= Add(self.duration, num.epsilon))
 
         if (t <= 0):
             self.SetZeroDuration(self.x0Vect, self.v0Vect)
@@ -1004,7 +1219,7 @@ def VectToString(A):
     s = "["
     for a in A_:
         s += separator
-        s += mp.nstr(a, n=_prec)
+        s += num.nstr(a, n=_prec)
         separator = ", "
     return s
 
@@ -1034,13 +1249,13 @@ def CheckRamp(ramp, xmin, xmax, vm, am):
     am = ConvertFloatToMPF(am)
 
     bmin, bmax = ramp.GetPeaks()
-    if (bmin < Sub(xmin, epsilon)) or (bmax > Add(xmax, epsilon)):
+    if (bmin < Sub(xmin, num.epsilon)) or (bmax > Add(xmax, num.epsilon)):
         return ParabolicCheckReturn.XBoundViolated
 
-    if (Abs(ramp.v0) > Add(vm, epsilon)) or (Abs(ramp.v1) > Add(vm, epsilon)):
+    if (Abs(ramp.v0) > Add(vm, num.epsilon)) or (Abs(ramp.v1) > Add(vm, num.epsilon)):
         return ParabolicCheckReturn.VBoundViolated
     
-    if (Abs(ramp.a) > Add(am, epsilon)):
+    if (Abs(ramp.a) > Add(am, num.epsilon)):
         return ParabolicCheckReturn.ABoundViolated
     
     return ParabolicCheckReturn.Normal
@@ -1057,7 +1272,7 @@ def CheckRamps(rampsVect, xmin, xmax, vm, am):
         return ret
     
     for i in xrange(1, len(rampsVect)):
-        if not FuzzyEquals(rampsVect[i - 1].v1, rampsVect[i].v0, epsilon):
+        if not FuzzyEquals(rampsVect[i - 1].v1, rampsVect[i].v0, num.epsilon):
             return ParabolicCheckReturn.VDiscrepancy
         ret = CheckRamp(rampsVect[i], xmin, xmax, vm, am)
         if not (ret == ParabolicCheckReturn.Normal):
@@ -1078,21 +1293,21 @@ def CheckParabolicCurve(curve, xmin, xmax, vm, am, x0, x1, v0, v1):
         return ret
     
     # Check boundary conditions
-    if not FuzzyEquals(curve.v0, curve.ramps[0].v0, epsilon):
+    if not FuzzyEquals(curve.v0, curve[0].v0, num.epsilon):
         return ParabolicCheckReturn.VDiscrepancy
-    if not FuzzyEquals(curve.v0, v0, epsilon):
+    if not FuzzyEquals(curve.v0, v0, num.epsilon):
         return ParabolicCheckReturn.VDiscrepancy
-    if not FuzzyEquals(curve.v1, curve.ramps[-1].v1, epsilon):
+    if not FuzzyEquals(curve.v1, curve[-1].v1, num.epsilon):
         return ParabolicCheckReturn.VDiscrepancy
-    if not FuzzyEquals(curve.v1, v1, epsilon):
+    if not FuzzyEquals(curve.v1, v1, num.epsilon):
         return ParabolicCheckReturn.VDiscrepancy
-    if not FuzzyEquals(curve.x0, curve.ramps[0].x0, epsilon):
+    if not FuzzyEquals(curve.x0, curve[0].x0, num.epsilon):
         return ParabolicCheckReturn.XDiscrepancy
-    if not FuzzyEquals(curve.x0, x0, epsilon):
+    if not FuzzyEquals(curve.x0, x0, num.epsilon):
         return ParabolicCheckReturn.XDiscrepancy
-    if not FuzzyEquals(curve.EvalPos(curve.duration), x1, epsilon):
+    if not FuzzyEquals(curve.EvalPos(curve.duration), x1, num.epsilon):
         return ParabolicCheckReturn.XDiscrepancy
-    if not FuzzyEquals(curve.d, x1 - x0, epsilon):
+    if not FuzzyEquals(curve.d, x1 - x0, num.epsilon):
         return ParabolicCheckReturn.XDiscrepancy
     return ParabolicCheckReturn.Normal
 
@@ -1110,41 +1325,66 @@ def CheckParabolicCurvesND(curvesnd, xminVect, xmaxVect, vmVect, amVect, x0Vect,
         ret = CheckParabolicCurve(curvesnd.curves[i], xminVect_[i], xmaxVect_[i], vmVect_[i], amVect_[i], x0Vect_[i], x1Vect_[i], v0Vect_[i], v1Vect_[i])
         if not (ret == ParabolicCheckReturn.Normal):
             return ret
-        if not FuzzyEquals(curvesnd.duration, curvesnd.curves[i].duration, epsilon):
+        if not FuzzyEquals(curvesnd.duration, curvesnd.curves[i].duration, num.epsilon):
             return ParabolicCheckReturn.DurationDiscrepancy
     return ParabolicCheckReturn.Normal
     
 
+def ParseNumbers(lines):
+    """Converts lines of whitespace-separated numbers into a flat float64 array in one pass.
+    """
+    return np.fromstring(" ".join(lines), dtype=np.float64, sep=" ")
+
+
+def _CurvesFromRampData(rampdataList):
+    """Returns a ParabolicCurvesND from one (nRamps, 4) array of (x0, v0, a, duration) per DOF. As
+    with appending the ramps one by one, the initial displacements are chained from the first x0.
+    """
+    curves = []
+    for rampdata in rampdataList:
+        curve = ParabolicCurve()
+        curve.InitializeFromArray(_NewRampData(rampdata))
+        curves.append(curve)
+    return ParabolicCurvesND(curves)
+
+
 def DynamicPathStringToParabolicCurvesND(dynamicpathstring):
     dynamicpathstring = dynamicpathstring.strip()
     data = dynamicpathstring.split("\n")
     ndof = int(data[0])
     nlines = ndof + 2 # the number of lines containing the data for 1 ParabolicRampND
-
-    curves = [ParabolicCurve() for _ in xrange(ndof)]
     nParabolicRampND = len(data)/(nlines)
 
-    for iramp in xrange(nParabolicRampND):
-        curoffset = iramp*nlines
-        for idof in xrange(ndof):
-            ramp1ddata = data[curoffset + 2 + idof]
-            x0, v0, x1, v1, a1, v, a2, tswitch1, tswitch2, ttotal = [mp.mpf(x) for x in ramp1ddata.split(" ")]
-            ramps = []
-            ramp0 = Ramp(v0, a1, tswitch1, x0)
-            if ramp0.duration > epsilon:
-                ramps.append(ramp0)
-            ramp1 = Ramp(v, 0, tswitch2 - tswitch1, ramp0.x1)
-            if ramp1.duration > epsilon:
-                ramps.append(ramp1)
-            ramp2 = Ramp(v, a2, ttotal - tswitch2, ramp1.x1)
-            if ramp2.duration > epsilon:
-                ramps.append(ramp2)
-            assert(len(ramps) > 0)
-            curve = ParabolicCurve(ramps)
-            
-            curves[idof].Append(curve)
+    # (nParabolicRampND, ndof, 10) array of x0, v0, x1, v1, a1, v, a2, tswitch1, tswitch2, ttotal
+    ramp1ddata = ParseNumbers([data[iramp*nlines + 2 + idof] for iramp in xrange(nParabolicRampND) for idof in xrange(ndof)]).reshape(nParabolicRampND, ndof, 10)
+    x0, v0, x1, v1, a1, v, a2, tswitch1, tswitch2, ttotal = np.rollaxis(ramp1ddata, 2)
 
-    return ParabolicCurvesND(curves)
+    # each ParabolicRamp1D is made of (up to) three ramps, the ones of zero duration are dropped
+    rampdata = np.empty((nParabolicRampND, ndof, 3, 4))
+    rampdata[:, :, 0] = np.dstack([x0, v0, a1, tswitch1])
+    rampdata[:, :, 1] = np.dstack([x0, v, np.zeros_like(v), tswitch2 - tswitch1])
+    rampdata[:, :, 2] = np.dstack([x0, v, a2, ttotal - tswitch2])
+    nonzero = rampdata[:, :, :, 3] > num.epsilon
+    assert(np.all(np.any(nonzero, axis=2)))
+
+    return _CurvesFromRampData([rampdata[:, idof][nonzero[:, idof]] for idof in xrange(ndof)])
+
+
+def _ParabolicPathChunksToParabolicCurvesND(rawdata, ndof, chunkindices):
+    nlines_chunk = 2 + ndof
+    rampdataList = [[] for idof in xrange(ndof)]
+    for ichunk in chunkindices:
+        duration = None
+        for idof in xrange(ndof):
+            # v0 a t x0 for each ramp
+            curvedata = ParseNumbers([rawdata[(ichunk*nlines_chunk) + 2 + idof]]).reshape(-1, 4)
+            assert(np.all(curvedata[:, 2] >= -num.epsilon))
+            if duration is None:
+                duration = curvedata[:, 2].sum()
+            else:
+                assert(abs(curvedata[:, 2].sum() - duration) < num.epsilon)
+            rampdataList[idof].append(curvedata[:, [3, 0, 1, 2]])
+    return _CurvesFromRampData([np.vstack(rampdata) for rampdata in rampdataList])
 
 
 def ParabolicPathStringToParabolicCurvesND(parabolicpathstring):
@@ -1184,24 +1424,7 @@ def ParabolicPathStringToParabolicCurvesND(parabolicpathstring):
 
     nchunks = len(rawdata)/nlines_chunk
 
-    curvesnd = ParabolicCurvesND()
-    for ichunk in xrange(nchunks):
-        curves = []
-        for idof in xrange(ndof):
-            curvedata = rawdata[(ichunk*nlines_chunk) + 2 + idof]
-            curvedata = curvedata.strip().split(" ")
-            curve = ParabolicCurve()
-            nramps = len(curvedata)/4
-            for iramp in xrange(nramps):
-                v, a, t, x0 = [float(dummy) for dummy in curvedata[(iramp*4):((iramp + 1)*4)]]
-                ramp = Ramp(v, a, t, x0)
-                nextCurve = ParabolicCurve([ramp])
-                curve.Append(nextCurve)
-            curves.append(curve)
-        nextCurvesND = ParabolicCurvesND(curves)
-        curvesnd.Append(nextCurvesND)
-
-    return curvesnd
+    return _ParabolicPathChunksToParabolicCurvesND(rawdata, ndof, xrange(nchunks))
 
 
 def GetSpecificChunkFromParabolicPathString(parabolicpathstring, chunkindex):
@@ -1237,25 +1460,8 @@ def GetSpecificChunkFromParabolicPathString(parabolicpathstring, chunkindex):
     parabolicpathstring = parabolicpathstring.strip()
     rawdata = parabolicpathstring.split("\n")
     ndof = int(rawdata[0])
-    nlines_chunk = 2 + ndof
-
-    nchunks = len(rawdata)/nlines_chunk
 
-    curves = []
-    for idof in xrange(ndof):
-        curvedata = rawdata[(chunkindex*nlines_chunk) + 2 + idof]
-        curvedata = curvedata.strip().split(" ")
-        curve = ParabolicCurve()
-        nramps = len(curvedata)/4
-        for iramp in xrange(nramps):
-            v, a, t, x0 = [float(dummy) for dummy in curvedata[(iramp*4):((iramp + 1)*4)]]
-            ramp = Ramp(v, a, t, x0)
-            nextCurve = ParabolicCurve([ramp])
-            curve.Append(nextCurve)
-        curves.append(curve)
-    curvesnd = ParabolicCurvesND(curves)
-
-    return curvesnd
+    return _ParabolicPathChunksToParabolicCurvesND(rawdata, ndof, [chunkindex])
 
 
 def ConvertNewParabolicPathStringToParabolicCurvesND(parabolicpathstring):
@@ -1274,34 +1480,25 @@ def ConvertNewParabolicPathStringToParabolicCurvesND(parabolicpathstring):
     parabolicpathstring = parabolicpathstring.strip()
     rawdata = parabolicpathstring.split("\n")
     nrampnds = len(rawdata)
-    finalcurvesnd = ParabolicCurvesND()
 
     # check soundness
     ndof = int(rawdata[0].strip().split(" ")[0])
-    for i in xrange(nrampnds):
-        assert( ndof == int((len(rawdata[i].strip().split(" ")) - 2)/5) )
-
-    for i in xrange(nrampnds):
-        data = rawdata[i].strip().split(" ")
-        data = [float(x) for x in data[1:]]
-        offset = 0
-        x0 = np.array(data[offset : offset + ndof])
-        offset += ndof
-        x1 = np.array(data[offset : offset + ndof])
-        offset += ndof
-        v0 = np.array(data[offset : offset + ndof])
-        offset += ndof
-        v1 = np.array(data[offset : offset + ndof])
-        offset += ndof
-        a = np.array(data[offset : offset + ndof])
-        offset += ndof
-        t = data[offset]
-
-        curvesnd = ParabolicCurvesND()
-        curvesnd.SetSegment(x0, x1, v0, v1, t)
-        finalcurvesnd.Append(curvesnd)
-
-    return finalcurvesnd
+    data = ParseNumbers(rawdata)
+    assert(len(data) == nrampnds*(5*ndof + 2))
+    data = data.reshape(nrampnds, 5*ndof + 2)
+    assert(np.all(data[:, 0] == ndof))
+
+    x0, x1, v0, v1 = [data[:, 1 + i*ndof : 1 + (i + 1)*ndof] for i in xrange(4)]
+    t = data[:, -1:]
+
+    # same acceleration as in ParabolicCurve.SetSegment
+    tSqr = t*t
+    a = np.zeros_like(x0)
+    nonzero = np.abs(t[:, 0]) > num.epsilon
+    a[nonzero] = -(v0*tSqr + t*(x0 - x1) + 2*(v0 - v1))[nonzero]/(t*(0.5*tSqr + 2))[nonzero]
+    assert(np.all(t >= 0))
+
+    return _CurvesFromRampData([np.column_stack([x0[:, idof], v0[:, idof], a[:, idof], t[:, 0]]) for idof in xrange(ndof)])
         
 
 def ConvertOpenRAVETrajectoryToParabolicCurvesND(traj):
@@ -0,0 +1,81 @@
+import numpy as np
+import sys
+sys.path.append('../')
+
+import ramp
+from parabolicpath import ParabolicPath
+
+import random
+rng = random.Random(0)
+
+################################################################################
+# Compares the evaluation of ParabolicCurvesND and ParabolicPath at an array of
+# times with the scalar evaluation at every time.
+
+def MakeCurve(x0, v0, accels, durations):
+    ramps = []
+    for (a, dur) in zip(accels, durations):
+        ramps.append(ramp.Ramp(v0, a, dur, x0))
+        x0 = ramps[-1].x1
+        v0 = ramps[-1].v1
+    return ramp.ParabolicCurve(ramps)
+
+
+def ShiftByUlps(durations, nulps):
+    # moves every inner switch point by nulps ulps, keeping the total duration
+    switchpoints = np.cumsum(durations)
+    for i in xrange(len(switchpoints) - 1):
+        for _ in xrange(abs(nulps)):
+            switchpoints[i] = np.nextafter(switchpoints[i], np.inf if nulps > 0 else -np.inf)
+    return np.diff(np.hstack([0, switchpoints]))
+
+
+def MakeCurvesND(nramps):
+    durations = np.asarray([rng.uniform(0.1, 1) for _ in xrange(nramps)])
+    curves = []
+    # the switch points of the second and third DOFs differ by a few ulps from the ones of the
+    # first DOF, they are merged into the switch points of the first DOF
+    for nulps in [0, 3, -2]:
+        accels = [rng.uniform(-5, 5) for _ in xrange(nramps)]
+        curves.append(MakeCurve(rng.uniform(-1, 1), rng.uniform(-1, 1), accels, ShiftByUlps(durations, nulps)))
+    # a DOF with its own switch points
+    otherdurations = np.asarray([rng.uniform(0.1, 1) for _ in xrange(nramps + 2)])
+    otherdurations *= np.sum(durations)/np.sum(otherdurations)
+    accels = [rng.uniform(-5, 5) for _ in xrange(nramps + 2)]
+    curves.append(MakeCurve(rng.uniform(-1, 1), rng.uniform(-1, 1), accels, otherdurations))
+    return ramp.ParabolicCurvesND(curves)
+
+
+def CheckEvaluation(traj, dofswitchpoints):
+    switchpoints = np.asarray(traj.GetPackedTable()[0].tolist() + [float(traj.duration)])
+    tmid = 0.5*(switchpoints[:-1] + switchpoints[1:])
+    tgrid = np.linspace(0, float(traj.duration), 1001)
+    # the acceleration is discontinuous at the switch points, it is only compared away from them
+    away = np.min(np.abs(tgrid[:, None] - dofswitchpoints[None, :]), axis=1) > 1e-9
+    for (times, checkacc) in [(tmid, True), (tgrid[away], True), (tgrid, False), (switchpoints, False)]:
+        X = traj.EvalPos(times)
+        V = traj.EvalVel(times)
+        assert(X.shape == (len(times), len(traj.x0Vect)))
+        assert(np.max(np.abs(X - np.asarray([traj.EvalPos(t) for t in times], dtype=np.float64))) < 1e-10)
+        assert(np.max(np.abs(V - np.asarray([traj.EvalVel(t) for t in times], dtype=np.float64))) < 1e-10)
+        if checkacc:
+            A = traj.EvalAcc(times)
+            assert(np.all(A == np.asarray([traj.EvalAcc(t) for t in times], dtype=np.float64)))
+
+
+for nramps in [1, 2, 5, 20]:
+    curvesnd = MakeCurvesND(nramps)
+    dofswitchpoints = np.hstack([curve.switchpoints for curve in curvesnd.curves])
+    CheckEvaluation(curvesnd, dofswitchpoints)
+
+    # the cached table is recomputed when the curves are modified
+    other = MakeCurvesND(nramps)
+    other.SetInitialValues(curvesnd.x1Vect)
+    curvesnd.Append(other)
+    CheckEvaluation(curvesnd, np.hstack([curve.switchpoints for curve in curvesnd.curves]))
+
+    path = ParabolicPath([MakeCurvesND(nramps), MakeCurvesND(nramps + 1)])
+    pathswitchpoints = [curve.switchpoints + float(tstart) for (curvesnd, tstart) in zip(path.curvesndVect, path.mainSwitchpoints) for curve in curvesnd.curves]
+    CheckEvaluation(path, np.hstack(pathswitchpoints))
+
+print 'The evaluation at arrays of times gives the same results as the scalar evaluation'
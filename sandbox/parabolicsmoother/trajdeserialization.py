@@ -4,7 +4,7 @@ import ramp
 import matplotlib.pyplot as plt
 from pylab import ion
 ion()
-from os.path import isfile
+from os.path import getmtime, isfile
 import openravepy as orpy
 
 import logging
@@ -48,63 +48,65 @@ def LoadShortcutInformation(number, prefix="/private/cache/openrave/"):
     return [d1, d2, s]
 
 
-def ReadShortcutProgress(shortcutprogressstring):
+def ParseShortcutProgress(shortcutprogressstring):
+    """Parses a shortcut progress dump into [originaldur, maxiter, table]. Each row of the float64
+    table corresponds to one successful shortcut and holds
+
+    it, t0, t1, prevdur, newdur, x0, x1, v0, v1, xmin, xmax, vm, am
+
+    where the last eight entries are ndof-vectors.
+    """
     rawdata = shortcutprogressstring.strip().split("\n")
     generalinfo = rawdata[0].strip().split()
     originaldur = float(generalinfo[0])
     maxiter = int(generalinfo[1])
     nlinespergroup = 9
     nshortcuts = (len(rawdata) - 1)/nlinespergroup
+    if nshortcuts == 0:
+        return [originaldur, maxiter, np.zeros((0, 5))]
 
-    rawdata = rawdata[1:] # pop out the first element (original duration)
+    ndof = len(rawdata[2].split())
+    table = ramp.ParseNumbers(rawdata[1:1 + nshortcuts*nlinespergroup])
+    assert(len(table) == nshortcuts*(5 + 8*ndof))
+    return [originaldur, maxiter, table.reshape(nshortcuts, 5 + 8*ndof)]
 
-    successfuliters = []
-    T0 = []
-    T1 = []
-    prevdurs = []
-    newdurs = []
-    
-    X0 = []
-    X1 = []
-    V0 = []
-    V1 = []
-    XMIN = []
-    XMAX = []
-    VM = []
-    AM = []
-    
-    for i in xrange(nshortcuts):
-        offset = i*nlinespergroup
-        generalinfo = rawdata[offset].strip().split()
-        it = int(generalinfo[0])
-        [t0, t1, prevdur, newdur] = [float(x) for x in generalinfo[1:]]
-
-        x0 = np.array([float(x) for x in rawdata[offset + 1].strip().split()])
-        x1 = np.array([float(x) for x in rawdata[offset + 2].strip().split()])
-        v0 = np.array([float(x) for x in rawdata[offset + 3].strip().split()])
-        v1 = np.array([float(x) for x in rawdata[offset + 4].strip().split()])
-        xmin = np.array([float(x) for x in rawdata[offset + 5].strip().split()])
-        xmax = np.array([float(x) for x in rawdata[offset + 6].strip().split()])
-        vm = np.array([float(x) for x in rawdata[offset + 7].strip().split()])
-        am = np.array([float(x) for x in rawdata[offset + 8].strip().split()])
-
-        successfuliters.append(it)
-        T0.append(t0)
-        T1.append(t1)
-        prevdurs.append(prevdur)
-        newdurs.append(newdur)
-        X0.append(x0)
-        X1.append(x1)
-        V0.append(v0)
-        V1.append(v1)
-        XMIN.append(xmin)
-        XMAX.append(xmax)
-        VM.append(vm)
-        AM.append(am)
 
+def _SplitShortcutProgressTable(originaldur, maxiter, table):
+    ndof = (table.shape[1] - 5)/8
+    successfuliters = [int(it) for it in table[:, 0]]
+    T0, T1, prevdurs, newdurs = [list(table[:, i]) for i in xrange(1, 5)]
+    X0, X1, V0, V1, XMIN, XMAX, VM, AM = [list(table[:, 5 + i*ndof : 5 + (i + 1)*ndof]) for i in xrange(8)]
     return [originaldur, maxiter, successfuliters, T0, T1, prevdurs, newdurs, X0, X1, V0, V1, XMIN, XMAX, VM, AM]
 
 
+def ReadShortcutProgress(shortcutprogressstring):
+    return _SplitShortcutProgressTable(*ParseShortcutProgress(shortcutprogressstring))
+
+
+def LoadShortcutProgress(number, prefix="/private/cache/openrave/", usecache=True):
+    """Same as ReadShortcutProgress on the dump shortcutprogress{number}.xml, but the parsed table is
+    saved next to the dump as shortcutprogress{number}.npy (its first row holds originaldur and
+    maxiter) and memory-mapped instead of parsed again on later calls.
+    """
+    filename_shortcutprogress = prefix + "shortcutprogress{0}.xml".format(number)
+    filename_cache = prefix + "shortcutprogress{0}.npy".format(number)
+    if usecache and isfile(filename_cache) and getmtime(filename_cache) >= getmtime(filename_shortcutprogress):
+        cached = np.load(filename_cache, mmap_mode='r')
+        return _SplitShortcutProgressTable(float(cached[0, 0]), int(cached[0, 1]), cached[1:])
+
+    with open(filename_shortcutprogress, 'r') as f:
+        originaldur, maxiter, table = ParseShortcutProgress(f.read())
+    if usecache:
+        cached = np.zeros((len(table) + 1, table.shape[1]))
+        cached[0, 0:2] = [originaldur, maxiter]
+        cached[1:] = table
+        try:
+            np.save(filename_cache, cached)
+        except IOError, e:
+            log.warn("failed to save {0}: {1}".format(filename_cache, e))
+    return _SplitShortcutProgressTable(originaldur, maxiter, table)
+
+
 def PlotData(index, prefix="/private/cache/openrave/", plot=True, fignum=1, ncolumns=2, nrows=2):
     assert(ncolumns*nrows >= 4) # we have at least 4 subfigures
     info = dict()
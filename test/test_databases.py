@@ -12,6 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 from common_test_openrave import *
+from openravepy.databases.convexdecomposition import ConvexDecompositionModel
+from openravepy.databases.inversereachability import InverseReachabilityModel
+from openravepy.databases.kinematicreachability import ReachabilityModel
 
 class TestDatabases(EnvironmentSetup):
     def test_ikmodulegeneration(self):
@@ -37,6 +40,255 @@ class TestDatabases(EnvironmentSetup):
             out=ikmodule.SendCommand('LoadIKFastSolver %s %d 1'%(robot.GetName(),iktype))
             assert(out is not None)
             assert(manip.GetIkSolver() is not None)
-            
+
+    def test_convexdecomposition_pointsinside(self):
+        env=self.env
+        self.log.info('tests testPointsInside with the box, sphere and cylinder geometries')
+        infos = []
+        for geomtype,geomdata,T in [(KinBody.Link.GeomType.Box,[0.1,0.2,0.3],matrixFromAxisAngle([0,0,pi/4])),
+                                    (KinBody.Link.GeomType.Sphere,[0.2,0,0],eye(4)),
+                                    (KinBody.Link.GeomType.Cylinder,[0.1,0.6,0],matrixFromAxisAngle([pi/6,0,0]))]:
+            info = KinBody.Link.GeometryInfo()
+            info._type = geomtype
+            info._vGeomData = geomdata
+            T[0:3,3] = [len(infos),1,0]
+            info._t = T
+            infos.append(info)
+        body = RaveCreateKinBody(env,'')
+        body.InitFromGeometries(infos)
+        body.SetName('shapes')
+        env.Add(body)
+        cdmodel = ConvexDecompositionModel(body)
+        cdmodel.linkgeometry = [[]] # no hulls, the geometries are tested directly
+        # points in the frame of each geometry and whether they are inside
+        localpoints = [[[0.09,0.19,0.29],[-0.09,0.1,-0.29],[0.11,0,0],[0,0.21,0],[0,0,0.31]],
+                       [[0.19,0,0],[0.1,-0.1,0.1],[0.21,0,0],[0.12,0.12,0.12]],
+                       # the cylinder is oriented along z
+                       [[0,0,0.29],[0.05,0.05,-0.29],[0.09,0,0],[0,0,0.31],[0,0.11,0],[0.08,0.08,0]]]
+        expected = [True,True,False,False,False, True,True,False,False, True,True,True,False,False,False]
+        points = concatenate([transformPoints(dot(body.GetTransform(),geom.GetTransform()),array(points)) for geom,points in izip(body.GetLinks()[0].GetGeometries(),localpoints)])
+        assert(all(cdmodel.testPointsInside(points) == array(expected)))
+
+    def test_inversereachability_basedistributioncache(self):
+        env=self.env
+        self.log.info('tests that the cached base distribution is reused after the robot moves in the plane')
+        robot=self.LoadRobot('robots/barrettwam.robot.xml')
+        irmodel = InverseReachabilityModel(robot)
+        # one equivalence class of base placements around the grasps
+        random.seed(0)
+        irmodel.xyzdelta = 0.04
+        irmodel.quatdelta = 0.5
+        classpoints = c_[random.uniform(-pi,pi,200),random.uniform(-0.8,0.8,(200,2)),random.rand(200)]
+        irmodel.equivalenceclasses = [(array([1.0,0,0,0,0.5]),array([0.1,0.05]),classpoints)]
+        irmodel.preprocess()
+        numcomputations = [0]
+        ComputeBestEquivalenceClasses = irmodel._ComputeBestEquivalenceClasses
+        def CountedComputeBestEquivalenceClasses(*args,**kwargs):
+            numcomputations[0] += 1
+            return ComputeBestEquivalenceClasses(*args,**kwargs)
+        irmodel._ComputeBestEquivalenceClasses = CountedComputeBestEquivalenceClasses
+
+        with env:
+            Ttarget = eye(4)
+            Ttarget[0:3,3] = [1.0,0.5,robot.GetManipulators()[0].GetBase().GetTransform()[2,3]+0.5]
+            Tgrasps = [(dot(Ttarget,matrixFromAxisAngle([0,0,angle])),i) for i,angle in enumerate([0,0.5,1.0])]
+            densityfn,samplerfn,bounds = irmodel.computeAggregateBaseDistribution(Tgrasps,logllthresh=-inf,cachekey='target',Ttarget=Ttarget)
+            poses = samplerfn(10)[0]
+            assert(numcomputations[0] == 1)
+
+            # the distribution does not depend on the planar pose of the base
+            Trobot = matrixFromAxisAngle([0,0,0.7])
+            Trobot[0:3,3] = [0.3,-0.2,0]
+            robot.SetTransform(dot(Trobot,robot.GetTransform()))
+            assert(irmodel.computeAggregateBaseDistribution(Tgrasps,logllthresh=-inf,cachekey='target',Ttarget=Ttarget)[0] is densityfn)
+            assert(numcomputations[0] == 1)
+            densityfn2,samplerfn2,bounds2 = irmodel.computeAggregateBaseDistribution(Tgrasps,logllthresh=-inf)
+            assert(numcomputations[0] == 2)
+            assert(transdist(bounds,bounds2) <= g_epsilon)
+            probs = densityfn(poses)
+            assert(numpy.max(abs(densityfn2(poses)-probs)) <= g_epsilon*numpy.max(probs))
+
+            # the distribution is recomputed for a different height of the base
+            Trobot = eye(4)
+            Trobot[2,3] = 0.1
+            robot.SetTransform(dot(Trobot,robot.GetTransform()))
+            assert(irmodel.computeAggregateBaseDistribution(Tgrasps,logllthresh=-inf,cachekey='target',Ttarget=Ttarget)[0] is not densityfn)
+            assert(numcomputations[0] == 3)
+
+    def test_kinematicreachability_stats(self):
+        env=self.env
+        self.log.info('tests that reachabilitystats decodes the voxel and rotation indices to the sampled poses')
+        robot=self.LoadRobot('robots/barrettwam.robot.xml')
+        rmodel = ReachabilityModel(robot)
+        xyzdelta = 0.04
+        allpoints,insideinds,shape,rmodel.pointscale = rmodel.UniformlySampleSpace(0.3,delta=xyzdelta)
+        qarray = misc.SpaceSamplerExtra().sampleSO3(quatdelta=0.5)
+        rmodel.xyzdelta = xyzdelta
+        rmodel.baseanchor = array([0.1,-0.2,0.3])
+        rmodel.reachabilityrotations = array(qarray)
+        # reachable poses with the layout of the generated database
+        random.seed(0)
+        inds = insideinds[random.randint(0,len(insideinds),100)]
+        irotations = random.randint(0,len(qarray),100)
+        for counts in [random.randint(1,256,100),random.randint(1,1000,100)]:
+            rmodel.reachabilityvoxelindices = array(inds,uint32)
+            rmodel.reachabilityrotationindices = array(irotations,uint16)
+            rmodel.reachabilitycounts = array(counts,uint8 if numpy.max(counts) <= 255 else uint16)
+            stats = rmodel.reachabilitystats
+            assert(stats.shape == (100,8))
+            assert(transdist(stats[:,0:4],qarray[irotations]) <= g_epsilon)
+            # the translations are the ones given to the IK solver during the generation
+            assert(transdist(stats[:,4:7],allpoints[inds]+rmodel.baseanchor) <= g_epsilon)
+            assert(all(stats[:,7] == counts))
+
 #     def test_database_paths(self):
 #         pass
+
+def _CreateBoxSoup(numdivisions):
+    """returns the triangles of the faces of a cube divided in a grid, every triangle has its own vertices"""
+    vertices = []
+    ticks = linspace(-1,1,numdivisions+1)
+    for axis in range(3):
+        for sign in [-1,1]:
+            for i in range(numdivisions):
+                for j in range(numdivisions):
+                    corners = []
+                    for u,v in [(ticks[i],ticks[j]),(ticks[i+1],ticks[j]),(ticks[i+1],ticks[j+1]),(ticks[i],ticks[j+1])]:
+                        corner = zeros(3)
+                        corner[axis] = sign
+                        corner[(axis+1)%3] = u
+                        corner[(axis+2)%3] = v
+                        corners.append(corner)
+                    vertices += [corners[0],corners[1],corners[2],corners[0],corners[2],corners[3]]
+    vertices = array(vertices)
+    return vertices, reshape(arange(len(vertices),dtype=int32),(-1,3))
+
+def _CreateSphereMesh(numlat,numlon):
+    """returns a latitude/longitude sphere mesh, the vertices at the poles are duplicated"""
+    lat,lon = meshgrid(linspace(0,pi,numlat+1),linspace(0,2*pi,numlon,endpoint=False),indexing='ij')
+    vertices = c_[(sin(lat)*cos(lon)).ravel(),(sin(lat)*sin(lon)).ravel(),cos(lat).ravel()]
+    indices = []
+    for i in range(numlat):
+        for j in range(numlon):
+            a,b,c,d = i*numlon+j,i*numlon+(j+1)%numlon,(i+1)*numlon+(j+1)%numlon,(i+1)*numlon+j
+            indices += [[a,b,c],[a,c,d]]
+    return vertices, array(indices,int32)
+
+def _ComputeDuplicatedVerticesMapLoop(vertices, rtol=1e-05, atol=1e-08):
+    """the previous pairwise merging of PadMesh"""
+    vertices_map = arange(len(vertices))
+    for a in range(len(vertices) - 1):
+        if vertices_map[a] == a:
+            combine = a + 1 + flatnonzero(isclose(vertices[a], vertices[a+1:], rtol, atol).all(axis=1))
+            vertices_map[combine] = a
+    return vertices_map
+
+def _PadMeshLoop(vertices, indices, padding, rtol=1e-05, atol=1e-08, setNormalsAwayFromCenter=False):
+    """the previous implementation of PadMesh, which searches the shared edges pairwise"""
+    M = mean(vertices,0)
+    indices = _ComputeDuplicatedVerticesMapLoop(vertices, rtol, atol).astype(indices.dtype)[indices.ravel()].reshape(-1, 3)
+    vertices_0 = vertices[indices[:, 0]]
+    facenormals = cross(vertices[indices[:, 1]] - vertices_0, vertices[indices[:, 2]] - vertices_0)
+    degenerate = isclose(facenormals, 0.0, rtol, atol).all(axis=1)
+    facenormals /= linalg.norm(facenormals, axis=1)[:, newaxis]
+    facenormals[degenerate] = 0.0
+    newindices = arange(3 * len(facenormals), dtype=int32).reshape(-1, 3)
+    originaledges = empty((3 * len(facenormals), 5), dtype=int32)
+    if setNormalsAwayFromCenter:
+        flip = sum((vertices[indices[:,0]] - M)*facenormals,1) < 0
+        facenormals[flip] *= -1
+    newvertices = vertices[indices.ravel()] + repeat(facenormals*padding, 3, axis=0)
+    offsets = arange(0, 3 * len(facenormals), 3)
+    indices_j = [indices[:, j] for j in range(3)]
+    for j0, j1, n in [[0,1,0],[1,2,1],[2,0,2]]:
+        swap = indices_j[j0] < indices_j[j1]
+        originaledges_n = originaledges[n::3]
+        originaledges_n[:, 0] = where(swap, indices_j[j0], indices_j[j1])
+        originaledges_n[:, 1] = where(swap, indices_j[j1], indices_j[j0])
+        originaledges_n[:, 2] = offsets + j0
+        originaledges_n[:, 3] = offsets + j1
+        originaledges_n[:, 4] = swap
+    offset = 0
+    verticesofinterest = {}
+    for i,edge in enumerate(originaledges):
+        inds = flatnonzero(logical_and(edge[0]==originaledges[i+1:,0],edge[1]==originaledges[i+1:,1]))
+        if len(inds) > 0:
+            cedge = originaledges[i+1+inds[0]]
+            if not edge[0] in verticesofinterest:
+                verticesofinterest[edge[0]] = len(newvertices)+offset
+                offset += 1
+            if not edge[1] in verticesofinterest:
+                verticesofinterest[edge[1]] = len(newvertices)+offset
+                offset += 1
+            newindices = r_[newindices,[[edge[2],cedge[3],edge[3]],[edge[3],cedge[3],cedge[2]]]]
+            if edge[4] == 0:
+                newindices = r_[newindices, [[edge[3],cedge[2],verticesofinterest[edge[0]]],[cedge[3],edge[2],verticesofinterest[edge[1]]]]]
+            else:
+                newindices = r_[newindices, [[cedge[3],edge[2],verticesofinterest[edge[0]]],[edge[3],cedge[2],verticesofinterest[edge[1]]]]]
+    if offset > 0:
+        newvertices = r_[newvertices,zeros((offset,3))]
+    for originalvertex, newvertex in verticesofinterest.iteritems():
+        newvertices[newvertex,:] = mean(newvertices[flatnonzero(indices==originalvertex)],0)
+    if setNormalsAwayFromCenter:
+        newvertices_0 = newvertices[newindices[:, 0]]
+        flip = sum(cross(newvertices[newindices[:, 1]] - newvertices_0, newvertices[newindices[:, 2]] - newvertices_0)*(newvertices_0 - M),1) < 0
+        newindices[flip] = newindices[flip][:,[0,2,1]]
+    return newvertices,newindices
+
+def test_convexdecomposition_duplicatedvertices():
+    log.info('tests that the grid search merges the same vertices as the pairwise search')
+    random.seed(0)
+    vertices,indices = _CreateBoxSoup(4)
+    for noise in [0,1e-10,1e-6]:
+        noisyvertices = vertices + noise*(random.rand(*vertices.shape)-0.5)
+        for rtol,atol in [(1e-05,1e-08),(0,1e-7),(1e-3,0)]:
+            vertices_map = ConvexDecompositionModel._ComputeDuplicatedVerticesMap(noisyvertices, rtol, atol)
+            assert(all(vertices_map == _ComputeDuplicatedVerticesMapLoop(noisyvertices, rtol, atol)))
+    # points on a grid at the merging distance, close to the cell borders
+    points = c_[meshgrid(arange(6)*1e-8,arange(6)*1e-8,[0,1e-8],indexing='ij')].reshape(3,-1).T
+    assert(all(ConvexDecompositionModel._ComputeDuplicatedVerticesMap(points,0,1e-8) == _ComputeDuplicatedVerticesMapLoop(points,0,1e-8)))
+
+def test_convexdecomposition_padmesh():
+    log.info('tests that PadMesh gives the same mesh as the previous pairwise implementation')
+    random.seed(0)
+    for vertices,indices in [_CreateBoxSoup(3),_CreateSphereMesh(6,8)]:
+        vertices = vertices + 1e-10*(random.rand(*vertices.shape)-0.5)
+        for setNormalsAwayFromCenter in [False,True]:
+            newvertices,newindices = ConvexDecompositionModel.PadMesh(vertices,indices,0.01,setNormalsAwayFromCenter=setNormalsAwayFromCenter)
+            refvertices,refindices = _PadMeshLoop(vertices,indices,0.01,setNormalsAwayFromCenter=setNormalsAwayFromCenter)
+            assert(newindices.dtype == refindices.dtype)
+            assert(newindices.shape == refindices.shape and all(newindices == refindices))
+            assert(newvertices.shape == refvertices.shape and numpy.max(abs(newvertices-refvertices)) <= 1e-12)
+
+def _ComputeHullPlanesLoop(hull,thresh=0.99999):
+    """ComputeHullPlanes with the previous pruning, which compares every plane with all the planes after it"""
+    vm = mean(hull[0],0)
+    v0 = hull[0][hull[1][:,0],:]
+    normals = cross(hull[0][hull[1][:,1],:]-v0,hull[0][hull[1][:,2],:]-v0,1)
+    lengths = sqrt(sum(normals**2,1))
+    validfaces = flatnonzero(lengths>0)
+    normals = normals[validfaces]/lengths[validfaces,newaxis]
+    planes = c_[normals,-sum(normals*v0[validfaces],1)]
+    meandist = dot(planes[:,0:3],vm)+planes[:,3]
+    planes = r_[planes[flatnonzero(meandist<-1e-7)],-planes[flatnonzero(meandist>1e-7)]]
+    normalizedplanes = planes/sqrt(sum(planes**2,1))[:,newaxis]
+    uniqueplanes = ones(len(planes),bool)
+    for i in range(len(normalizedplanes)-1):
+        uniqueplanes[i+1:] &= dot(normalizedplanes[i+1:,:],normalizedplanes[i])<thresh
+    return planes[uniqueplanes]
+
+def test_convexdecomposition_hullplanes():
+    log.info('tests that the grid pruning of ComputeHullPlanes keeps the same planes as the pairwise pruning')
+    random.seed(0)
+    for vertices,indices in [_CreateBoxSoup(4),_CreateSphereMesh(6,8),_CreateSphereMesh(20,40)]:
+        for noise in [0,1e-6]:
+            hull = (vertices + noise*(random.rand(*vertices.shape)-0.5), indices)
+            # thresh=1 is left out: whether the coplanar faces are merged then depends on the last bit of the dot products, which differs between dot and sum
+            for thresh in [0.99999,0.999,0.9]:
+                planes = ConvexDecompositionModel.ComputeHullPlanes(hull,thresh)
+                refplanes = _ComputeHullPlanesLoop(hull,thresh)
+                assert(planes.shape == refplanes.shape and all(planes == refplanes))
+    # every face of the box is reduced to a single plane
+    planes = ConvexDecompositionModel.ComputeHullPlanes(_CreateBoxSoup(4))
+    assert(len(planes) == 6)
+    assert(numpy.max(abs(sort(abs(planes[:,3]))-1)) <= g_epsilon)
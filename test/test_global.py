@@ -63,3 +63,84 @@ def test_ikparam():
     
     ikparam2 = ikparam*T
     ikparam2.GetTranslationDirection5D().pos()
+
+def _TSPGreedy(points,first):
+    """the previous nearest neighbor ordering of misc.TSP starting from points[first]"""
+    path = [first]
+    left = range(len(points))
+    left.remove(first)
+    while len(left) > 0:
+        inext = left[argmin([sum((points[path[-1]]-points[j])**2) for j in left])]
+        left.remove(inext)
+        path.append(inext)
+    return path
+
+def test_tsp():
+    log.info('tests that misc.TSP returns an order of the solutions no longer than the nearest neighbor order')
+    random.seed(0)
+    weights = random.rand(6)+0.5
+    for numsolutions in [1,2,3,10,50]:
+        solutions = random.rand(numsolutions,6)
+        weightedsolutions = solutions*sqrt(weights)
+        newsolutions,newindices = misc.TSP(solutions,weights=weights)
+        assert(all(sort(newindices) == arange(numsolutions)))
+        assert(newindices[0] == 0)
+        assert(all(newsolutions == solutions[newindices]))
+        length = sum(sum(diff(weightedsolutions[newindices],axis=0)**2,1))
+        greedylength = sum(sum(diff(weightedsolutions[_TSPGreedy(weightedsolutions,0)],axis=0)**2,1))
+        assert(length <= greedylength+g_epsilon)
+        if numsolutions >= 50:
+            # 2-opt shortens the nearest neighbor order
+            assert(length < greedylength-g_epsilon)
+        
+        # the same distance as a function, which is called once for every pair
+        numcalls = [0]
+        def distfn(x,y):
+            numcalls[0] += 1
+            return sum(weights*(x-y)**2)
+        assert(all(misc.TSP(solutions,distfn=distfn)[1] == newindices))
+        assert(numcalls[0] == numsolutions*(numsolutions-1)/2)
+        
+        # the tour from a start configuration
+        start = random.rand(6)
+        newsolutions,newindices = misc.TSP(solutions,weights=weights,start=start)
+        assert(all(sort(newindices) == arange(numsolutions)))
+        points = r_[[start*sqrt(weights)],weightedsolutions]
+        length = sum(sum(diff(points[r_[0,newindices+1]],axis=0)**2,1))
+        greedylength = sum(sum(diff(points[_TSPGreedy(points,0)],axis=0)**2,1))
+        assert(length <= greedylength+g_epsilon)
+    assert(len(misc.TSP(zeros((0,6)))[1]) == 0)
+
+def test_chunkedarray():
+    log.info('tests that misc.ChunkedArray returns the appended rows, in memory and in a file')
+    import tempfile
+    random.seed(0)
+    rows = random.randint(0,2**32,(23,3)).astype(uint32)
+    filename = tempfile.mktemp(suffix='.raw')
+    try:
+        for kwargs in [{},{'filename':filename}]:
+            chunkedarray = misc.ChunkedArray(3,dtype=uint32,chunksize=5,**kwargs)
+            # the rows are appended in pieces crossing the chunk boundaries
+            for start,end in [(0,3),(3,4),(4,4),(4,11),(11,23)]:
+                chunkedarray.extend(rows[start:end])
+            assert(len(chunkedarray) == len(rows))
+            result = chunkedarray.getarray()
+            assert(result.dtype == uint32)
+            assert(result.shape == rows.shape and all(result == rows))
+            if 'filename' in kwargs:
+                assert(isinstance(result,numpy.memmap))
+                del result
+        
+        # a single row, and no rows
+        for kwargs in [{},{'filename':filename}]:
+            chunkedarray = misc.ChunkedArray(2,dtype=float32,chunksize=4,**kwargs)
+            chunkedarray.extend([0.5,1.5])
+            result = chunkedarray.getarray()
+            assert(result.dtype == float32 and all(result == [[0.5,1.5]]))
+            del result
+            chunkedarray = misc.ChunkedArray(2,dtype=int16,chunksize=4,**kwargs)
+            result = chunkedarray.getarray()
+            assert(result.dtype == int16 and result.shape == (0,2))
+    finally:
+        if os.path.exists(filename):
+            os.remove(filename)